@@ -0,0 +1,120 @@
+"""
+Async Database Connection and Session Management
+asyncio counterpart of app/database.py, used by the API routers
+"""
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from typing import AsyncGenerator
+
+from app.config import settings
+from app.database import DATABASE_URL, configure_sqlite, is_sqlite_memory
+from app.replicas import ReplicaRouter
+
+# asyncio driver per backend: aiosqlite for the SQLite default, asyncpg for PostgreSQL
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def async_database_url(url: str):
+    """DATABASE_URL with its driver replaced by the backend's asyncio driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def create_async_database_engine(url: str, read_only: bool = False) -> AsyncEngine:
+    """Async engine for a sync-style database URL (read_only: query_only SQLite connections)"""
+    if is_sqlite_memory(url):
+        # Each aiosqlite connection would open an empty database of its own,
+        # and none of them would be the one app/database.py writes to
+        raise ValueError(
+            "In-memory SQLite can't be shared with the async engine; "
+            "set DATABASE_URL to a file, e.g. sqlite:///./lma_platform.db"
+        )
+    async_url = async_database_url(url)
+    if async_url.get_backend_name() != "sqlite":
+        return create_async_engine(async_url, pool_pre_ping=True)
+    # Not pooled: every async SQLite session opens (and closes) its own
+    # aiosqlite connection. They are cheap to open, and a pooled one would
+    # stay tied to the event loop that created it after that loop closes
+    engine = create_async_engine(async_url, poolclass=NullPool)
+    configure_sqlite(engine.sync_engine, read_only=read_only)
+    return engine
+
+
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+
+# Both engines must see the same database as app/database.py (so no in-memory SQLite)
+async_engine = create_async_database_engine(DATABASE_URL)
+if ASYNC_DATABASE_URL.get_backend_name() == "sqlite":
+    async_read_engine = create_async_database_engine(DATABASE_URL, read_only=True)
+else:
+    async_read_engine = async_engine
+
+# Read-only sessions go to a caught-up replica when any are configured
+replica_router = ReplicaRouter(
+    primary=async_read_engine,
+    replicas=[
+        create_async_database_engine(url.strip(), read_only=True)
+        for url in settings.READ_REPLICA_URLS.split(",") if url.strip()
+    ],
+    check_interval=settings.REPLICA_CHECK_INTERVAL_SECONDS,
+    max_lag=settings.REPLICA_MAX_LAG_VERSIONS,
+    check_timeout=settings.REPLICA_CHECK_TIMEOUT_SECONDS
+)
+
+# Objects stay readable after commit: an expired attribute can't lazy-load
+# outside the session's greenlet
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Unbound: get_async_read_db binds each session to the engine replica_router picks
+AsyncReadSessionLocal = sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for FastAPI to get an async database session
+
+    Queries are awaited, so the event loop keeps serving other requests
+    while one waits on the database. Services written against the sync
+    `Session` run through `await db.run_sync(fn, *args)`, which calls
+    `fn(sync_session, *args)` with the same non-blocking connection.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for FastAPI to get a read-only async database session (GET routes)
+
+    Served by a healthy replica within REPLICA_MAX_LAG_VERSIONS of the
+    primary (round-robin), else by the primary. On SQLite the connections
+    are query_only, so reads never queue behind a writer's connection and
+    an accidental write raises.
+    """
+    engine = await replica_router.choose()
+    async with AsyncReadSessionLocal(bind=engine) as db:
+        yield db
+
+
+async def get_async_primary_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for FastAPI to get a read-only async session on the primary
+
+    For GET routes over rows whose writes don't bump the portfolio version
+    (stress test results, covenant audits and history, documents) and
+    live scenarios, which track the primary's version: replica lag is
+    measured in portfolio versions, so a replica could pass the check and
+    still miss them.
+    """
+    async with AsyncReadSessionLocal(bind=async_read_engine) as db:
+        yield db
@@ -17,6 +17,18 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: Optional[str] = None
     
+    # SQLite (file databases)
+    SQLITE_POOL_SIZE: int = 5  # Read-write connections kept open; each thread checks out its own
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait this long for a lock before "database is locked"
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024  # Memory-mapped I/O window per connection
+    SQLITE_WAL: bool = True  # WAL journaling (synchronous=NORMAL)
+    
+    # Read replicas for GET routes
+    READ_REPLICA_URLS: str = ""  # Comma-separated, same format as DATABASE_URL
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 5.0  # Health / lag check period
+    REPLICA_CHECK_TIMEOUT_SECONDS: float = 1.0  # A replica slower than this to answer is skipped
+    REPLICA_MAX_LAG_VERSIONS: int = 0  # Portfolio version bumps a replica may trail the primary by
+    
     # OpenAI / LLM
     OPENAI_API_KEY: Optional[str] = None
     LLM_MODEL: str = "gpt-4o-mini"  # Cost-effective for hackathon
@@ -33,6 +45,19 @@ class Settings(BaseSettings):
     # Multi-tenancy
     DEFAULT_TENANT_ID: str = "tenant-default"  # For demo purposes
     
+    # Simulation
+    MONTE_CARLO_WORKERS: Optional[int] = None  # Process pool size; defaults to CPU count
+    STRESS_TEST_JOB_WORKERS: int = 2  # Concurrent background stress test jobs
+    STRESS_TEST_JOB_QUEUE_LIMIT: int = 32  # Jobs allowed to wait for a worker
+    LIVE_SCENARIO_LIMIT: int = 16  # Pinned live scenarios per process
+    STRESS_TEST_CACHE_SIZE: int = 32  # Cached scenario results (columnar), keyed by tenant, scenario and portfolio version
+    STRESS_SNAPSHOT_CACHE_SIZE: int = 4  # Cached portfolio snapshots those results share, per loan subset
+    
+    # Covenant audit trail
+    AUDIT_QUEUE_LIMIT: int = 10_000  # Audit rows waiting for the background writer
+    AUDIT_BATCH_ROWS: int = 500  # Rows per bulk insert
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0  # Max wait before writing a partial batch
+    
     # File Upload
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE_MB: int = 50
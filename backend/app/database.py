@@ -1,11 +1,14 @@
 """
 Database Connection and Session Management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool, StaticPool
 import os
-from typing import Generator
+from typing import Generator, List
+
+from app.config import settings
 
 # Database URL - defaults to SQLite for development, PostgreSQL for production
 DATABASE_URL = os.getenv(
@@ -13,13 +16,57 @@ DATABASE_URL = os.getenv(
     "sqlite:///./lma_platform.db"  # SQLite for quick setup, can switch to PostgreSQL
 )
 
-# For SQLite, use StaticPool to allow multiple threads
-if DATABASE_URL.startswith("sqlite"):
+
+def is_sqlite_memory(url) -> bool:
+    """Whether the URL is an in-memory SQLite database (private to one connection)"""
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def sqlite_pragmas(read_only: bool = False) -> List[str]:
+    """PRAGMAs run on every new SQLite connection"""
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE_BYTES}",
+    ]
+    if settings.SQLITE_WAL:
+        # Readers no longer block on (or block) the single writer
+        pragmas += ["PRAGMA journal_mode = WAL", "PRAGMA synchronous = NORMAL"]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    return pragmas
+
+
+def configure_sqlite(sync_engine, read_only: bool = False):
+    """Apply sqlite_pragmas to every connection the engine opens (async engines: pass .sync_engine)"""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+if is_sqlite_memory(DATABASE_URL):
+    # In-memory: one shared connection, or every thread would see its own empty database
     engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
+elif DATABASE_URL.startswith("sqlite"):
+    # File-backed: each thread (background jobs, audit writer, streamed
+    # result saves) checks out a connection of its own. API routes use the
+    # async engines in app/async_database.py instead.
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=settings.SQLITE_POOL_SIZE,
+    )
+    configure_sqlite(engine)
 else:
     # PostgreSQL connection
     engine = create_engine(DATABASE_URL, pool_pre_ping=True)
@@ -40,15 +87,22 @@ def get_db() -> Generator[Session, None, None]:
 
 def init_db():
     """
-    Initialize database tables
+    Bring the database schema up to date, keeping its data
+
+    Runs no DDL when the stored schema fingerprint matches the models;
+    otherwise applies the Alembic migrations (see app/schema_bootstrap.py).
+    """
+    from app.schema_bootstrap import bootstrap_schema
+    bootstrap_schema(engine)
+
+
+def reset_db():
+    """
+    Drop and recreate every table (tests and local development only)
     """
     from app.models import Base
-    # Reset the database tables on initialization in development/test runs to
-    # ensure a clean state for repeated test invocations.
-    try:
-        Base.metadata.drop_all(bind=engine)
-    except Exception:
-        # If drop_all fails (e.g., in production), continue with create_all
-        pass
+    from app.schema_bootstrap import mark_schema_current
+    Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
-
+    with engine.begin() as connection:
+        mark_schema_current(connection)
@@ -10,6 +10,10 @@ from contextlib import asynccontextmanager
 
 from app.config import settings
 from app.database import init_db
+from app.async_database import async_engine, replica_router
+from app.services.stress_jobs import get_stress_job_manager
+from app.services.covenant_audit import get_covenant_audit_writer
+from app.services.monte_carlo import shutdown_monte_carlo_pool
 # from app.routers import documents, simulation, export, loans  # RAG dependencies - skip for MVP
 from app.routers import loans_enhanced
 try:
@@ -33,6 +37,15 @@ async def lifespan(app: FastAPI):
         import traceback
         traceback.print_exc()
     yield
+    # Stop background stress test jobs on shutdown
+    get_stress_job_manager().shutdown()
+    # Stop the Monte Carlo worker processes
+    shutdown_monte_carlo_pool()
+    # Write out queued covenant audit rows
+    get_covenant_audit_writer().shutdown()
+    await async_engine.dispose()
+    for replica in replica_router.replicas:
+        await replica.engine.dispose()
 
 # Initialize FastAPI app with lifespan event handler
 app = FastAPI(
@@ -52,6 +65,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # GET /loans pagination
 )
 
 # Include routers
@@ -95,5 +109,9 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check for monitoring"""
-    return {"status": "healthy", "service": settings.PROJECT_NAME}
+    return {
+        "status": "healthy",
+        "service": settings.PROJECT_NAME,
+        "read_replicas": replica_router.status()
+    }
 
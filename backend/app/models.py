@@ -4,16 +4,26 @@ PostgreSQL Schema with Multi-tenancy Support
 """
 from sqlalchemy import (
     Column, Integer, String, Float, DateTime, Boolean, 
-    ForeignKey, Text, Enum as SQLEnum, JSON
+    ForeignKey, Text, Enum as SQLEnum, JSON, Index
 )
+from sqlalchemy import event, inspect, select, insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates, Session
 from sqlalchemy.sql import func
 from datetime import datetime
+from functools import lru_cache
 import enum
+import re
 
 Base = declarative_base()
 
+# INSERT constructs with ON CONFLICT support, per backend
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
 
 class CovenantOperator(str, enum.Enum):
     """Covenant comparison operators"""
@@ -24,6 +34,42 @@ class CovenantOperator(str, enum.Enum):
     EQUAL = "=="
 
 
+class CovenantKind(enum.IntEnum):
+    """How a covenant ratio reacts to EBITDA / interest rate stress"""
+    LEVERAGE = 0           # Debt/EBITDA: rises as EBITDA falls
+    INTEREST_COVERAGE = 1  # EBITDA / Interest: falls with EBITDA and rate hikes
+    DSCR = 2               # (EBITDA - CapEx) / Debt Service
+    CURRENT_RATIO = 3      # Working capital stress only
+    DEFAULT = 4            # Assumed proportional to the EBITDA drop
+
+
+# Filler words dropped when normalizing covenant names ("Debt-to-EBITDA" -> "debt_ebitda")
+_KIND_FILLER_WORDS = {"to", "of", "the", "and"}
+
+
+@lru_cache(maxsize=4096)
+def classify_covenant_kind(name: str) -> int:
+    """
+    Map a covenant name to its CovenantKind code
+    
+    The name is lower-cased and split on anything that is not a letter or
+    digit, so "Debt-to-EBITDA", "Debt/EBITDA" and "debt_ebitda" all match.
+    """
+    normalized = "_".join(
+        word for word in re.split(r"[^a-z0-9]+", name.lower())
+        if word and word not in _KIND_FILLER_WORDS
+    )
+    if "debt_ebitda" in normalized or "leverage" in normalized:
+        return CovenantKind.LEVERAGE
+    if "interest_coverage" in normalized or "interest_cover" in normalized:
+        return CovenantKind.INTEREST_COVERAGE
+    if "dscr" in normalized or "debt_service" in normalized:
+        return CovenantKind.DSCR
+    if "current_ratio" in normalized:
+        return CovenantKind.CURRENT_RATIO
+    return CovenantKind.DEFAULT
+
+
 class CovenantStatus(str, enum.Enum):
     """Covenant compliance status"""
     COMPLIANT = "compliant"
@@ -80,6 +126,13 @@ class Loan(Base):
     tenant = relationship("Tenant", back_populates="loans")
     covenants = relationship("Covenant", back_populates="loan", cascade="all, delete-orphan")
     documents = relationship("Document", back_populates="loan", cascade="all, delete-orphan")
+    
+    # Stress-test subset filters run against these
+    __table_args__ = (
+        Index("ix_loans_tenant_status", "tenant_id", "status"),
+        Index("ix_loans_tenant_sector", "tenant_id", "sector"),
+        Index("ix_loans_tenant_id_id", "tenant_id", "id"),  # GET /loans keyset pages
+    )
 
 
 class Covenant(Base):
@@ -93,6 +146,7 @@ class Covenant(Base):
     clause_id = Column(String, nullable=False)  # e.g., "Clause 18.2"
     name = Column(String, nullable=False)  # e.g., "Debt-to-EBITDA Ratio"
     type = Column(String, default="financial")  # financial, esg, operational
+    kind = Column(Integer, index=True)  # CovenantKind, derived from name
     
     # Threshold Configuration
     threshold_value = Column(Float, nullable=False)
@@ -116,6 +170,13 @@ class Covenant(Base):
     # Relationships
     loan = relationship("Loan", back_populates="covenants")
     audit_trail = relationship("CovenantAudit", back_populates="covenant", cascade="all, delete-orphan")
+    history = relationship("CovenantHistory", cascade="all, delete-orphan", passive_deletes=True)
+    
+    @validates("name")
+    def _classify_kind(self, key, name):
+        """Keep the stress kind in step with the name on every ORM write"""
+        self.kind = classify_covenant_kind(name) if name is not None else None
+        return name
 
 
 class Document(Base):
@@ -203,6 +264,33 @@ class CovenantAudit(Base):
     
     # Relationships
     covenant = relationship("Covenant", back_populates="audit_trail")
+    
+    __table_args__ = (
+        # GET /covenants/{id}/audit time-range pages
+        Index("ix_covenant_audits_covenant_created", "covenant_id", "created_at"),
+    )
+
+
+class CovenantHistory(Base):
+    """
+    Time series of reported covenant values
+    
+    One row per value change, recorded automatically: ORM writes of
+    `Covenant.current_value` by the after_flush listener below, bulk
+    submissions by `apply_covenant_values`.
+    """
+    __tablename__ = "covenant_history"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    covenant_id = Column(String, ForeignKey("covenants.id", ondelete="CASCADE"), nullable=False)
+    value = Column(Float, nullable=False)
+    recorded_at = Column(DateTime, nullable=False)  # When the value was reported
+    created_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        # Range queries over many covenants, see services/covenant_history.py
+        Index("ix_covenant_history_covenant_recorded", "covenant_id", "recorded_at"),
+    )
 
 
 class StressTestResult(Base):
@@ -215,17 +303,177 @@ class StressTestResult(Base):
     # Simulation Parameters
     ebitda_drop_percent = Column(Float, nullable=False)
     interest_rate_hike_bps = Column(Float, nullable=False)  # basis points
+    filters = Column(JSON)  # Loan subset filters, if any (PortfolioFilter.to_dict)
+    factors = Column(JSON)  # Extra factor shocks, if any (FactorShocks.to_dict)
     
     # Results Summary
     total_loans_tested = Column(Integer)
     loans_breached = Column(Integer)
     loans_at_risk = Column(Integer)  # Within 5% of threshold
     loans_safe = Column(Integer)
+    rollups = Column(JSON)  # Per-group counts, exposure and worst cushion, if requested
     
-    # Detailed Results (JSON)
+    # Detailed Results (JSON) - legacy; new runs store StressTestLoanResult rows
     risk_heatmap = Column(JSON)  # Structured risk data per loan
     
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
     created_by = Column(String)  # user_id
+    
+    # Relationships
+    loan_results = relationship("StressTestLoanResult", cascade="all, delete-orphan", passive_deletes=True)
+    covenant_results = relationship("StressTestCovenantResult", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class StressTestLoanResult(Base):
+    """Per-loan outcome of a stress test"""
+    __tablename__ = "stress_test_loan_results"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    test_id = Column(String, ForeignKey("stress_test_results.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Order within the heatmap
+    
+    # Loan Details
+    loan_id = Column(String, nullable=False)
+    company_name = Column(String)
+    loan_amount = Column(Float)
+    currency = Column(String)
+    
+    # Outcome
+    overall_status = Column(String, nullable=False)  # breach, at_risk, safe
+    breach_count = Column(Integer)
+    at_risk_count = Column(Integer)
+    max_breach_margin = Column(Float)  # Largest covenant breach margin (sort key)
+    
+    __table_args__ = (
+        Index("ix_stress_test_loan_results_test_position", "test_id", "position"),
+        Index("ix_stress_test_loan_results_test_status", "test_id", "overall_status"),
+    )
+
+
+class StressTestCovenantResult(Base):
+    """Per-covenant outcome of a stress test"""
+    __tablename__ = "stress_test_covenant_results"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    test_id = Column(String, ForeignKey("stress_test_results.id", ondelete="CASCADE"), nullable=False)
+    loan_position = Column(Integer, nullable=False)  # StressTestLoanResult.position
+    
+    # Covenant Details
+    covenant_id = Column(String)
+    clause_id = Column(String)
+    name = Column(String)
+    operator = Column(String)
+    unit = Column(String)
+    
+    # Outcome
+    status = Column(String, nullable=False)  # breach, at_risk, safe
+    current_value = Column(Float)
+    stressed_value = Column(Float)
+    threshold = Column(Float)
+    cushion_percent = Column(Float)
+    breach_margin = Column(Float)
+    
+    __table_args__ = (
+        Index("ix_stress_test_covenant_results_test_loan", "test_id", "loan_position"),
+    )
+
+
+
+class PortfolioVersion(Base):
+    """
+    Per-tenant counter bumped whenever a Loan or Covenant row changes
+    
+    Caches of derived portfolio data key on this version, so they can never
+    serve results computed from older loan/covenant state.
+    """
+    __tablename__ = "portfolio_versions"
+    
+    tenant_id = Column(String, ForeignKey("tenants.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    
+    @classmethod
+    def bump(cls, connection, tenant_ids):
+        """
+        Increment the versions of the given tenants on a Core connection
+        
+        A single INSERT ... ON CONFLICT DO UPDATE, so two transactions making
+        a tenant's first change can't both try to insert its row. Returns
+        the new versions by tenant id.
+        """
+        tenant_ids = sorted({t for t in tenant_ids if t is not None})
+        if not tenant_ids:
+            return {}
+        dialect = connection.dialect.name
+        if dialect not in UPSERT_INSERTS:
+            raise ValueError(f"No upsert configured for {dialect} databases")
+        statement = UPSERT_INSERTS[dialect](cls).on_conflict_do_update(
+            index_elements=[cls.tenant_id],
+            set_={"version": cls.version + 1}
+        ).returning(cls.tenant_id, cls.version)
+        return dict(connection.execute(statement, [{"tenant_id": t, "version": 1} for t in tenant_ids]).all())
+
+
+class SchemaFingerprint(Base):
+    """
+    Fingerprint of the models the database schema was last brought up to
+    
+    Startup compares it with the current models' fingerprint and runs no
+    DDL when they match (see app/schema_bootstrap.py). Single row.
+    """
+    __tablename__ = "schema_fingerprints"
+    
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now())
+
+
+# Session.info key: {tenant_id: version} bumped by the session's latest transaction
+BUMPED_VERSIONS_KEY = "bumped_portfolio_versions"
+
+
+@event.listens_for(Session, "after_begin")
+def _reset_bumped_versions(session, transaction, connection):
+    """Forget the versions bumped by the previous transaction"""
+    session.info.pop(BUMPED_VERSIONS_KEY, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_portfolio_versions(session, flush_context):
+    """Bump the portfolio version of every tenant whose loans or covenants were flushed"""
+    tenant_ids = set()
+    covenant_loan_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Loan):
+            tenant_ids.add(obj.tenant_id)
+        elif isinstance(obj, Covenant):
+            covenant_loan_ids.add(obj.loan_id)
+    
+    if not tenant_ids and not covenant_loan_ids:
+        return
+    
+    # Core statements on the flush connection; these don't re-enter the flush
+    connection = session.connection()
+    if covenant_loan_ids:
+        tenant_ids.update(connection.execute(
+            select(Loan.tenant_id).where(Loan.id.in_(covenant_loan_ids))
+        ).scalars())
+    session.info.setdefault(BUMPED_VERSIONS_KEY, {}).update(PortfolioVersion.bump(connection, tenant_ids))
+
 
+@event.listens_for(Session, "after_flush")
+def _record_covenant_history(session, flush_context):
+    """Append a CovenantHistory row for every covenant whose current_value was flushed"""
+    rows = []
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Covenant) or obj.current_value is None:
+            continue
+        if not inspect(obj).attrs.current_value.history.has_changes():
+            continue
+        recorded_at = obj.last_updated if isinstance(obj.last_updated, datetime) else datetime.now()
+        rows.append({"covenant_id": obj.id, "value": obj.current_value, "recorded_at": recorded_at})
+    
+    if rows:
+        session.connection().execute(insert(CovenantHistory), rows)
@@ -0,0 +1,124 @@
+"""
+Read Replica Routing
+Round-robin choice of a healthy, caught-up replica for read-only sessions
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.models import PortfolioVersion
+
+logger = logging.getLogger(__name__)
+
+
+async def portfolio_watermark(engine: AsyncEngine) -> int:
+    """
+    Sum of every tenant's portfolio version
+
+    Each committed Loan/Covenant change bumps a version, so the sum only
+    grows; a replica that has replayed the same commits reports the same
+    watermark as the primary. Tables written without a bump (stress test
+    results, covenant audits and history, documents) aren't covered, so their routes
+    read from the primary (get_async_primary_read_db).
+    """
+    async with engine.connect() as conn:
+        return int(await conn.scalar(select(func.coalesce(func.sum(PortfolioVersion.version), 0))))
+
+
+class Replica:
+    """A replica engine and the outcome of its last health check"""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.healthy = False  # Until the first check passes
+        self.lag: Optional[int] = None  # Watermark behind the primary
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "error": self.error
+        }
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for each read-only session
+
+    Replicas are health-checked at most once per `check_interval` seconds,
+    on the first read after the interval expires; other reads use the last
+    result meanwhile. A replica is used only if it answers within
+    `check_timeout` seconds and its portfolio watermark trails the
+    primary's by at most `max_lag`. Replicas are checked concurrently, so
+    a hung one delays that read by at most `check_timeout`. Healthy
+    replicas are taken in round-robin order; with none healthy (or none
+    configured) reads go to `primary`.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine],
+        check_interval: float,
+        max_lag: int,
+        check_timeout: float = 1.0
+    ):
+        self.primary = primary
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.check_timeout = check_timeout
+        self._next_check = 0.0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    async def check(self):
+        """Ping every replica and compare its watermark with the primary's"""
+        primary_watermark = await asyncio.wait_for(portfolio_watermark(self.primary), self.check_timeout)
+        await asyncio.gather(*(self._check_replica(replica, primary_watermark) for replica in self.replicas))
+
+    async def _check_replica(self, replica: Replica, primary_watermark: int):
+        try:
+            watermark = await asyncio.wait_for(portfolio_watermark(replica.engine), self.check_timeout)
+            replica.lag = primary_watermark - watermark
+            replica.error = None
+            replica.healthy = replica.lag <= self.max_lag
+        except Exception as e:
+            replica.lag = None
+            replica.error = str(e) or f"{type(e).__name__} after {self.check_timeout}s"
+            replica.healthy = False
+            logger.warning("[REPLICA] %s failed its health check: %s", replica.engine.url, replica.error)
+
+    async def choose(self) -> AsyncEngine:
+        """Engine for the next read-only session"""
+        if not self.replicas:
+            return self.primary
+
+        with self._lock:
+            due = time.monotonic() >= self._next_check
+            if due:
+                # Claimed before checking, so concurrent reads don't all check
+                self._next_check = time.monotonic() + self.check_interval
+        if due:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("[REPLICA] Primary watermark unavailable; reading from the primary")
+                for replica in self.replicas:
+                    replica.healthy = False
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return self.primary
+        return healthy[next(self._counter) % len(healthy)].engine
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [replica.to_dict() for replica in self.replicas]
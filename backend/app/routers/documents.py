@@ -3,14 +3,16 @@ Document Analysis Router
 Handles PDF upload, parsing, and covenant extraction
 """
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import os
 import uuid
 from pathlib import Path
 from datetime import datetime
 
-from app.database import get_db
+from app.async_database import get_async_db, get_async_primary_read_db
 from app.models import Document, Loan, Tenant, Covenant, DocumentExtraction
 from app.config import settings
 from app.services.rag_service import get_rag_service
@@ -23,7 +25,7 @@ async def analyze_document(
     file: UploadFile = File(...),
     loan_id: str = None,
     tenant_id: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Analyze uploaded LMA PDF document and extract financial covenants
@@ -46,11 +48,11 @@ async def analyze_document(
         tenant_id = settings.DEFAULT_TENANT_ID
     
     # Ensure tenant exists
-    tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+    tenant = await db.get(Tenant, tenant_id)
     if not tenant:
         tenant = Tenant(id=tenant_id, name=f"Tenant {tenant_id}")
         db.add(tenant)
-        db.commit()
+        await db.commit()
     
     # Create loan if loan_id not provided
     if not loan_id:
@@ -67,9 +69,9 @@ async def analyze_document(
             interest_rate=0.0
         )
         db.add(loan)
-        db.commit()
+        await db.commit()
     else:
-        loan = db.query(Loan).filter(Loan.id == loan_id).first()
+        loan = await db.get(Loan, loan_id)
         if not loan:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -99,14 +101,14 @@ async def analyze_document(
         status="processing"
     )
     db.add(document)
-    db.commit()
+    await db.commit()
     
     try:
         # Initialize RAG service
         rag_service = get_rag_service()
         
-        # Extract text from PDF
-        text_pages = rag_service.extract_text_from_pdf(file_path)
+        # PDF parsing and the LLM call are slow and synchronous; keep them off the event loop
+        text_pages = await run_in_threadpool(rag_service.extract_text_from_pdf, file_path)
         
         if not text_pages:
             raise HTTPException(
@@ -115,7 +117,7 @@ async def analyze_document(
             )
         
         # Extract covenants using LLM
-        covenants_data = rag_service.extract_covenants(text_pages, loan_id)
+        covenants_data = await run_in_threadpool(rag_service.extract_covenants, text_pages, loan_id)
         
         # Store covenants and extractions
         extracted_covenants = []
@@ -164,7 +166,7 @@ async def analyze_document(
         # Update document status
         document.status = "completed"
         document.processed_at = datetime.now()
-        db.commit()
+        await db.commit()
         
         return {
             "document_id": document_id,
@@ -179,7 +181,7 @@ async def analyze_document(
         # Update document status to failed
         document.status = "failed"
         document.error_message = str(e)
-        db.commit()
+        await db.commit()
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -190,10 +192,10 @@ async def analyze_document(
 @router.get("/documents/{document_id}")
 async def get_document(
     document_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_primary_read_db)
 ):
     """Get document details and extraction audit trail"""
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await db.get(Document, document_id)
     
     if not document:
         raise HTTPException(
@@ -201,9 +203,9 @@ async def get_document(
             detail="Document not found"
         )
     
-    extractions = db.query(DocumentExtraction).filter(
+    extractions = (await db.scalars(select(DocumentExtraction).where(
         DocumentExtraction.document_id == document_id
-    ).all()
+    ))).all()
     
     return {
         "document": {
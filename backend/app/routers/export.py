@@ -4,19 +4,44 @@ Generate compliance reports in CSV/Excel format
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import pandas as pd
 import io
 from datetime import datetime
 import logging
 
-from app.database import get_db
+from app.async_database import get_async_primary_read_db, get_async_read_db
 from app.models import Loan, Covenant, StressTestResult
 from app.config import settings
+from app.services.portfolio_loader import load_portfolio_rows
+from app.services.stress_results import iter_export_rows, is_legacy_result
 
 router = APIRouter()
 
+# Columns selected for the compliance report (no ORM hydration)
+EXPORT_LOAN_COLUMNS = (
+    Loan.id,
+    Loan.company_name,
+    Loan.borrower_name,
+    Loan.sector,
+    Loan.loan_amount,
+    Loan.currency,
+    Loan.status,
+)
+EXPORT_COVENANT_COLUMNS = (
+    Covenant.loan_id,
+    Covenant.clause_id,
+    Covenant.name,
+    Covenant.current_value,
+    Covenant.threshold_value,
+    Covenant.operator,
+    Covenant.status,
+    Covenant.cushion_percent,
+    Covenant.page_number,
+    Covenant.last_updated,
+)
+
 # Module logger
 logger = logging.getLogger(__name__)
 
@@ -25,7 +50,7 @@ logger = logging.getLogger(__name__)
 async def export_compliance_report(
     tenant_id: Optional[str] = None,
     format: str = "csv",  # csv or excel
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Export comprehensive compliance report for credit committee
@@ -39,10 +64,16 @@ async def export_compliance_report(
     try:
         tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
 
-        # Query loans with covenants
-        loans = db.query(Loan).filter(Loan.tenant_id == tenant_id).all()
+        # Query loans and covenants in two set-based queries
+        portfolio = await db.run_sync(
+            load_portfolio_rows,
+            tenant_id,
+            statuses=None,
+            loan_columns=EXPORT_LOAN_COLUMNS,
+            covenant_columns=EXPORT_COVENANT_COLUMNS
+        )
 
-        if not loans:
+        if not portfolio.loans:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No loans found for export"
@@ -51,8 +82,8 @@ async def export_compliance_report(
         # Build report data
         report_rows = []
 
-        for loan in loans:
-            covenants = db.query(Covenant).filter(Covenant.loan_id == loan.id).all()
+        for loan in portfolio.loans:
+            covenants = portfolio.covenants_by_loan.get(loan.id, [])
 
             if not covenants:
                 # Include loan even without covenants
@@ -75,8 +106,8 @@ async def export_compliance_report(
                     "Last Updated": ""
                 })
             else:
-                    for covenant in covenants:
-                        report_rows.append({
+                for covenant in covenants:
+                    report_rows.append({
                         "Loan ID": loan.id,
                         "Company Name": loan.company_name,
                         "Borrower": loan.borrower_name,
@@ -143,13 +174,11 @@ async def export_compliance_report(
 async def export_stress_test(
     test_id: str,
     format: str = "csv",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_primary_read_db)
 ):
     """Export specific stress test results"""
     try:
-        test_result = db.query(StressTestResult).filter(
-            StressTestResult.id == test_id
-        ).first()
+        test_result = await db.get(StressTestResult, test_id)
 
         if not test_result:
             raise HTTPException(
@@ -157,25 +186,34 @@ async def export_stress_test(
                 detail="Stress test result not found"
             )
 
-        # Flatten risk heatmap for export
-        report_rows = []
-        risk_heatmap = test_result.risk_heatmap or {}
+        # Flatten loan/covenant results for export
+        if is_legacy_result(test_result):
+            result_rows = [
+                {**covenant_data, "loan_id": loan_data.get("loan_id"),
+                 "company_name": loan_data.get("company_name"), "loan_amount": loan_data.get("loan_amount")}
+                for loan_data in test_result.risk_heatmap.get("loans", [])
+                for covenant_data in loan_data.get("covenants", [])
+            ]
+        else:
+            result_rows = await db.run_sync(
+                lambda session: [row._asdict() for row in iter_export_rows(session, test_id)]
+            )
 
-        for loan_data in risk_heatmap.get("loans", []):
-            for covenant_data in loan_data.get("covenants", []):
-                report_rows.append({
-                    "Loan ID": loan_data.get("loan_id"),
-                    "Company Name": loan_data.get("company_name"),
-                    "Loan Amount": loan_data.get("loan_amount"),
-                    "Covenant Name": covenant_data.get("name"),
-                    "Clause ID": covenant_data.get("clause_id"),
-                    "Current Value": covenant_data.get("current_value"),
-                    "Stressed Value": covenant_data.get("stressed_value"),
-                    "Threshold": covenant_data.get("threshold"),
-                    "Status": covenant_data.get("status"),
-                    "Cushion %": covenant_data.get("cushion_percent"),
-                    "Breach Margin": covenant_data.get("breach_margin")
-                })
+        report_rows = []
+        for row in result_rows:
+            report_rows.append({
+                "Loan ID": row.get("loan_id"),
+                "Company Name": row.get("company_name"),
+                "Loan Amount": row.get("loan_amount"),
+                "Covenant Name": row.get("name"),
+                "Clause ID": row.get("clause_id"),
+                "Current Value": row.get("current_value"),
+                "Stressed Value": row.get("stressed_value"),
+                "Threshold": row.get("threshold"),
+                "Status": row.get("status"),
+                "Cushion %": row.get("cushion_percent"),
+                "Breach Margin": row.get("breach_margin")
+            })
 
         df = pd.DataFrame(report_rows)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -2,18 +2,72 @@
 Loans Router
 CRUD operations for loans and covenants
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
 from datetime import datetime
+from collections import defaultdict
+import base64
+import binascii
 
-from app.database import get_db
-from app.models import Loan, Covenant, Tenant
+from app.async_database import get_async_db, get_async_primary_read_db, get_async_read_db
+from app.models import Loan, Covenant, CovenantAudit, Tenant, CovenantStatus
 from app.config import settings
+from app.services.live_scenarios import get_live_scenario_registry
+from app.services.covenant_values import apply_covenant_values
+from app.services.portfolio_version import bumped_portfolio_version
+from app.services.covenant_history import history_series
+from app.services.covenant_audit import (
+    AUDIT_SOURCE_BULK,
+    AUDIT_SOURCE_MANUAL,
+    audit_row,
+    audit_rows_from_results,
+    get_covenant_audit_writer,
+    write_audit_rows,
+)
 
 router = APIRouter()
 
+# GET /loans page size
+DEFAULT_LOAN_PAGE_SIZE = 100
+MAX_LOAN_PAGE_SIZE = 1000
+
+# Maximum covenant values in one bulk submission
+MAX_BULK_COVENANT_VALUES = 50_000
+
+# GET /covenants/{covenant_id}/audit page size
+DEFAULT_AUDIT_PAGE_SIZE = 100
+MAX_AUDIT_PAGE_SIZE = 1000
+
+# Covenants per GET /covenants/history request
+MAX_HISTORY_COVENANTS = 1000
+
+# Fields GET /loans can project, in response order
+LOAN_LIST_FIELDS = {
+    "id": Loan.id,
+    "company_name": Loan.company_name,
+    "borrower_name": Loan.borrower_name,
+    "sector": Loan.sector,
+    "loan_amount": Loan.loan_amount,
+    "currency": Loan.currency,
+    "status": Loan.status,
+    "covenants": None,
+}
+LOAN_LIST_COVENANT_COLUMNS = (
+    Covenant.loan_id,
+    Covenant.id,
+    Covenant.clause_id,
+    Covenant.name,
+    Covenant.current_value,
+    Covenant.threshold_value,
+    Covenant.operator,
+    Covenant.status,
+    Covenant.cushion_percent,
+)
+
 
 class LoanResponse(BaseModel):
     """Loan response model"""
@@ -27,47 +81,119 @@ class LoanResponse(BaseModel):
     covenants: List[dict]
 
 
+class CovenantValue(BaseModel):
+    """One reported covenant value"""
+    covenant_id: str
+    current_value: float = Field(..., allow_inf_nan=False)
+
+
+class BulkCovenantValuesRequest(BaseModel):
+    """Request model for a bulk covenant value submission"""
+    values: List[CovenantValue] = Field(..., min_length=1, max_length=MAX_BULK_COVENANT_VALUES)
+    tenant_id: Optional[str] = None
+    changed_by: Optional[str] = None  # Recorded in the audit trail
+    change_reason: Optional[str] = None
+
+
+def _encode_cursor(loan_id: str) -> str:
+    return base64.urlsafe_b64encode(loan_id.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor.encode(), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
 @router.get("/loans")
 async def list_loans(
+    response: Response,
     tenant_id: Optional[str] = None,
     status_filter: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: int = Query(DEFAULT_LOAN_PAGE_SIZE, ge=1, le=MAX_LOAN_PAGE_SIZE),
+    skip: int = Query(0, ge=0, description="Offset paging; ignored when a cursor is given"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated loan fields to return (omit `covenants` to skip them)"
+    ),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """List all loans for a tenant"""
+    """
+    List loans for a tenant, one page at a time, ordered by loan id
+    
+    Pages are keyset-paginated on (tenant_id, id): pass the `X-Next-Cursor`
+    response header back as `cursor` to get the next page. The header is
+    absent on the last page. Covenants for the page are loaded in one query.
+    
+    Responses are always paged: without `limit`, at most
+    DEFAULT_LOAN_PAGE_SIZE (100) loans are returned. Clients that relied on
+    the endpoint returning every loan must follow `X-Next-Cursor`.
+    `fields` must name at least one field.
+    """
     tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
     
-    query = db.query(Loan).filter(Loan.tenant_id == tenant_id)
+    if fields is None:
+        selected = list(LOAN_LIST_FIELDS)
+    else:
+        selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        if not selected:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="fields must name at least one loan field"
+            )
+        unknown = [f for f in selected if f not in LOAN_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown loan fields: {', '.join(unknown)}"
+            )
+    columns = [LOAN_LIST_FIELDS[f] for f in selected if f != "covenants"]
+    if Loan.id not in columns:
+        columns.insert(0, Loan.id)
+    
+    query = select(*columns).where(Loan.tenant_id == tenant_id)
     
     if status_filter:
-        query = query.filter(Loan.status == status_filter)
+        query = query.where(Loan.status == status_filter)
+    
+    if cursor is not None:
+        query = query.where(Loan.id > _decode_cursor(cursor))
+    elif skip:
+        query = query.offset(skip)
     
-    loans = query.all()
+    # One extra row tells whether another page follows
+    rows = (await db.execute(query.order_by(Loan.id).limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].id)
+    
+    covenants_by_loan: Dict[str, List[dict]] = defaultdict(list)
+    if "covenants" in selected and rows:
+        covenant_rows = await db.execute(select(*LOAN_LIST_COVENANT_COLUMNS).where(
+            Covenant.loan_id.in_([row.id for row in rows])
+        ).order_by(Covenant.loan_id, Covenant.id))
+        for c in covenant_rows:
+            covenants_by_loan[c.loan_id].append({
+                "id": c.id,
+                "clause_id": c.clause_id,
+                "name": c.name,
+                "current_value": c.current_value,
+                "threshold_value": c.threshold_value,
+                "operator": c.operator.value,
+                "status": c.status.value if c.status else None,
+                "cushion_percent": c.cushion_percent
+            })
     
     result = []
-    for loan in loans:
-        covenants = db.query(Covenant).filter(Covenant.loan_id == loan.id).all()
-        result.append({
-            "id": loan.id,
-            "company_name": loan.company_name,
-            "borrower_name": loan.borrower_name,
-            "sector": loan.sector,
-            "loan_amount": loan.loan_amount,
-            "currency": loan.currency,
-            "status": loan.status,
-            "covenants": [
-                {
-                    "id": c.id,
-                    "clause_id": c.clause_id,
-                    "name": c.name,
-                    "current_value": c.current_value,
-                    "threshold_value": c.threshold_value,
-                    "operator": c.operator.value,
-                    "status": c.status.value if c.status else None,
-                    "cushion_percent": c.cushion_percent
-                }
-                for c in covenants
-            ]
-        })
+    for row in rows:
+        loan = {f: getattr(row, f) for f in selected if f != "covenants"}
+        if "covenants" in selected:
+            loan["covenants"] = covenants_by_loan[row.id]
+        result.append(loan)
     
     return result
 
@@ -75,10 +201,10 @@ async def list_loans(
 @router.get("/loans/{loan_id}")
 async def get_loan(
     loan_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get detailed loan information"""
-    loan = db.query(Loan).filter(Loan.id == loan_id).first()
+    loan = await db.get(Loan, loan_id)
     
     if not loan:
         raise HTTPException(
@@ -86,7 +212,7 @@ async def get_loan(
             detail="Loan not found"
         )
     
-    covenants = db.query(Covenant).filter(Covenant.loan_id == loan_id).all()
+    covenants = (await db.scalars(select(Covenant).where(Covenant.loan_id == loan_id))).all()
     
     return {
         "id": loan.id,
@@ -126,10 +252,17 @@ async def get_loan(
 async def update_covenant_value(
     covenant_id: str,
     current_value: float,
-    db: Session = Depends(get_db)
+    changed_by: Optional[str] = None,
+    change_reason: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Update covenant current value (e.g., from quarterly reporting)"""
-    covenant = db.query(Covenant).filter(Covenant.id == covenant_id).first()
+    """
+    Update covenant current value (e.g., from quarterly reporting)
+    
+    The change is recorded in the covenant's audit trail by the background
+    audit writer, after the update commits.
+    """
+    covenant = await db.get(Covenant, covenant_id)
     
     if not covenant:
         raise HTTPException(
@@ -159,7 +292,6 @@ async def update_covenant_value(
     
     # Determine status
     if is_breached:
-        from app.models import CovenantStatus
         new_status = CovenantStatus.BREACH
     elif cushion < 5:
         new_status = CovenantStatus.WARNING
@@ -175,7 +307,27 @@ async def update_covenant_value(
     covenant.cushion_percent = cushion
     covenant.last_updated = datetime.now()
     
-    db.commit()
+    tenant_id = await db.scalar(select(Loan.tenant_id).where(Loan.id == covenant.loan_id))
+    await db.commit()
+    
+    # Re-evaluate just this loan in any pinned live scenarios, at the version
+    # this commit bumped to (read before the session begins again)
+    version = bumped_portfolio_version(db.sync_session, tenant_id)
+    if version is not None:
+        await run_in_threadpool(
+            get_live_scenario_registry().covenant_values_updated,
+            tenant_id, {covenant.id: (covenant.loan_id, current_value)}, version
+        )
+    
+    audit = audit_row(
+        covenant.id, old_value, current_value,
+        old_status.value if old_status else None, new_status.value,
+        AUDIT_SOURCE_MANUAL, changed_by, change_reason
+    )
+    if not get_covenant_audit_writer().submit(audit):
+        # Queue full: write it here rather than drop it
+        await db.run_sync(write_audit_rows, [audit])
+        await db.commit()
     
     return {
         "covenant_id": covenant.id,
@@ -186,3 +338,154 @@ async def update_covenant_value(
         "cushion_percent": cushion
     }
 
+
+@router.put("/covenants/values")
+async def update_covenant_values(
+    request: BulkCovenantValuesRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Submit many covenant values at once (e.g. quarterly reporting)
+    
+    Statuses and cushions follow the same rules as
+    `PUT /covenants/{covenant_id}/value`. Accepted values are written in a
+    single transaction; rejected items (unknown covenant, duplicate id,
+    zero threshold) are listed with a reason and do not block the rest.
+    Audit rows for every accepted item are bulk-inserted in the same
+    transaction.
+    """
+    tenant_id = request.tenant_id or settings.DEFAULT_TENANT_ID
+    
+    results, rejects, version = await db.run_sync(
+        apply_covenant_values, tenant_id, [(item.covenant_id, item.current_value) for item in request.values]
+    )
+    await db.run_sync(write_audit_rows, audit_rows_from_results(
+        results, AUDIT_SOURCE_BULK, request.changed_by, request.change_reason
+    ))
+    await db.commit()
+    
+    if version is not None:
+        # One version bump for the whole batch, so live scenarios update incrementally
+        await run_in_threadpool(
+            get_live_scenario_registry().covenant_values_updated,
+            tenant_id, {r["covenant_id"]: (r["loan_id"], r["new_value"]) for r in results}, version
+        )
+    
+    return {
+        "updated": len(results),
+        "rejected": len(rejects),
+        "results": results,
+        "rejects": rejects
+    }
+
+
+@router.get("/covenants/{covenant_id}/audit")
+async def get_covenant_audit(
+    covenant_id: str,
+    since: Optional[datetime] = Query(None, description="Only changes at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only changes before this time"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_AUDIT_PAGE_SIZE, ge=1, le=MAX_AUDIT_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_primary_read_db)
+):
+    """
+    Audit trail of a covenant's value changes, newest first
+    
+    Filtered by time range and paginated with skip/limit; served from the
+    (covenant_id, created_at) index. Changes from single updates appear
+    once the background audit writer has flushed them (about a second).
+    """
+    if await db.scalar(select(Covenant.id).where(Covenant.id == covenant_id)) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Covenant not found"
+        )
+    
+    query = select(CovenantAudit).where(CovenantAudit.covenant_id == covenant_id)
+    if since is not None:
+        query = query.where(CovenantAudit.created_at >= since)
+    if until is not None:
+        query = query.where(CovenantAudit.created_at < until)
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    
+    entries = (await db.scalars(query.order_by(
+        CovenantAudit.created_at.desc(), CovenantAudit.id.desc()
+    ).offset(skip).limit(limit))).all()
+    
+    return {
+        "covenant_id": covenant_id,
+        "entries": [
+            {
+                "id": a.id,
+                "old_value": a.old_value,
+                "new_value": a.new_value,
+                "old_status": a.old_status.value if a.old_status else None,
+                "new_status": a.new_status.value if a.new_status else None,
+                "changed_by": a.changed_by,
+                "change_reason": a.change_reason,
+                "source": a.source,
+                "created_at": a.created_at.isoformat() if a.created_at else None
+            }
+            for a in entries
+        ],
+        "pagination": {
+            "skip": skip,
+            "limit": limit,
+            "total": total
+        }
+    }
+
+
+@router.get("/covenants/history")
+async def get_covenants_history(
+    covenant_id: List[str] = Query(..., description="Covenant ids (repeat the parameter)"),
+    since: Optional[datetime] = Query(None, description="Only values recorded at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only values recorded before this time"),
+    interval: Optional[Literal["month", "quarter"]] = Query(
+        None, description="Keep only the last value of each month or quarter"
+    ),
+    db: AsyncSession = Depends(get_async_primary_read_db)
+):
+    """
+    Value history of many covenants at once, oldest first
+    
+    Every value change is recorded (single and bulk updates alike), so the
+    raw series can be long; `interval` downsamples it server-side to the
+    last value per month or quarter. Ids without history in the range map
+    to an empty list.
+    """
+    covenant_ids = list(dict.fromkeys(covenant_id))
+    if len(covenant_ids) > MAX_HISTORY_COVENANTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_HISTORY_COVENANTS} covenants per request"
+        )
+    
+    return {
+        "interval": interval,
+        "history": await db.run_sync(history_series, covenant_ids, since, until, interval)
+    }
+
+
+@router.get("/covenants/{covenant_id}/history")
+async def get_covenant_history(
+    covenant_id: str,
+    since: Optional[datetime] = Query(None, description="Only values recorded at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only values recorded before this time"),
+    interval: Optional[Literal["month", "quarter"]] = Query(
+        None, description="Keep only the last value of each month or quarter"
+    ),
+    db: AsyncSession = Depends(get_async_primary_read_db)
+):
+    """Value history of one covenant, oldest first (see GET /covenants/history)"""
+    if await db.scalar(select(Covenant.id).where(Covenant.id == covenant_id)) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Covenant not found"
+        )
+    
+    return {
+        "covenant_id": covenant_id,
+        "interval": interval,
+        "values": (await db.run_sync(history_series, [covenant_id], since, until, interval))[covenant_id]
+    }
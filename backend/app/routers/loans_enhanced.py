@@ -2,12 +2,17 @@
 Enhanced Loans Router with Mock Data
 Includes all required endpoints for GreenGauge API
 """
-from fastapi import APIRouter, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import random
 
+from app.async_database import get_async_db
+from app.models import Covenant
 from app.mock_data_generator import generate_loans, get_portfolio_summary
+from app.services.covenant_history import history_series
 
 router = APIRouter()
 
@@ -605,7 +610,8 @@ async def get_csrd_compliance_report(
 
 @router.post("/covenants/forecast")
 async def forecast_covenant_breach(
-    historical_data: Dict[str, Any]
+    historical_data: Dict[str, Any],
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Forecast covenant breach probability based on historical trend.
@@ -617,10 +623,29 @@ async def forecast_covenant_breach(
         "historicalValues": [2.8, 2.9, 3.1],
         "historicalDates": ["2024-10-20", "2024-11-20", "2024-12-20"]
     }
+    
+    Without "historicalValues", the covenant's stored history is used
+    (last value per month) and the threshold defaults to the covenant's.
     """
+    values = historical_data.get("historicalValues")
+    threshold = historical_data.get("threshold")
+    
+    if values is None and historical_data.get("covenantId"):
+        covenant_id = historical_data["covenantId"]
+        covenant = (await db.execute(
+            select(Covenant.loan_id, Covenant.threshold_value).where(Covenant.id == covenant_id)
+        )).first()
+        if covenant is None:
+            raise HTTPException(status_code=404, detail="Covenant not found")
+        points = (await db.run_sync(history_series, [covenant_id], interval="month"))[covenant_id]
+        values = [p["value"] for p in points]
+        historical_data.setdefault("loanId", covenant.loan_id)
+        if threshold is None:
+            threshold = covenant.threshold_value
+    
     # Simple trend analysis
-    values = historical_data.get("historicalValues", [])
-    threshold = historical_data.get("threshold", 4.0)
+    values = values or []
+    threshold = 4.0 if threshold is None else threshold
     
     if len(values) < 2:
         raise HTTPException(status_code=400, detail="Need at least 2 historical data points")
@@ -2,27 +2,106 @@
 Covenant Breach Simulation Router
 Stress testing and risk heatmap generation
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
-from typing import Optional
-import uuid
-from datetime import datetime
-
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, Any, Callable, Optional, Dict, List, Literal
+import math
+from datetime import date, datetime
+
+from app.async_database import get_async_db, get_async_primary_read_db, get_async_read_db
 from app.models import StressTestResult
 from app.config import settings
 from app.services.simulation_service import SimulationService
+from app.services.monte_carlo import (
+    EBITDA_DROP_RANGE,
+    RATE_HIKE_RANGE,
+    MonteCarloSpec,
+    ShockDistribution,
+    run_monte_carlo,
+)
+from app.services.portfolio_loader import PortfolioFilter
+from app.services.projection import load_projection_inputs
+from app.services.breakpoint_index import get_breakpoint_index_cache
+from app.services.stress_engine import evaluate_grid
+from app.services.factor_model import DEFAULT_WORKING_CAPITAL_STRESS_PERCENT, FactorShocks
+from app.services.stress_results import (
+    diff_stress_tests,
+    query_loan_results,
+    filter_legacy_loans,
+    is_legacy_result,
+)
+from app.services.live_scenarios import LiveScenario, LiveScenarioLimitReached, get_live_scenario_registry
+from app.services.stress_jobs import JOB_COMPLETED, JobQueueFull, get_stress_job_manager
 
 router = APIRouter()
 
+# Maximum number of scenarios evaluated by one grid request
+MAX_GRID_SCENARIOS = 10_000
+
+# Smallest step of a start/stop/step grid axis
+MIN_GRID_STEP = 1e-6
+
+# Maximum explicit loan ids in one stress test filter
+MAX_FILTER_LOAN_IDS = 10_000
+
+# Longest forward projection, in quarters
+MAX_PROJECTION_QUARTERS = 40
+
 
 class StressTestRequest(BaseModel):
     """Request model for stress test simulation"""
     ebitda_drop_percent: float = Field(..., ge=0, le=100, description="EBITDA drop percentage (0-100)")
     interest_rate_hike_bps: float = Field(..., ge=0, description="Interest rate hike in basis points")
     tenant_id: Optional[str] = None
-    loan_ids: Optional[list[str]] = None  # Optional: filter to specific loans
+    # Optional loan subset, applied in the portfolio query
+    loan_ids: Optional[list[str]] = Field(None, max_length=MAX_FILTER_LOAN_IDS)
+    sectors: Optional[List[str]] = None
+    relationship_managers: Optional[List[str]] = None
+    statuses: Optional[List[str]] = Field(None, description="Loan statuses (default: active and watchlist)")
+    min_loan_amount: Optional[float] = Field(None, ge=0)
+    max_loan_amount: Optional[float] = Field(None, ge=0)
+    # Optional extra stress factors; the defaults reproduce the two-parameter model
+    sector_ebitda_drop_percent: Optional[Dict[str, Annotated[float, Field(ge=0, le=100)]]] = Field(
+        None, description="EBITDA drop per sector, overriding ebitda_drop_percent"
+    )
+    working_capital_stress_percent: float = Field(
+        DEFAULT_WORKING_CAPITAL_STRESS_PERCENT, ge=0, lt=100,
+        description="Drop in current ratio from working capital stress"
+    )
+    capex_shock_percent: float = Field(
+        0.0, ge=0, lt=100, description="Cut in cash available for debt service from higher capex (DSCR)"
+    )
+    # Rollups computed in the same pass, e.g. ["sector", "relationship_manager"]
+    group_by: List[Literal["sector", "relationship_manager", "currency"]] = Field(default_factory=list)
+    include_loans: bool = Field(True, description="Set false to return only summary and rollups")
+    
+    def to_filter(self) -> Optional[PortfolioFilter]:
+        """The requested loan subset, or None to test the whole active book"""
+        return PortfolioFilter.from_values(
+            loan_ids=self.loan_ids,
+            sectors=self.sectors,
+            relationship_managers=self.relationship_managers,
+            statuses=self.statuses,
+            min_loan_amount=self.min_loan_amount,
+            max_loan_amount=self.max_loan_amount
+        )
+    
+    def to_factors(self) -> Optional[FactorShocks]:
+        """The extra factor shocks, or None for the plain two-parameter scenario"""
+        return FactorShocks.from_values(
+            sector_ebitda_drop_percent=self.sector_ebitda_drop_percent,
+            working_capital_stress_percent=self.working_capital_stress_percent,
+            capex_shock_percent=self.capex_shock_percent
+        )
+    
+    def group_keys(self) -> tuple:
+        """Requested rollup keys, deduplicated in order"""
+        return tuple(dict.fromkeys(self.group_by))
 
 
 class StressTestResponse(BaseModel):
@@ -34,10 +113,109 @@ class StressTestResponse(BaseModel):
     created_at: str
 
 
+class GridAxis(BaseModel):
+    """Scenario axis given either as explicit values or as an inclusive range"""
+    values: Optional[List[float]] = Field(None, max_length=MAX_GRID_SCENARIOS)
+    start: Optional[float] = Field(None, allow_inf_nan=False)
+    stop: Optional[float] = Field(None, allow_inf_nan=False)
+    step: Optional[float] = Field(None, ge=MIN_GRID_STEP, allow_inf_nan=False)
+
+    @model_validator(mode="after")
+    def check_spec(self):
+        if self.values is None and None in (self.start, self.stop, self.step):
+            raise ValueError("Provide either values or start/stop/step")
+        if self.values is None and self.stop < self.start:
+            raise ValueError("stop must be >= start")
+        return self
+
+    def size(self) -> int:
+        """
+        Number of scenario values, computed without expanding the axis
+
+        Capped at MAX_GRID_SCENARIOS + 1, which is already too many.
+        """
+        if self.values is not None:
+            return len(self.values)
+        steps = (self.stop - self.start) / self.step + 1e-9
+        return int(math.floor(min(steps, MAX_GRID_SCENARIOS))) + 1
+
+    def resolve(self) -> List[float]:
+        """Expand the axis into its list of scenario values"""
+        if self.values is not None:
+            return list(self.values)
+        return [round(self.start + i * self.step, 10) for i in range(self.size())]
+
+
+class ScenarioGridRequest(BaseModel):
+    """Request model for an EBITDA drop x rate hike scenario grid"""
+    ebitda_drop_percent: GridAxis
+    interest_rate_hike_bps: GridAxis
+    tenant_id: Optional[str] = None
+    include_loan_surfaces: bool = False  # Per-loan status surfaces (can be large)
+
+
+class ShockDistributionModel(BaseModel):
+    """Distribution of one stress factor across Monte Carlo paths"""
+    distribution: Literal["normal", "lognormal", "uniform", "fixed"] = "normal"
+    mean: float = 0.0
+    std: float = Field(0.0, ge=0)
+    low: float = 0.0  # uniform only
+    high: float = 0.0  # uniform only
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+    def to_distribution(self) -> ShockDistribution:
+        return ShockDistribution(**self.model_dump())
+
+
+class MonteCarloRequest(BaseModel):
+    """Request model for a Monte Carlo stress simulation"""
+    paths: int = Field(10_000, ge=1, le=1_000_000)
+    ebitda_drop_percent: ShockDistributionModel
+    interest_rate_hike_bps: ShockDistributionModel
+    sector_correlation: Optional[float] = Field(
+        None, ge=0, le=1, description="Correlate EBITDA shocks across sectors (omit for one shock per path)"
+    )
+    seed: int = 0
+    percentiles: List[float] = Field(default_factory=lambda: [50, 90, 95, 99])
+    tenant_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_shocks(self):
+        # Draws are truncated to each factor's domain, which must hold some probability
+        self.ebitda_drop_percent.to_distribution().check(*EBITDA_DROP_RANGE, label="ebitda_drop_percent")
+        self.interest_rate_hike_bps.to_distribution().check(*RATE_HIKE_RANGE, label="interest_rate_hike_bps")
+        return self
+
+
+class ProjectionRequest(BaseModel):
+    """Request model for a multi-quarter covenant projection"""
+    quarters: int = Field(8, ge=1, le=MAX_PROJECTION_QUARTERS)
+    # One value holds the shock constant; otherwise one value per quarter
+    ebitda_drop_percent: List[Annotated[float, Field(ge=0, le=100)]] = Field(..., min_length=1)
+    interest_rate_hike_bps: List[Annotated[float, Field(ge=0)]] = Field(..., min_length=1)
+    as_of_date: Optional[date] = None  # Default: today
+    tenant_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_paths(self):
+        for path in (self.ebitda_drop_percent, self.interest_rate_hike_bps):
+            if len(path) not in (1, self.quarters):
+                raise ValueError("Shock paths need one value or one value per quarter")
+        return self
+
+    def shock_paths(self) -> tuple:
+        """The EBITDA drop and rate hike paths expanded to one value per quarter"""
+        def expand(path: List[float]) -> List[float]:
+            return path * self.quarters if len(path) == 1 else list(path)
+        return expand(self.ebitda_drop_percent), expand(self.interest_rate_hike_bps)
+
+
 @router.post("/simulate-stress-test", response_model=StressTestResponse)
 async def simulate_stress_test(
     request: StressTestRequest,
-    db: Session = Depends(get_db)
+    stream: bool = Query(False, description="Stream NDJSON: one line per loan, then a summary line"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Simulate stress scenario and identify covenant breaches
@@ -45,43 +223,79 @@ async def simulate_stress_test(
     Takes stress parameters:
     - EBITDA drop percentage
     - Interest rate hike (basis points)
+    - Optional loan subset: loan_ids, sectors, relationship_managers,
+      statuses, min/max_loan_amount (filtered in the database query)
+    - Optional extra factors: per-sector EBITDA drops, working capital
+      stress (default 10%, i.e. current ratio x 0.9) and a capex shock
+      to DSCR cash flow
+    - Optional `group_by` (sector, relationship_manager, currency): adds
+      `rollups` with loan counts, exposure and worst cushion per group;
+      with `include_loans: false` the per-loan entries are left out
     
     Returns risk heatmap categorizing loans as:
     - "Breach": Covenant threshold exceeded
     - "At Risk": Within 5% of threshold
     - "Safe": Well within limits
+    
+    With `?stream=true` the response is `application/x-ndjson`: one JSON
+    line per loan as it is produced, then a trailing line with the
+    `test_id` and summary counts.
     """
     tenant_id = request.tenant_id or settings.DEFAULT_TENANT_ID
+    filters = request.to_filter()
+    factors = request.to_factors()
+    group_by = request.group_keys()
     
     # Initialize simulation service
     sim_service = SimulationService()
     
+    # Queries run on the event loop; the NumPy evaluation in a worker thread
+    if stream:
+        evaluate = await db.run_sync(
+            sim_service.prepare_scenario, tenant_id, request.ebitda_drop_percent,
+            request.interest_rate_hike_bps, filters, factors
+        )
+        lines = await run_in_threadpool(
+            sim_service.stream_scenario,
+            evaluate,
+            tenant_id=tenant_id,
+            ebitda_drop_percent=request.ebitda_drop_percent,
+            interest_rate_hike_bps=request.interest_rate_hike_bps,
+            filters=filters,
+            factors=factors,
+            group_by=group_by
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    
     # Run simulation
-    risk_heatmap = sim_service.simulate_stress_test(
-        db=db,
+    simulate = await db.run_sync(lambda session: sim_service.prepare_stress_test(
+        db=session,
         tenant_id=tenant_id,
         ebitda_drop_percent=request.ebitda_drop_percent,
-        interest_rate_hike_bps=request.interest_rate_hike_bps
-    )
+        interest_rate_hike_bps=request.interest_rate_hike_bps,
+        filters=filters,
+        factors=factors,
+        group_by=group_by
+    ))
+    risk_heatmap = await run_in_threadpool(simulate)
     
     # Save results to database
-    test_id = f"test-{uuid.uuid4().hex[:8]}"
-    test_result = StressTestResult(
-        id=test_id,
+    test_result = await db.run_sync(lambda session: sim_service.save_stress_test(
+        db=session,
         tenant_id=tenant_id,
         ebitda_drop_percent=request.ebitda_drop_percent,
         interest_rate_hike_bps=request.interest_rate_hike_bps,
-        total_loans_tested=risk_heatmap["summary"]["total_loans"],
-        loans_breached=risk_heatmap["summary"]["loans_breached"],
-        loans_at_risk=risk_heatmap["summary"]["loans_at_risk"],
-        loans_safe=risk_heatmap["summary"]["loans_safe"],
-        risk_heatmap=risk_heatmap
-    )
-    db.add(test_result)
-    db.commit()
+        risk_heatmap=risk_heatmap,
+        filters=filters,
+        factors=factors
+    ))
+    
+    if not request.include_loans:
+        # The heatmap may be cached and shared, so copy rather than mutate
+        risk_heatmap = {key: value for key, value in risk_heatmap.items() if key != "loans"}
     
     return StressTestResponse(
-        test_id=test_id,
+        test_id=test_result.id,
         ebitda_drop_percent=request.ebitda_drop_percent,
         interest_rate_hike_bps=request.interest_rate_hike_bps,
         risk_heatmap=risk_heatmap,
@@ -89,15 +303,406 @@ async def simulate_stress_test(
     )
 
 
+@router.post("/simulate-stress-test/grid")
+async def simulate_scenario_grid(
+    request: ScenarioGridRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Evaluate a grid of stress scenarios in one call
+    
+    Every combination of the EBITDA drop and interest rate hike axes is
+    evaluated against a single portfolio load. Returns loan counts per
+    status as matrices indexed [ebitda][rate]. Results are not persisted.
+    """
+    tenant_id = request.tenant_id or settings.DEFAULT_TENANT_ID
+    ebitda_count = request.ebitda_drop_percent.size()
+    rate_count = request.interest_rate_hike_bps.size()
+    
+    if not ebitda_count or not rate_count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Both grid axes need at least one value"
+        )
+    # Checked before the axes are expanded
+    if ebitda_count * rate_count > MAX_GRID_SCENARIOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Grid exceeds {MAX_GRID_SCENARIOS} scenarios"
+        )
+    ebitda_values = request.ebitda_drop_percent.resolve()
+    rate_values = request.interest_rate_hike_bps.resolve()
+    if any(v < 0 or v > 100 for v in ebitda_values) or any(v < 0 for v in rate_values):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="EBITDA drop must be within 0-100 and rate hikes must be >= 0"
+        )
+    
+    snapshot = await db.run_sync(SimulationService.load_snapshot, tenant_id)
+    grid = await run_in_threadpool(
+        evaluate_grid, snapshot, ebitda_values, rate_values,
+        include_loan_surfaces=request.include_loan_surfaces
+    )
+    
+    response = {
+        "ebitda_drop_percent": ebitda_values,
+        "interest_rate_hike_bps": rate_values,
+        "total_loans": len(grid.loan_ids),
+        "loans_breached": grid.loans_breached.tolist(),
+        "loans_at_risk": grid.loans_at_risk.tolist(),
+        "loans_safe": grid.loans_safe.tolist()
+    }
+    if grid.loan_surfaces is not None:
+        response["status_codes"] = {"0": "safe", "1": "at_risk", "2": "breach"}
+        response["loan_surfaces"] = [
+            {"loan_id": loan_id, "statuses": surface}
+            for loan_id, surface in zip(grid.loan_ids, grid.loan_surfaces.tolist())
+        ]
+    return response
+
+
+@router.post("/simulate-stress-test/monte-carlo")
+async def simulate_monte_carlo(
+    request: MonteCarloRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Monte Carlo stress simulation
+    
+    Draws EBITDA and rate shocks from the requested distributions
+    (optionally sector-correlated) and returns each loan's breach
+    probability plus percentiles of breached exposure across paths.
+    Results are reproducible for a given seed. Nothing is persisted.
+    """
+    tenant_id = request.tenant_id or settings.DEFAULT_TENANT_ID
+    
+    if any(p < 0 or p > 100 for p in request.percentiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Percentiles must be within 0-100"
+        )
+    
+    spec = MonteCarloSpec(
+        paths=request.paths,
+        ebitda_drop_percent=request.ebitda_drop_percent.to_distribution(),
+        interest_rate_hike_bps=request.interest_rate_hike_bps.to_distribution(),
+        sector_correlation=request.sector_correlation,
+        seed=request.seed,
+        percentiles=request.percentiles
+    )
+    
+    # Load on the event loop, then keep the path simulation off it
+    snapshot = await db.run_sync(SimulationService.load_snapshot, tenant_id)
+    return await run_in_threadpool(
+        run_monte_carlo, snapshot, spec, workers=settings.MONTE_CARLO_WORKERS
+    )
+
+
+@router.post("/simulate-stress-test/projection")
+async def project_stress_test(
+    request: ProjectionRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Project covenants forward quarter by quarter
+    
+    Applies the shock path (cumulative EBITDA drop and rate hike per
+    quarter) to current values, tests each covenant at its monitoring
+    frequency while its loan is outstanding, and reports the first quarter
+    in which each loan breaches. Nothing is persisted.
+    """
+    tenant_id = request.tenant_id or settings.DEFAULT_TENANT_ID
+    ebitda_path, rate_path = request.shock_paths()
+    
+    inputs = await db.run_sync(load_projection_inputs, tenant_id)
+    return await run_in_threadpool(
+        SimulationService.project_inputs, inputs, ebitda_path, rate_path, as_of=request.as_of_date
+    )
+
+
+@router.get("/simulate-stress-test/summary")
+async def stress_summary(
+    ebitda_drop_percent: float = Query(..., ge=0, le=100),
+    interest_rate_hike_bps: float = Query(0, ge=0),
+    tenant_id: Optional[str] = None,
+    loan_ids: Optional[List[str]] = Query(None, max_length=MAX_FILTER_LOAN_IDS),
+    sectors: Optional[List[str]] = Query(None),
+    relationship_managers: Optional[List[str]] = Query(None),
+    statuses: Optional[List[str]] = Query(None),
+    min_loan_amount: Optional[float] = Query(None, ge=0),
+    max_loan_amount: Optional[float] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Loan status counts for a stress scenario, evaluated in the database
+    
+    For dashboards that only need counts: covenant classification runs as
+    SQL CASE expressions grouped by loan, so no covenant rows are loaded.
+    Accepts the same loan subset filters as `POST /simulate-stress-test`.
+    Nothing is persisted.
+    """
+    tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+    filters = PortfolioFilter.from_values(
+        loan_ids=loan_ids,
+        sectors=sectors,
+        relationship_managers=relationship_managers,
+        statuses=statuses,
+        min_loan_amount=min_loan_amount,
+        max_loan_amount=max_loan_amount
+    )
+    
+    sim_service = SimulationService()
+    summarize = await db.run_sync(lambda session: sim_service.prepare_stress_summary(
+        db=session,
+        tenant_id=tenant_id,
+        ebitda_drop_percent=ebitda_drop_percent,
+        interest_rate_hike_bps=interest_rate_hike_bps,
+        filters=filters
+    ))
+    summary = await run_in_threadpool(summarize)
+    
+    return {
+        "ebitda_drop_percent": ebitda_drop_percent,
+        "interest_rate_hike_bps": interest_rate_hike_bps,
+        "summary": summary
+    }
+
+
+@router.get("/simulate-stress-test/breakpoints/summary")
+async def breakpoint_summary(
+    ebitda_drop_percent: float = Query(..., ge=0, le=100),
+    interest_rate_hike_bps: float = Query(0, ge=0),
+    tenant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Instant loan status counts for a stress scenario
+    
+    Answered by binary search over the tenant's precomputed breakpoint
+    index rather than a portfolio scan. Nothing is persisted.
+    """
+    tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+    
+    # Building a missing index is CPU-bound, so it runs in a worker thread
+    build_index = await db.run_sync(
+        get_breakpoint_index_cache().prepare_index, tenant_id, interest_rate_hike_bps
+    )
+    summary = (await run_in_threadpool(build_index)).summary(ebitda_drop_percent)
+    
+    return {
+        "ebitda_drop_percent": ebitda_drop_percent,
+        "interest_rate_hike_bps": interest_rate_hike_bps,
+        "summary": summary
+    }
+
+
+@router.get("/simulate-stress-test/breakpoints/reverse")
+async def reverse_stress_test(
+    interest_rate_hike_bps: float = Query(0, ge=0),
+    tenant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Reverse stress test: smallest EBITDA drop that breaches each loan
+    
+    Also reports the drop at which each loan first becomes at risk. Loans
+    that cannot breach within a 100% drop are reported with null.
+    """
+    tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+    
+    build_index = await db.run_sync(
+        get_breakpoint_index_cache().prepare_index, tenant_id, interest_rate_hike_bps
+    )
+    loans = await run_in_threadpool(lambda: build_index().reverse_stress())
+    
+    return {
+        "interest_rate_hike_bps": interest_rate_hike_bps,
+        "loans": loans
+    }
+
+
+@router.post("/simulate-stress-test/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_stress_test_job(request: StressTestRequest):
+    """
+    Queue a stress test on the background worker pool
+
+    Returns immediately with a job id. Poll `GET /simulate-stress-test/jobs/{job_id}`
+    for progress; the stress test result is saved only once the job completes.
+    """
+    tenant_id = request.tenant_id or settings.DEFAULT_TENANT_ID
+
+    try:
+        job = get_stress_job_manager().submit(
+            tenant_id=tenant_id,
+            ebitda_drop_percent=request.ebitda_drop_percent,
+            interest_rate_hike_bps=request.interest_rate_hike_bps,
+            filters=request.to_filter(),
+            factors=request.to_factors(),
+            group_by=request.group_keys()
+        )
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many stress test jobs queued, retry later"
+        )
+
+    return job.to_dict()
+
+
+def _get_job_or_404(job_id: str):
+    job = get_stress_job_manager().get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stress test job not found"
+        )
+    return job
+
+
+@router.get("/simulate-stress-test/jobs/{job_id}")
+async def get_stress_test_job(job_id: str):
+    """Get the status and progress of a stress test job"""
+    return _get_job_or_404(job_id).to_dict()
+
+
+@router.delete("/simulate-stress-test/jobs/{job_id}")
+async def cancel_stress_test_job(job_id: str):
+    """Cancel a queued or running stress test job"""
+    _get_job_or_404(job_id)
+    return get_stress_job_manager().cancel(job_id).to_dict()
+
+
+@router.get("/simulate-stress-test/jobs/{job_id}/result")
+async def get_stress_test_job_result(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_primary_read_db)
+):
+    """Retrieve the stress test result produced by a completed job"""
+    job = _get_job_or_404(job_id)
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Stress test job is {job.status}"
+        )
+
+    return await get_stress_test_result(job.test_id, status_filter=None, sort=None, skip=0, limit=None, db=db)
+
+
+@router.post("/simulate-stress-test/live", status_code=status.HTTP_201_CREATED)
+async def pin_live_scenario(
+    request: StressTestRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Pin a live stress scenario
+    
+    The scenario's per-loan results and summary are kept up to date as
+    covenant values change: `PUT /covenants/{covenant_id}/value` re-evaluates
+    only the affected loan. Pinned scenarios live in this process's memory.
+    Live scenarios use the two-parameter model only.
+    """
+    tenant_id = request.tenant_id or settings.DEFAULT_TENANT_ID
+    
+    if request.to_factors() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Live scenarios do not support sector, working capital or capex factors"
+        )
+    
+    try:
+        pin = await db.run_sync(
+            get_live_scenario_registry().prepare_pin,
+            tenant_id=tenant_id,
+            ebitda_drop_percent=request.ebitda_drop_percent,
+            interest_rate_hike_bps=request.interest_rate_hike_bps,
+            filters=request.to_filter(),
+            group_by=request.group_keys()
+        )
+        scenario = await run_in_threadpool(pin)
+    except LiveScenarioLimitReached:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"At most {settings.LIVE_SCENARIO_LIMIT} live scenarios can be pinned"
+        )
+    
+    return await run_in_threadpool(scenario.to_dict)
+
+
+@router.get("/simulate-stress-test/live")
+async def list_live_scenarios(
+    tenant_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_primary_read_db)
+):
+    """List pinned live scenarios with their current summaries"""
+    tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+    registry = get_live_scenario_registry()
+    
+    def render(get: Callable[[], Optional[LiveScenario]]) -> Optional[Dict[str, Any]]:
+        scenario = get()
+        return scenario.to_dict() if scenario is not None else None
+    
+    # Rebuilds and renders take the scenarios' locks, off the event loop
+    rendered = [
+        await run_in_threadpool(render, await db.run_sync(registry.prepare_get, s.id))
+        for s in registry.list(tenant_id)
+    ]
+    return [data for data in rendered if data is not None]
+
+
+@router.get("/simulate-stress-test/live/{scenario_id}")
+async def get_live_scenario(
+    scenario_id: str,
+    status_filter: Optional[Literal["breach", "at_risk", "safe"]] = Query(
+        None, alias="status", description="Only loans with this overall status"
+    ),
+    include_loans: bool = Query(True, description="Include per-loan results"),
+    db: AsyncSession = Depends(get_async_primary_read_db)
+):
+    """Current results of a live scenario"""
+    scenario = await run_in_threadpool(await db.run_sync(get_live_scenario_registry().prepare_get, scenario_id))
+    if not scenario:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Live scenario not found"
+        )
+    
+    # Rendered under the scenario's lock, off the event loop
+    return await run_in_threadpool(scenario.to_dict, include_loans=include_loans, status_filter=status_filter)
+
+
+@router.delete("/simulate-stress-test/live/{scenario_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def unpin_live_scenario(scenario_id: str):
+    """Unpin a live scenario"""
+    if not get_live_scenario_registry().unpin(scenario_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Live scenario not found"
+        )
+
+
 @router.get("/simulate-stress-test/{test_id}")
 async def get_stress_test_result(
     test_id: str,
-    db: Session = Depends(get_db)
+    status_filter: Optional[Literal["breach", "at_risk", "safe"]] = Query(
+        None, alias="status", description="Only loans with this overall status"
+    ),
+    sort: Optional[Literal["breach_margin", "-breach_margin"]] = Query(
+        None, description="Order loans by their largest covenant breach margin"
+    ),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_primary_read_db)
 ):
-    """Retrieve a previously run stress test result"""
-    test_result = db.query(StressTestResult).filter(
-        StressTestResult.id == test_id
-    ).first()
+    """
+    Retrieve a previously run stress test result
+    
+    Loans can be filtered by overall status, sorted by breach margin
+    (`-breach_margin` for most breached first) and paginated with
+    skip/limit. `pagination.total` counts the loans matching the filter.
+    """
+    # Loaded in full: a deferred risk_heatmap couldn't be lazy-loaded here,
+    # and it is NULL for every run that isn't a legacy blob
+    test_result = await db.get(StressTestResult, test_id)
     
     if not test_result:
         raise HTTPException(
@@ -105,41 +710,104 @@ async def get_stress_test_result(
             detail="Stress test result not found"
         )
     
+    summary = {
+        "total_loans_tested": test_result.total_loans_tested,
+        "loans_breached": test_result.loans_breached,
+        "loans_at_risk": test_result.loans_at_risk,
+        "loans_safe": test_result.loans_safe
+    }
+    
+    if is_legacy_result(test_result):
+        total, loans = filter_legacy_loans(
+            test_result.risk_heatmap.get("loans", []), status_filter, sort, skip, limit
+        )
+        heatmap_summary = test_result.risk_heatmap.get("summary", {})
+    else:
+        total, loans = await db.run_sync(query_loan_results, test_id, status_filter, sort, skip, limit)
+        heatmap_summary = {
+            "total_loans": test_result.total_loans_tested,
+            "loans_breached": test_result.loans_breached,
+            "loans_at_risk": test_result.loans_at_risk,
+            "loans_safe": test_result.loans_safe
+        }
+    
     return {
         "test_id": test_result.id,
         "ebitda_drop_percent": test_result.ebitda_drop_percent,
         "interest_rate_hike_bps": test_result.interest_rate_hike_bps,
-        "summary": {
-            "total_loans_tested": test_result.total_loans_tested,
-            "loans_breached": test_result.loans_breached,
-            "loans_at_risk": test_result.loans_at_risk,
-            "loans_safe": test_result.loans_safe
+        "filters": test_result.filters,
+        "factors": test_result.factors,
+        "summary": summary,
+        "rollups": test_result.rollups,
+        "risk_heatmap": {
+            "loans": loans,
+            "summary": heatmap_summary
+        },
+        "pagination": {
+            "skip": skip,
+            "limit": limit,
+            "total": total
         },
-        "risk_heatmap": test_result.risk_heatmap,
         "created_at": test_result.created_at.isoformat() if test_result.created_at else None
     }
 
 
+@router.get("/simulate-stress-test/{test_id}/diff/{other_test_id}")
+async def diff_stress_test_results(
+    test_id: str,
+    other_test_id: str,
+    min_cushion_delta: Optional[float] = Query(
+        None, ge=0, description="Also list covenants whose cushion moved by at least this many points"
+    ),
+    db: AsyncSession = Depends(get_async_primary_read_db)
+):
+    """
+    What changed between two stored stress tests
+    
+    `test_id` is the baseline and `other_test_id` the later run. Returns the
+    loans and covenants whose status changed, cushion deltas, status
+    transition counts and the movement in summary counts.
+    """
+    results = {
+        r.id: r for r in await db.scalars(select(StressTestResult).where(
+            StressTestResult.id.in_([test_id, other_test_id])
+        ))
+    }
+    missing = [i for i in (test_id, other_test_id) if i not in results]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Stress test result not found: {missing[0]}"
+        )
+    
+    return await db.run_sync(diff_stress_tests, results[test_id], results[other_test_id], min_cushion_delta)
+
+
 @router.get("/simulate-stress-test")
 async def list_stress_tests(
     tenant_id: Optional[str] = None,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_primary_read_db)
 ):
     """List recent stress test results"""
     tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
     
-    query = db.query(StressTestResult).filter(
+    query = select(StressTestResult).options(
+        defer(StressTestResult.risk_heatmap)
+    ).where(
         StressTestResult.tenant_id == tenant_id
     ).order_by(StressTestResult.created_at.desc()).limit(limit)
     
-    results = query.all()
+    results = (await db.scalars(query)).all()
     
     return [
         {
             "test_id": r.id,
             "ebitda_drop_percent": r.ebitda_drop_percent,
             "interest_rate_hike_bps": r.interest_rate_hike_bps,
+            "filters": r.filters,
+            "factors": r.factors,
+            "rollups": r.rollups,
             "summary": {
                 "total_loans_tested": r.total_loans_tested,
                 "loans_breached": r.loans_breached,
@@ -0,0 +1,123 @@
+"""
+Schema Bootstrap
+Startup schema check: no DDL while the stored fingerprint matches the models, Alembic migrations otherwise
+"""
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import MetaData, delete, inspect, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.models import Base, Loan, SchemaFingerprint
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[1] / "alembic.ini"
+
+# First migration: the schema init_db used to create with create_all
+BASELINE_REVISION = "0001"
+
+# pg_advisory_xact_lock key, so workers of a rolling deploy migrate one at a time
+MIGRATION_LOCK_KEY = 7_261_001
+
+
+def schema_fingerprint(metadata: MetaData = Base.metadata) -> str:
+    """SHA-256 of the tables, columns, keys and indexes the models declare"""
+    tables = [
+        {
+            "name": table.name,
+            "columns": [
+                [
+                    column.name,
+                    repr(column.type),
+                    column.nullable,
+                    column.primary_key,
+                    sorted(fk.target_fullname for fk in column.foreign_keys),
+                ]
+                for column in table.columns
+            ],
+            "indexes": sorted(
+                [index.name, [column.name for column in index.columns], bool(index.unique)]
+                for index in table.indexes
+            ),
+        }
+        for table in sorted(metadata.tables.values(), key=lambda t: t.name)
+    ]
+    return hashlib.sha256(json.dumps(tables, sort_keys=True).encode()).hexdigest()
+
+
+def alembic_config(connection: Optional[Connection] = None) -> Config:
+    """Alembic config for backend/alembic.ini, running on `connection` when given"""
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def stored_fingerprint(connection: Connection) -> Optional[str]:
+    """Fingerprint recorded by the last bootstrap, None for a new or pre-migration database"""
+    if not inspect(connection).has_table(SchemaFingerprint.__tablename__):
+        return None
+    return connection.execute(select(SchemaFingerprint.fingerprint)).scalar()
+
+
+def store_fingerprint(connection: Connection, fingerprint: str):
+    connection.execute(delete(SchemaFingerprint))
+    connection.execute(insert(SchemaFingerprint).values(id=1, fingerprint=fingerprint))
+
+
+def mark_schema_current(connection: Connection):
+    """Record a schema created from the current models (create_all) as fully migrated"""
+    command.stamp(alembic_config(connection), "head", purge=True)
+    store_fingerprint(connection, schema_fingerprint())
+
+
+def bootstrap_schema(engine: Engine) -> bool:
+    """
+    Bring the database schema up to the models; returns whether DDL ran
+
+    The common case (a restart against an up-to-date database) is one
+    SELECT: the stored fingerprint matches and nothing else happens.
+    Otherwise pending Alembic migrations are applied, under an advisory
+    lock on PostgreSQL. A database created by create_all before migrations
+    existed (tables but no alembic_version) is adopted as the baseline
+    revision first. Data is never dropped.
+
+    The fingerprint is stored only when the migrated schema matches the
+    models; if a model change has no migration yet, a warning is logged
+    and the check runs again on the next start.
+    """
+    fingerprint = schema_fingerprint()
+    with engine.connect() as connection:
+        if stored_fingerprint(connection) == fingerprint:
+            return False
+
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            # Another worker may have migrated while this one waited
+            if stored_fingerprint(connection) == fingerprint:
+                return False
+
+        config = alembic_config(connection)
+        tables = set(inspect(connection).get_table_names())
+        if "alembic_version" not in tables and Loan.__tablename__ in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+
+        diffs = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+        if diffs:
+            logger.warning("[SCHEMA] Models differ from the migrated schema (missing migration?): %s", diffs)
+        else:
+            store_fingerprint(connection, fingerprint)
+
+    logger.info("[SCHEMA] Database migrated to the current models")
+    return True
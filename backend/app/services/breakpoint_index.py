@@ -0,0 +1,495 @@
+"""
+Stress Test Breakpoint Index
+Closed-form critical EBITDA drops per covenant, searchable per tenant
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.portfolio_loader import load_portfolio_snapshot
+from app.services.portfolio_version import PortfolioCache
+from app.services.stress_engine import (
+    PortfolioSnapshot,
+    KIND_LEVERAGE,
+    KIND_CURRENT_RATIO,
+    KIND_DEFAULT,
+    OP_LESS_THAN,
+    OP_LESS_THAN_EQUAL,
+    OP_GREATER_THAN,
+    OP_EQUAL,
+    STATUS_BREACH,
+    STATUS_AT_RISK,
+    AT_RISK_CUSHION_PERCENT,
+    classify_breaches,
+    evaluate_scenario,
+    evaluate_grid,
+    stress_values,
+)
+
+# Resolution used for loans whose covenants have no closed-form breakpoint
+RESIDUAL_SEARCH_STEP = 0.01
+
+# How far (in drop percentage points) rounding can move a closed-form
+# breakpoint away from the drop at which the engine changes its answer
+SNAP_TOLERANCE = 1e-6
+
+
+def covenant_breakpoints(
+    snapshot: PortfolioSnapshot,
+    level: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Solve, per covenant, for the EBITDA drops at which it reaches `level`
+
+    `level` is STATUS_BREACH or STATUS_AT_RISK (meaning at risk or worse).
+    Every stressed value is monotonic in the EBITDA drop, so the drops at
+    which a covenant is at `level` form either a suffix [start, inf) or a
+    prefix (-inf, end]. Leverage-style breakpoints do not depend on the rate
+    hike; coverage-style ones are linear in the rate multiplier g:
+
+        start(g) = min(start_fixed, 100 + g * start_slope)
+        end(g) = max(end_fixed, 100 + g * end_slope)
+
+    Returns (start_fixed, start_slope, end_fixed, end_slope, closed), using
+    +inf / -inf for "never". `closed` says whether a covenant is already at
+    `level` exactly on its boundary, as classify_breaches decides it: a `<`
+    or `>` covenant breaches on its threshold, a `<=` or `>=` one does not,
+    and the at-risk cushion test is strict.
+    """
+    values = snapshot.current_values
+    thresholds = snapshot.thresholds
+    kinds = snapshot.kind_codes
+    ops = snapshot.op_codes
+
+    upper_bound = (ops == OP_LESS_THAN) | (ops == OP_LESS_THAN_EQUAL)
+    if level == STATUS_BREACH:
+        critical = thresholds
+        never = ops == OP_EQUAL
+        closed = (ops == OP_LESS_THAN) | (ops == OP_GREATER_THAN)
+    else:
+        cushion = AT_RISK_CUSHION_PERCENT / 100
+        critical = np.where(upper_bound, thresholds * (1 - cushion), thresholds * (1 + cushion))
+        never = np.zeros(len(ops), dtype=bool)
+        closed = np.zeros(len(ops), dtype=bool)
+    # Upper-bound covenants are bad when the stressed value is high
+    bad_when_high = upper_bound
+
+    ebitda_linked = (kinds == KIND_LEVERAGE) | (kinds == KIND_DEFAULT)
+    constant = (kinds == KIND_CURRENT_RATIO) | (values == 0)
+    rate_linked = ~ebitda_linked & ~constant & ~never
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # value / (1 - d/100) == critical
+        leverage_drop = 100 * (1 - values / critical)
+        # value * (1 - d/100) / g == critical  =>  d == 100 + g * slope
+        coverage_slope = -100 * critical / values
+    increasing = np.where(ebitda_linked, values > 0, values < 0)
+    suffix = increasing == bad_when_high
+
+    # Stress-independent values are classified exactly as the engine does
+    constant_value = np.where(kinds == KIND_CURRENT_RATIO, values * 0.9, 0.0)
+    constant_bad = classify_breaches(constant_value, thresholds, ops)[0] >= level
+
+    fixed = ebitda_linked & ~constant & ~never
+    start_fixed = np.where(fixed & suffix, leverage_drop, np.inf)
+    start_fixed = np.where(constant & constant_bad, -np.inf, start_fixed)
+    end_fixed = np.where(fixed & ~suffix, leverage_drop, -np.inf)
+    start_slope = np.where(rate_linked & suffix, coverage_slope, np.inf)
+    end_slope = np.where(rate_linked & ~suffix, coverage_slope, -np.inf)
+    return start_fixed, start_slope, end_fixed, end_slope, closed
+
+
+def _closed_at(
+    closed: np.ndarray,
+    values: np.ndarray,
+    reduced: np.ndarray,
+    loan_idx: np.ndarray
+) -> np.ndarray:
+    """Whether any covenant attaining its loan's reduced boundary has it closed"""
+    out = np.zeros(len(reduced), dtype=bool)
+    np.logical_or.at(out, loan_idx, closed & (values == reduced[loan_idx]))
+    return out
+
+
+def _pick_closed(fixed, fixed_closed, moving, moving_closed, fixed_wins) -> np.ndarray:
+    """Closed flag of whichever boundary is the reduced one (either, on a tie)"""
+    return np.where(
+        fixed == moving,
+        fixed_closed | moving_closed,
+        np.where(fixed_wins, fixed_closed, moving_closed)
+    )
+
+
+def engine_reached(
+    snapshot: PortfolioSnapshot,
+    positions: np.ndarray,
+    level: int,
+    ebitda_drop_percent: np.ndarray,
+    interest_rate_hike_bps: float
+) -> np.ndarray:
+    """Whether the engine puts each covenant at `positions` at `level`, one drop per covenant"""
+    stressed = stress_values(
+        snapshot.current_values[positions],
+        snapshot.kind_codes[positions],
+        ebitda_drop_percent,
+        interest_rate_hike_bps
+    )
+    statuses = classify_breaches(stressed, snapshot.thresholds[positions], snapshot.op_codes[positions])[0]
+    return statuses >= level
+
+
+def snap_to_engine(
+    snapshot: PortfolioSnapshot,
+    level: int,
+    interest_rate_hike_bps: float,
+    boundaries: np.ndarray,
+    closed: np.ndarray,
+    suffix: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Move covenant boundaries onto the exact floats where the engine flips
+
+    The closed form is exact in real arithmetic, but classify_breaches works
+    on rounded stressed values and cushions, so on a boundary (e.g. a
+    cushion of 4.999999999999982 rather than 5) it can disagree. Within
+    SNAP_TOLERANCE of each boundary in [0, 100], bisect over the float64
+    bit patterns (ordered like the values for non-negative floats) for the
+    first drop the engine puts at `level` (suffix) or the last (prefix);
+    the snapped boundary is closed.
+    """
+    boundaries = boundaries.copy()
+    closed = closed.copy()
+    positions = np.flatnonzero(
+        np.isfinite(boundaries)
+        & (boundaries > -SNAP_TOLERANCE)
+        & (boundaries < 100 + SNAP_TOLERANCE)
+    )
+    if not len(positions):
+        return boundaries, closed
+
+    def reached(where: np.ndarray, drops: np.ndarray) -> np.ndarray:
+        return engine_reached(snapshot, where, level, drops, interest_rate_hike_bps)
+
+    lo = np.clip(boundaries[positions] - SNAP_TOLERANCE, 0.0, 100.0)
+    hi = np.clip(boundaries[positions] + SNAP_TOLERANCE, 0.0, 100.0)
+    # Only boundaries the engine actually crosses inside [lo, hi] are moved
+    bracketed = reached(positions, hi if suffix else lo) & ~reached(positions, lo if suffix else hi)
+    positions, lo, hi = positions[bracketed], lo[bracketed], hi[bracketed]
+
+    lo_bits = lo.view(np.int64)
+    hi_bits = hi.view(np.int64)
+    while True:
+        pending = hi_bits - lo_bits > 1
+        if not pending.any():
+            break
+        mid_bits = lo_bits + (hi_bits - lo_bits) // 2
+        # Suffix: the first reached drop is at or below a reached midpoint;
+        # prefix: the last reached drop is below an unreached one
+        lower_hi = reached(positions, mid_bits.view(np.float64)) == suffix
+        hi_bits = np.where(pending & lower_hi, mid_bits, hi_bits)
+        lo_bits = np.where(pending & ~lower_hi, mid_bits, lo_bits)
+
+    boundaries[positions] = (hi_bits if suffix else lo_bits).view(np.float64)
+    closed[positions] = True
+    return boundaries, closed
+
+
+def loan_boundaries(
+    snapshot: PortfolioSnapshot,
+    level: int,
+    interest_rate_hike_bps: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-loan (starts, ends, start_closed, end_closed) at one rate hike, snapped to the engine
+
+    Each covenant has a finite start or end from either its fixed or its
+    rate-linked breakpoint, never both, so they combine before snapping.
+    """
+    start_fixed, start_slope, end_fixed, end_slope, closed = covenant_breakpoints(snapshot, level)
+    rate_multiplier = 1 + (interest_rate_hike_bps / 10000)
+    starts, start_closed = snap_to_engine(
+        snapshot, level, interest_rate_hike_bps,
+        np.minimum(start_fixed, 100 + rate_multiplier * start_slope), closed, suffix=True
+    )
+    ends, end_closed = snap_to_engine(
+        snapshot, level, interest_rate_hike_bps,
+        np.maximum(end_fixed, 100 + rate_multiplier * end_slope), closed, suffix=False
+    )
+
+    loan_idx = snapshot.cov_loan_idx
+    loan_starts = np.full(snapshot.loan_count, np.inf)
+    np.minimum.at(loan_starts, loan_idx, starts)
+    loan_ends = np.full(snapshot.loan_count, -np.inf)
+    np.maximum.at(loan_ends, loan_idx, ends)
+    return (
+        loan_starts,
+        loan_ends,
+        _closed_at(start_closed, starts, loan_starts, loan_idx),
+        _closed_at(end_closed, ends, loan_ends, loan_idx),
+    )
+
+
+class LoanBreakpoints:
+    """
+    Per-loan breakpoints for one severity level
+
+    A loan reaches the level as soon as any covenant does, so its suffix
+    start is the minimum over its covenants and its prefix end the maximum.
+    Because the rate multiplier is positive, the minimum of the rate-linked
+    lines 100 + g * slope is taken over the slopes alone. Each boundary is
+    closed when any covenant attaining it is closed. The fixed breakpoints
+    do not depend on the rate hike, so they are snapped to the engine.
+    """
+
+    def __init__(self, snapshot: PortfolioSnapshot, level: int):
+        start_fixed, start_slope, end_fixed, end_slope, closed = covenant_breakpoints(snapshot, level)
+        start_fixed, start_fixed_closed = snap_to_engine(snapshot, level, 0.0, start_fixed, closed, suffix=True)
+        end_fixed, end_fixed_closed = snap_to_engine(snapshot, level, 0.0, end_fixed, closed, suffix=False)
+        loan_idx = snapshot.cov_loan_idx
+
+        def reduce(ufunc, values: np.ndarray, initial: float) -> np.ndarray:
+            out = np.full(snapshot.loan_count, initial)
+            ufunc.at(out, loan_idx, values)
+            return out
+
+        self.start_fixed = reduce(np.minimum, start_fixed, np.inf)
+        self.start_slope = reduce(np.minimum, start_slope, np.inf)
+        self.end_fixed = reduce(np.maximum, end_fixed, -np.inf)
+        self.end_slope = reduce(np.maximum, end_slope, -np.inf)
+        self.start_fixed_closed = _closed_at(start_fixed_closed, start_fixed, self.start_fixed, loan_idx)
+        self.start_slope_closed = _closed_at(closed, start_slope, self.start_slope, loan_idx)
+        self.end_fixed_closed = _closed_at(end_fixed_closed, end_fixed, self.end_fixed, loan_idx)
+        self.end_slope_closed = _closed_at(closed, end_slope, self.end_slope, loan_idx)
+
+    def at_rate(self, rate_multiplier) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Loan boundaries for a rate multiplier (scalar or broadcastable array)
+
+        Returns (starts, ends, start_closed, end_closed).
+        """
+        start_moving = 100 + rate_multiplier * self.start_slope
+        end_moving = 100 + rate_multiplier * self.end_slope
+        starts = np.minimum(self.start_fixed, start_moving)
+        ends = np.maximum(self.end_fixed, end_moving)
+        start_closed = _pick_closed(
+            self.start_fixed, self.start_fixed_closed, start_moving, self.start_slope_closed,
+            self.start_fixed < start_moving
+        )
+        end_closed = _pick_closed(
+            self.end_fixed, self.end_fixed_closed, end_moving, self.end_slope_closed,
+            self.end_fixed > end_moving
+        )
+        return starts, ends, start_closed, end_closed
+
+    def reached(self, ebitda_drop_percent, rate_multiplier) -> np.ndarray:
+        """Whether each loan is at this level; arguments broadcast against the loan axis"""
+        starts, ends, start_closed, end_closed = self.at_rate(rate_multiplier)
+        return (
+            (ebitda_drop_percent > starts) | ((ebitda_drop_percent == starts) & start_closed)
+            | (ebitda_drop_percent < ends) | ((ebitda_drop_percent == ends) & end_closed)
+        )
+
+
+class _LevelIndex:
+    """
+    Sorted per-loan breakpoints for one severity level at a fixed rate hike
+
+    Closed and open boundaries are kept apart, so a drop landing exactly on
+    a boundary counts only the loans that are at the level there.
+    """
+
+    def __init__(
+        self,
+        loan_starts: np.ndarray,
+        loan_ends: np.ndarray,
+        start_closed: np.ndarray,
+        end_closed: np.ndarray
+    ):
+        self.loan_starts = loan_starts
+        self.loan_ends = loan_ends
+        self.start_closed = start_closed
+        self.end_closed = end_closed
+        # A loan whose prefix and suffix overlap is at this level for every drop
+        always = (
+            (loan_ends > loan_starts)
+            | ((loan_ends == loan_starts) & (start_closed | end_closed))
+            | (loan_starts == -np.inf) | (loan_ends == np.inf)
+        )
+        self.always_count = int(always.sum())
+        starts = ~always & np.isfinite(loan_starts)
+        ends = ~always & np.isfinite(loan_ends)
+        self.closed_starts = np.sort(loan_starts[starts & start_closed])
+        self.open_starts = np.sort(loan_starts[starts & ~start_closed])
+        self.closed_ends = np.sort(loan_ends[ends & end_closed])
+        self.open_ends = np.sort(loan_ends[ends & ~end_closed])
+
+    def count(self, ebitda_drop_percent: float) -> int:
+        """Number of loans at this level for the given EBITDA drop"""
+        d = ebitda_drop_percent
+        starts_reached = (
+            np.searchsorted(self.closed_starts, d, side="right")  # start <= d
+            + np.searchsorted(self.open_starts, d, side="left")  # start < d
+        )
+        ends_not_passed = (
+            len(self.closed_ends) - np.searchsorted(self.closed_ends, d, side="left")  # end >= d
+            + len(self.open_ends) - np.searchsorted(self.open_ends, d, side="right")  # end > d
+        )
+        return self.always_count + int(starts_reached) + int(ends_not_passed)
+
+    def first_reached(self) -> np.ndarray:
+        """
+        Smallest drop in [0, 100] at which each loan is at this level (NaN if none)
+
+        For an open start this is the infimum: the loan is at the level for
+        every larger drop, but not on the start itself.
+        """
+        at_zero = (
+            (self.loan_ends > 0) | ((self.loan_ends == 0) & self.end_closed)
+            | (self.loan_starts < 0) | ((self.loan_starts == 0) & self.start_closed)
+        )
+        drops = np.where(at_zero, 0.0, self.loan_starts)
+        within = (drops < 100) | ((drops == 100) & (at_zero | self.start_closed))
+        return np.where(within, drops, np.nan)
+
+
+def split_residual_loans(snapshot: PortfolioSnapshot) -> np.ndarray:
+    """
+    Mask of loans with a covenant outside the closed form
+
+    The at-risk cushion rule only reduces to a single threshold for positive
+    thresholds, and the solved drops only describe the engine for positive
+    current values: a non-positive EBITDA-linked value never crosses a
+    positive threshold before the pole at a 100% drop (where the engine
+    yields -inf or nan), while its solved drop lands beyond 100. Such loans
+    must be evaluated directly.
+    """
+    residual_covenants = (
+        ~(snapshot.thresholds > 0)
+        | ~(snapshot.current_values > 0)
+        | ~np.isfinite(snapshot.current_values)
+    )
+    residual_loans = np.zeros(snapshot.loan_count, dtype=bool)
+    residual_loans[snapshot.cov_loan_idx[residual_covenants]] = True
+    return residual_loans
+
+
+class BreakpointIndex:
+    """
+    Per-tenant index of critical EBITDA drops at a fixed rate hike
+
+    Answers "how many loans breach / are at risk at X% EBITDA drop" with two
+    binary searches per level instead of a portfolio scan. Loans with
+    covenants outside the closed form (non-positive thresholds or current
+    values) are kept in a small residual snapshot and evaluated directly.
+    """
+
+    def __init__(self, snapshot: PortfolioSnapshot, interest_rate_hike_bps: float):
+        self.interest_rate_hike_bps = interest_rate_hike_bps
+        self.total_loans = snapshot.loan_count
+
+        residual_loans = split_residual_loans(snapshot)
+        self.residual = snapshot.select_loans(residual_loans)
+
+        indexed = snapshot.select_loans(~residual_loans)
+        self.loan_ids = indexed.loan_ids
+        self.company_names = indexed.company_names
+        self.breach = _LevelIndex(*loan_boundaries(indexed, STATUS_BREACH, interest_rate_hike_bps))
+        self.at_risk = _LevelIndex(*loan_boundaries(indexed, STATUS_AT_RISK, interest_rate_hike_bps))
+
+    def summary(self, ebitda_drop_percent: float) -> Dict[str, int]:
+        """Loan counts per status for one EBITDA drop"""
+        breached = self.breach.count(ebitda_drop_percent)
+        at_risk_or_worse = self.at_risk.count(ebitda_drop_percent)
+
+        if self.residual.loan_count:
+            result = evaluate_scenario(self.residual, ebitda_drop_percent, self.interest_rate_hike_bps)
+            breached += int((result.loan_statuses == STATUS_BREACH).sum())
+            at_risk_or_worse += int((result.loan_statuses >= STATUS_AT_RISK).sum())
+
+        return {
+            "total_loans": self.total_loans,
+            "loans_breached": breached,
+            "loans_at_risk": at_risk_or_worse - breached,
+            "loans_safe": self.total_loans - at_risk_or_worse
+        }
+
+    def reverse_stress(self) -> List[Dict[str, Any]]:
+        """
+        Smallest EBITDA drop (0-100) that breaches / puts at risk each loan
+
+        Loans that never reach a level get None. Sorted by breach drop, most
+        fragile first.
+        """
+        results = []
+        for level in (self.breach, self.at_risk):
+            results.append(level.first_reached().tolist())
+
+        loans = [
+            {
+                "loan_id": loan_id,
+                "company_name": company_name,
+                "breach_ebitda_drop_percent": None if np.isnan(breach) else round(breach, 4),
+                "at_risk_ebitda_drop_percent": None if np.isnan(at_risk) else round(at_risk, 4)
+            }
+            for loan_id, company_name, breach, at_risk in zip(
+                self.loan_ids, self.company_names, *results
+            )
+        ]
+        loans.extend(self._residual_reverse_stress())
+        loans.sort(key=lambda l: (
+            l["breach_ebitda_drop_percent"] is None,
+            l["breach_ebitda_drop_percent"] or 0.0
+        ))
+        return loans
+
+    def _residual_reverse_stress(self) -> List[Dict[str, Any]]:
+        """Scan residual loans over a fine EBITDA grid"""
+        if not self.residual.loan_count:
+            return []
+        drops = np.round(np.arange(0, 100 + RESIDUAL_SEARCH_STEP / 2, RESIDUAL_SEARCH_STEP), 4)
+        grid = evaluate_grid(
+            self.residual, drops, [self.interest_rate_hike_bps], include_loan_surfaces=True
+        )
+        surfaces = grid.loan_surfaces[:, :, 0]
+
+        def first_drop(mask: np.ndarray) -> Optional[float]:
+            hits = np.flatnonzero(mask)
+            return float(drops[hits[0]]) if len(hits) else None
+
+        return [
+            {
+                "loan_id": loan_id,
+                "company_name": company_name,
+                "breach_ebitda_drop_percent": first_drop(surface == STATUS_BREACH),
+                "at_risk_ebitda_drop_percent": first_drop(surface >= STATUS_AT_RISK)
+            }
+            for loan_id, company_name, surface in zip(
+                self.residual.loan_ids, self.residual.company_names, surfaces
+            )
+        ]
+
+
+class BreakpointIndexCache(PortfolioCache):
+    """LRU cache of breakpoint indexes keyed by (tenant, rate hike, portfolio version)"""
+
+    def get(self, db: Session, tenant_id: str, interest_rate_hike_bps: float) -> BreakpointIndex:
+        """Return the tenant's index for a rate hike, building it on a miss"""
+        return self.prepare_index(db, tenant_id, interest_rate_hike_bps)()
+
+    def prepare_index(self, db: Session, tenant_id: str, interest_rate_hike_bps: float) -> Callable[[], BreakpointIndex]:
+        """Load what a miss needs now; the returned callable builds the index without the session"""
+        return self.prepare(
+            db, tenant_id, float(interest_rate_hike_bps),
+            lambda: load_portfolio_snapshot(db, tenant_id),
+            lambda snapshot: BreakpointIndex(snapshot, interest_rate_hike_bps)
+        )
+
+
+# Singleton instance
+_breakpoint_index_cache = BreakpointIndexCache()
+
+
+def get_breakpoint_index_cache() -> BreakpointIndexCache:
+    """Get the process-wide breakpoint index cache"""
+    return _breakpoint_index_cache
@@ -0,0 +1,169 @@
+"""
+Covenant Audit Trail
+Append-only CovenantAudit rows, written in bulk in-transaction or via a bounded background queue
+"""
+import logging
+import queue
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import CovenantAudit, CovenantStatus
+
+logger = logging.getLogger(__name__)
+
+# Audit sources
+AUDIT_SOURCE_MANUAL = "manual"  # PUT /covenants/{covenant_id}/value
+AUDIT_SOURCE_BULK = "bulk_submission"  # PUT /covenants/values
+
+
+def audit_row(
+    covenant_id: str,
+    old_value: Optional[float],
+    new_value: Optional[float],
+    old_status: Optional[str],
+    new_status: Optional[str],
+    source: str,
+    changed_by: Optional[str] = None,
+    change_reason: Optional[str] = None,
+    created_at: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    One CovenantAudit insert mapping
+
+    `created_at` is the time of the change, set here rather than by the
+    database so rows written later in a batch keep their real timestamps.
+    """
+    return {
+        "id": f"audit-{uuid.uuid4().hex}",
+        "covenant_id": covenant_id,
+        "old_value": old_value,
+        "new_value": new_value,
+        "old_status": CovenantStatus(old_status) if old_status else None,
+        "new_status": CovenantStatus(new_status) if new_status else None,
+        "changed_by": changed_by,
+        "change_reason": change_reason,
+        "source": source,
+        "created_at": created_at or datetime.now()
+    }
+
+
+def audit_rows_from_results(
+    results: Iterable[Dict[str, Any]],
+    source: str,
+    changed_by: Optional[str] = None,
+    change_reason: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Audit mappings for covenant value update results (old/new value and status)"""
+    now = datetime.now()
+    return [
+        audit_row(
+            r["covenant_id"], r["old_value"], r["new_value"], r["old_status"], r["new_status"],
+            source, changed_by, change_reason, now
+        )
+        for r in results
+    ]
+
+
+def write_audit_rows(db: Session, rows: List[Dict[str, Any]]):
+    """Bulk-insert audit rows in the session's transaction (caller commits)"""
+    if rows:
+        db.bulk_insert_mappings(CovenantAudit, rows)
+
+
+class CovenantAuditWriter:
+    """
+    Background writer draining a bounded queue of audit rows
+
+    Single updates enqueue their row after committing and return without
+    waiting for the audit insert. A worker thread batches queued rows into
+    one bulk insert per `batch_size` rows or `flush_interval` seconds.
+    When the queue is full, `submit` returns False and the caller writes
+    the row itself, so audit rows are never dropped under load.
+    """
+
+    def __init__(self, max_queued: int, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queued)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="covenant-audit-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """Queue a row for the background writer; False when the queue is full"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            return False
+        return True
+
+    def flush(self):
+        """Block until every queued row has been written"""
+        self._queue.join()
+
+    def shutdown(self):
+        """Write out queued rows and stop the worker"""
+        if self._thread is None:
+            return
+        self.flush()
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    @staticmethod
+    def _write(batch: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            write_audit_rows(db, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("[AUDIT] Failed to write %d covenant audit rows", len(batch))
+        finally:
+            db.close()
+
+
+# Singleton instance
+_audit_writer: Optional[CovenantAuditWriter] = None
+
+
+def get_covenant_audit_writer() -> CovenantAuditWriter:
+    """Get or create the process-wide covenant audit writer"""
+    global _audit_writer
+    if _audit_writer is None:
+        _audit_writer = CovenantAuditWriter(
+            max_queued=settings.AUDIT_QUEUE_LIMIT,
+            batch_size=settings.AUDIT_BATCH_ROWS,
+            flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS
+        )
+    return _audit_writer
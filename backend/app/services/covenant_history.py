@@ -0,0 +1,106 @@
+"""
+Covenant History
+Range queries over the covenant value time series, with last-value-per-period downsampling
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import CovenantHistory
+
+# Covenant ids per IN (...) lookup, below every backend's bind parameter limit
+HISTORY_BATCH_SIZE = 5000
+
+# Downsampling intervals: the last value reported in each period is kept
+HISTORY_INTERVALS = ("month", "quarter")
+
+
+def history_rows(values: Sequence[Tuple[str, float]], recorded_at: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """CovenantHistory insert mappings for (covenant_id, value) pairs reported together"""
+    recorded_at = recorded_at or datetime.now()
+    return [
+        {"covenant_id": covenant_id, "value": value, "recorded_at": recorded_at}
+        for covenant_id, value in values
+    ]
+
+
+def write_history_rows(db: Session, rows: List[Dict[str, Any]]):
+    """Bulk-insert history rows in the session's transaction (caller commits)"""
+    if rows:
+        db.bulk_insert_mappings(CovenantHistory, rows)
+
+
+def period_label(recorded_at: datetime, interval: str) -> str:
+    """Period a point falls in, e.g. "2025-03" (month) or "2025-Q1" (quarter)"""
+    if interval == "month":
+        return f"{recorded_at.year:04d}-{recorded_at.month:02d}"
+    return f"{recorded_at.year:04d}-Q{(recorded_at.month - 1) // 3 + 1}"
+
+
+def downsample(points: Sequence[Tuple[datetime, float]], interval: str) -> List[Tuple[str, datetime, float]]:
+    """
+    Last point of each period, as (period, recorded_at, value)
+
+    `points` must be in ascending recorded_at order, as `load_history`
+    returns them; periods without a point are left out rather than filled.
+    """
+    if interval not in HISTORY_INTERVALS:
+        raise ValueError(f"Unknown history interval: {interval}")
+    last: Dict[str, Tuple[datetime, float]] = {}
+    for recorded_at, value in points:
+        last[period_label(recorded_at, interval)] = (recorded_at, value)
+    return [(period, recorded_at, value) for period, (recorded_at, value) in last.items()]
+
+
+def load_history(
+    db: Session,
+    covenant_ids: Sequence[str],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Dict[str, List[Tuple[datetime, float]]]:
+    """
+    Value history of many covenants in [since, until), oldest first
+
+    One range query per HISTORY_BATCH_SIZE covenants, served from the
+    (covenant_id, recorded_at) index. Every requested id is present in the
+    result, with an empty list when it has no history in the range.
+    """
+    history: Dict[str, List[Tuple[datetime, float]]] = {covenant_id: [] for covenant_id in covenant_ids}
+    ids = list(history)
+    for lo in range(0, len(ids), HISTORY_BATCH_SIZE):
+        query = db.query(
+            CovenantHistory.covenant_id, CovenantHistory.recorded_at, CovenantHistory.value
+        ).filter(CovenantHistory.covenant_id.in_(ids[lo:lo + HISTORY_BATCH_SIZE]))
+        if since is not None:
+            query = query.filter(CovenantHistory.recorded_at >= since)
+        if until is not None:
+            query = query.filter(CovenantHistory.recorded_at < until)
+        for covenant_id, recorded_at, value in query.order_by(
+            CovenantHistory.covenant_id, CovenantHistory.recorded_at, CovenantHistory.id
+        ):
+            history[covenant_id].append((recorded_at, value))
+    return history
+
+
+def history_series(
+    db: Session,
+    covenant_ids: Sequence[str],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    interval: Optional[str] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """JSON-ready history per covenant, downsampled to `interval` when given"""
+    history = load_history(db, covenant_ids, since, until)
+    if interval is None:
+        return {
+            covenant_id: [{"recorded_at": t.isoformat(), "value": v} for t, v in points]
+            for covenant_id, points in history.items()
+        }
+    return {
+        covenant_id: [
+            {"period": period, "recorded_at": t.isoformat(), "value": v}
+            for period, t, v in downsample(points, interval)
+        ]
+        for covenant_id, points in history.items()
+    }
@@ -0,0 +1,149 @@
+"""
+Covenant Value Updates
+Batch status / cushion evaluation and single-transaction writes of reported values
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Covenant, CovenantOperator, CovenantStatus, Loan
+from app.services.covenant_history import history_rows, write_history_rows
+from app.services.portfolio_version import bump_portfolio_version
+from app.services.stress_engine import (
+    OPERATOR_CODES,
+    STATUS_SAFE,
+    STATUS_AT_RISK,
+    STATUS_BREACH,
+    classify_breaches,
+)
+
+# Covenant ids per IN (...) lookup, below every backend's bind parameter limit
+LOOKUP_BATCH_SIZE = 5000
+
+# Engine status codes -> persisted covenant status
+COVENANT_STATUSES = {
+    STATUS_SAFE: CovenantStatus.COMPLIANT,
+    STATUS_AT_RISK: CovenantStatus.WARNING,
+    STATUS_BREACH: CovenantStatus.BREACH,
+}
+
+VALUE_LOOKUP_COLUMNS = (
+    Covenant.id,
+    Covenant.loan_id,
+    Covenant.threshold_value,
+    Covenant.operator,
+    Covenant.current_value,
+    Covenant.status,
+    Loan.tenant_id,
+)
+
+
+def load_covenants_for_update(db: Session, covenant_ids: Sequence[str]) -> Dict[str, Any]:
+    """Fetch the rows a value update needs for many covenants, keyed by id"""
+    rows = {}
+    for lo in range(0, len(covenant_ids), LOOKUP_BATCH_SIZE):
+        batch = covenant_ids[lo:lo + LOOKUP_BATCH_SIZE]
+        for row in db.query(*VALUE_LOOKUP_COLUMNS).join(Loan, Covenant.loan_id == Loan.id).filter(
+            Covenant.id.in_(batch)
+        ):
+            rows[row.id] = row
+    return rows
+
+
+def evaluate_covenant_values(
+    operators: Sequence[CovenantOperator],
+    thresholds: Sequence[float],
+    values: Sequence[float]
+) -> Tuple[List[CovenantStatus], List[float]]:
+    """
+    Statuses and cushions for many reported values at once
+
+    Same rules as `PUT /covenants/{covenant_id}/value`: breach per the
+    operator (`==` never breaches), warning when the cushion is below 5%,
+    compliant otherwise.
+    """
+    op_codes = np.array([OPERATOR_CODES[CovenantOperator(op)] for op in operators], dtype=np.int8)
+    statuses, cushions, _ = classify_breaches(
+        np.asarray(values, dtype=np.float64),
+        np.asarray(thresholds, dtype=np.float64),
+        op_codes
+    )
+    return [COVENANT_STATUSES[s] for s in statuses.tolist()], cushions.tolist()
+
+
+def apply_covenant_values(
+    db: Session,
+    tenant_id: str,
+    values: Sequence[Tuple[str, float]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Optional[int]]:
+    """
+    Write many (covenant_id, current_value) pairs in the session's transaction
+
+    Covenants are loaded in batched IN queries and evaluated together, then
+    written with one executemany UPDATE plus one bulk CovenantHistory
+    insert. Items are rejected (not raised) for unknown or other-tenant
+    covenants, repeated ids and zero thresholds.
+    The tenant's portfolio version is bumped once; the caller commits.
+
+    Returns (results, rejects, the bumped portfolio version or None when
+    nothing was written).
+    """
+    rejects = []
+    seen = set()
+    unique = []
+    for covenant_id, value in values:
+        if covenant_id in seen:
+            rejects.append({"covenant_id": covenant_id, "reason": "duplicate covenant_id"})
+            continue
+        seen.add(covenant_id)
+        unique.append((covenant_id, value))
+
+    rows = load_covenants_for_update(db, [covenant_id for covenant_id, _ in unique])
+    accepted = []
+    for covenant_id, value in unique:
+        row = rows.get(covenant_id)
+        if row is None or row.tenant_id != tenant_id:
+            rejects.append({"covenant_id": covenant_id, "reason": "covenant not found"})
+        elif row.threshold_value == 0:
+            rejects.append({"covenant_id": covenant_id, "reason": "threshold is zero; cushion undefined"})
+        else:
+            accepted.append((row, value))
+
+    if not accepted:
+        return [], rejects, None
+
+    statuses, cushions = evaluate_covenant_values(
+        [row.operator for row, _ in accepted],
+        [row.threshold_value for row, _ in accepted],
+        [value for _, value in accepted]
+    )
+
+    now = datetime.now()
+    mappings = []
+    results = []
+    for (row, value), new_status, cushion in zip(accepted, statuses, cushions):
+        mappings.append({
+            "id": row.id,
+            "current_value": value,
+            "status": new_status,
+            "cushion_percent": cushion,
+            "last_updated": now
+        })
+        results.append({
+            "covenant_id": row.id,
+            "loan_id": row.loan_id,
+            "old_value": row.current_value,
+            "new_value": value,
+            "old_status": row.status.value if row.status else None,
+            "new_status": new_status.value,
+            "cushion_percent": cushion
+        })
+
+    # Bulk UPDATEs skip the unit of work and its flush listeners, so record
+    # the history and bump the version explicitly
+    db.bulk_update_mappings(Covenant, mappings)
+    write_history_rows(db, history_rows([(row.id, value) for row, value in accepted], now))
+    version = bump_portfolio_version(db, [tenant_id])[tenant_id]
+    return results, rejects, version
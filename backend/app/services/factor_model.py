@@ -0,0 +1,154 @@
+"""
+Multi-Factor Stress Model
+Per-covenant factor sensitivities; a scenario is a matrix-vector product in log space
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.services.stress_engine import (
+    PortfolioSnapshot,
+    ScenarioResult,
+    KIND_LEVERAGE,
+    KIND_INTEREST_COVERAGE,
+    KIND_DSCR,
+    KIND_CURRENT_RATIO,
+    KIND_DEFAULT,
+    classify_breaches,
+    rollup_loans,
+)
+
+# Factor columns of the sensitivity matrix
+FACTOR_EBITDA = 0           # EBITDA multiplier (1 - drop), sector-specific
+FACTOR_RATE = 1             # Interest multiplier (1 + bps / 10000)
+FACTOR_WORKING_CAPITAL = 2  # Working capital multiplier (1 - stress)
+FACTOR_CAPEX = 3            # Cash left for debt service after a capex shock (1 - shock)
+FACTOR_NAMES = ("ebitda", "interest_rate", "working_capital", "capex")
+
+# Elasticity of each ratio kind to each factor multiplier:
+# stressed = current * prod(multiplier_k ** sensitivity_k)
+KIND_SENSITIVITIES = np.zeros((5, len(FACTOR_NAMES)), dtype=np.float64)
+KIND_SENSITIVITIES[KIND_LEVERAGE] = (-1, 0, 0, 0)           # Debt / EBITDA
+KIND_SENSITIVITIES[KIND_INTEREST_COVERAGE] = (1, -1, 0, 0)  # EBITDA / Interest
+KIND_SENSITIVITIES[KIND_DSCR] = (1, -1, 0, 1)               # (EBITDA - CapEx) / Debt Service
+KIND_SENSITIVITIES[KIND_CURRENT_RATIO] = (0, 0, 1, 0)       # Working capital only
+KIND_SENSITIVITIES[KIND_DEFAULT] = (-1, 0, 0, 0)            # Proportional to the EBITDA drop
+
+# Working capital stress implied by the original two-parameter model (current ratio x 0.9)
+DEFAULT_WORKING_CAPITAL_STRESS_PERCENT = 10.0
+
+
+@dataclass(frozen=True)
+class FactorShocks:
+    """
+    Stress factors beyond the base EBITDA drop and rate hike
+
+    `sector_ebitda_drop_percent` overrides the base EBITDA drop for the
+    listed sectors, as sorted (sector, drop) pairs so the shocks are
+    hashable. `capex_shock_percent` is the cut in cash available for debt
+    service caused by higher capital expenditure.
+    """
+    sector_ebitda_drop_percent: Tuple[Tuple[str, float], ...] = ()
+    working_capital_stress_percent: float = DEFAULT_WORKING_CAPITAL_STRESS_PERCENT
+    capex_shock_percent: float = 0.0
+
+    @classmethod
+    def from_values(
+        cls,
+        sector_ebitda_drop_percent: Optional[Dict[str, float]] = None,
+        working_capital_stress_percent: float = DEFAULT_WORKING_CAPITAL_STRESS_PERCENT,
+        capex_shock_percent: float = 0.0,
+    ) -> Optional["FactorShocks"]:
+        """Build shocks from request values; None when they reduce to the two-parameter model"""
+        shocks = cls(
+            sector_ebitda_drop_percent=tuple(sorted((sector_ebitda_drop_percent or {}).items())),
+            working_capital_stress_percent=float(working_capital_stress_percent),
+            capex_shock_percent=float(capex_shock_percent),
+        )
+        return None if shocks == cls() else shocks
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sector_ebitda_drop_percent": dict(self.sector_ebitda_drop_percent),
+            "working_capital_stress_percent": self.working_capital_stress_percent,
+            "capex_shock_percent": self.capex_shock_percent
+        }
+
+
+class FactorModel:
+    """
+    Sensitivity matrix of a portfolio snapshot
+
+    Built once per snapshot: each covenant gets a row of factor
+    elasticities (from its kind) and the index of its loan's sector. A
+    scenario's log multipliers then form a vector x and every stressed
+    value is `current * exp(S @ x)`, with the EBITDA column read from the
+    covenant's sector.
+    """
+
+    def __init__(self, snapshot: PortfolioSnapshot):
+        self.snapshot = snapshot
+        self.sensitivities = KIND_SENSITIVITIES[snapshot.kind_codes]
+        self.sectors = sorted({s or "" for s in snapshot.sectors})
+        sector_lookup = {s: i for i, s in enumerate(self.sectors)}
+        loan_sector_idx = np.array([sector_lookup[s or ""] for s in snapshot.sectors], dtype=np.int64)
+        self.cov_sector_idx = loan_sector_idx[snapshot.cov_loan_idx] if snapshot.loan_count else loan_sector_idx
+
+    def sector_ebitda_multipliers(self, ebitda_drop_percent: float, shocks: FactorShocks) -> np.ndarray:
+        overrides = dict(shocks.sector_ebitda_drop_percent)
+        drops = np.array(
+            [overrides.get(sector, ebitda_drop_percent) for sector in self.sectors],
+            dtype=np.float64
+        )
+        return 1 - drops / 100
+
+    def factor_vector(self, interest_rate_hike_bps: float, shocks: FactorShocks) -> np.ndarray:
+        """Log multipliers of the sector-independent factors"""
+        return np.log([
+            1 + interest_rate_hike_bps / 10000,
+            1 - shocks.working_capital_stress_percent / 100,
+            1 - shocks.capex_shock_percent / 100,
+        ])
+
+    def stressed_values(
+        self,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        shocks: FactorShocks
+    ) -> np.ndarray:
+        """Stressed value of every covenant under a multi-factor scenario"""
+        ebitda = self.sector_ebitda_multipliers(ebitda_drop_percent, shocks)
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            x = self.factor_vector(interest_rate_hike_bps, shocks)
+            exponents = self.sensitivities[:, FACTOR_EBITDA + 1:] @ x
+            # A 100% sector drop gives log(0) = -inf; skip it where the
+            # covenant is insensitive to EBITDA rather than produce 0 * -inf
+            ebitda_sensitivity = self.sensitivities[:, FACTOR_EBITDA]
+            ebitda_terms = ebitda_sensitivity * np.log(ebitda)[self.cov_sector_idx]
+            exponents += np.where(ebitda_sensitivity != 0, ebitda_terms, 0.0)
+            return self.snapshot.current_values * np.exp(exponents)
+
+    def evaluate(
+        self,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        shocks: FactorShocks
+    ) -> ScenarioResult:
+        """Evaluate a multi-factor scenario over the snapshot"""
+        stressed = self.stressed_values(ebitda_drop_percent, interest_rate_hike_bps, shocks)
+        snapshot = self.snapshot
+        statuses, cushions, breach_margins = classify_breaches(
+            stressed, snapshot.thresholds, snapshot.op_codes
+        )
+        loan_statuses, breach_counts, at_risk_counts = rollup_loans(snapshot, statuses)
+        return ScenarioResult(
+            stressed_values=stressed,
+            cushions=cushions,
+            breach_margins=breach_margins,
+            statuses=statuses,
+            loan_statuses=loan_statuses,
+            loan_breach_counts=breach_counts,
+            loan_at_risk_counts=at_risk_counts,
+        )
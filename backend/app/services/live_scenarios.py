@@ -0,0 +1,287 @@
+"""
+Live Stress Scenarios
+Pinned scenarios whose heatmaps are maintained incrementally as covenants change
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services.portfolio_loader import PortfolioFilter, load_portfolio_snapshot
+from app.services.portfolio_version import get_portfolio_version
+from app.services.stress_engine import (
+    STATUS_LABELS,
+    PortfolioSnapshot,
+    evaluate_scenario,
+    iter_loan_results,
+    reevaluate_loan,
+    rollup_scenario,
+)
+
+
+class LiveScenarioLimitReached(Exception):
+    """Raised when pinning more scenarios than the registry allows"""
+
+
+class LiveScenario:
+    """
+    A pinned stress scenario and the portfolio state it was evaluated on
+
+    `version` is the tenant portfolio version the results reflect. When a
+    covenant update arrives with the next version, only that loan is
+    re-evaluated and the status counters are adjusted. Any other version
+    gap means changes were missed, so the scenario is rebuilt in full.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        group_by: Sequence[str] = ()
+    ):
+        self.id = f"live-{uuid.uuid4().hex[:8]}"
+        self.tenant_id = tenant_id
+        self.ebitda_drop_percent = ebitda_drop_percent
+        self.interest_rate_hike_bps = interest_rate_hike_bps
+        self.filters = filters
+        self.group_by = tuple(group_by)
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+        self.version = -1
+        self.full_rebuilds = 0
+        self.incremental_updates = 0
+        self.lock = threading.Lock()
+
+    def rebuild(self, db: Session):
+        """Reload the portfolio and re-evaluate every loan"""
+        self.install(*self.load(db))
+
+    def load(self, db: Session) -> Tuple[int, PortfolioSnapshot]:
+        """The queries of a rebuild: (portfolio version, snapshot)"""
+        # Read the version first: data loaded afterwards is at least this new
+        version = get_portfolio_version(db, self.tenant_id)
+        return version, load_portfolio_snapshot(db, self.tenant_id, filters=self.filters)
+
+    def install(self, version: int, snapshot: PortfolioSnapshot):
+        """The CPU-bound part of a rebuild: evaluate every loan of a loaded snapshot"""
+        self.snapshot = snapshot
+        self.result = evaluate_scenario(snapshot, self.ebitda_drop_percent, self.interest_rate_hike_bps)
+        self.starts, self.ends = snapshot.loan_slices()
+        self.covenant_positions = {cid: j for j, cid in enumerate(snapshot.covenant_ids)}
+        self.loan_positions = {loan_id: i for i, loan_id in enumerate(snapshot.loan_ids)}
+        self.status_totals = np.bincount(self.result.loan_statuses, minlength=len(STATUS_LABELS))
+        self.version = version
+        self.updated_at = datetime.now()
+        self.full_rebuilds += 1
+
+    def apply_covenant_values(self, values: Dict[str, Tuple[str, Optional[float]]]) -> bool:
+        """
+        Apply new current values and re-evaluate the affected loans only
+
+        `values` maps covenant ids to (loan_id, current_value). Covenants of
+        loans outside the scenario (filtered out, defaulted) are ignored.
+        Returns False (leaving the scenario untouched) when an update changes
+        which covenants are evaluated, e.g. a value set to or from None.
+        """
+        positions = {}
+        for covenant_id, (loan_id, value) in values.items():
+            if loan_id not in self.loan_positions:
+                continue  # Out of scope
+            j = self.covenant_positions.get(covenant_id)
+            if j is None or value is None:
+                if j is None and value is None:
+                    continue  # Not evaluated before or after
+                return False
+            positions[j] = value
+
+        touched_loans = set()
+        for j, value in positions.items():
+            self.snapshot.current_values[j] = value
+            touched_loans.add(int(self.snapshot.cov_loan_idx[j]))
+
+        for i in touched_loans:
+            self.status_totals[self.result.loan_statuses[i]] -= 1
+            reevaluate_loan(
+                self.snapshot, self.result, i, int(self.starts[i]), int(self.ends[i]),
+                self.ebitda_drop_percent, self.interest_rate_hike_bps
+            )
+            self.status_totals[self.result.loan_statuses[i]] += 1
+
+        self.updated_at = datetime.now()
+        self.incremental_updates += 1
+        return True
+
+    def summary(self) -> Dict[str, int]:
+        totals = self.status_totals.tolist()
+        return {
+            "total_loans": self.snapshot.loan_count,
+            "loans_breached": totals[2],
+            "loans_at_risk": totals[1],
+            "loans_safe": totals[0]
+        }
+
+    def iter_loans(self) -> Iterator[Dict[str, Any]]:
+        return iter_loan_results(self.snapshot, self.result)
+
+    def to_dict(self, include_loans: bool = False, status_filter: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Scenario settings, summary and rollups, plus per-loan results when asked
+
+        Rendered under the scenario's lock so an update never shows half
+        applied; it may wait on that lock, so async handlers call it in a
+        worker thread. `status_filter` keeps only loans with that overall status.
+        """
+        with self.lock:
+            data = {
+                "scenario_id": self.id,
+                "tenant_id": self.tenant_id,
+                "ebitda_drop_percent": self.ebitda_drop_percent,
+                "interest_rate_hike_bps": self.interest_rate_hike_bps,
+                "filters": self.filters.to_dict() if self.filters is not None else None,
+                "portfolio_version": self.version,
+                "summary": self.summary(),
+                "incremental_updates": self.incremental_updates,
+                "full_rebuilds": self.full_rebuilds,
+                "created_at": self.created_at.isoformat(),
+                "updated_at": self.updated_at.isoformat()
+            }
+            if self.group_by:
+                data["rollups"] = rollup_scenario(self.snapshot, self.result, self.group_by)
+            if include_loans:
+                data["loans"] = [
+                    loan for loan in self.iter_loans()
+                    if status_filter is None or loan["overall_status"] == status_filter
+                ]
+        return data
+
+
+class LiveScenarioRegistry:
+    """
+    Process-local registry of pinned live scenarios
+
+    Covenant writers call `covenant_values_updated` after committing, with
+    the version their transaction bumped the portfolio to. Reads
+    go through `get`, which checks the scenario's version against the
+    database so changes made elsewhere (other processes, document
+    extraction, loan edits) trigger a rebuild instead of a stale answer.
+    """
+
+    def __init__(self, max_scenarios: int):
+        self.max_scenarios = max_scenarios
+        self._scenarios: "OrderedDict[str, LiveScenario]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pin(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        group_by: Sequence[str] = ()
+    ) -> LiveScenario:
+        """Evaluate and pin a scenario; raises LiveScenarioLimitReached when full"""
+        return self.prepare_pin(db, tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters, group_by)()
+
+    def prepare_pin(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        group_by: Sequence[str] = ()
+    ) -> Callable[[], LiveScenario]:
+        """Run pin's queries now; the returned callable evaluates and pins (no session needed)"""
+        with self._lock:
+            if len(self._scenarios) >= self.max_scenarios:
+                raise LiveScenarioLimitReached()
+        scenario = LiveScenario(tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters, group_by)
+        loaded = scenario.load(db)
+
+        def finish() -> LiveScenario:
+            scenario.install(*loaded)
+            with self._lock:
+                if len(self._scenarios) >= self.max_scenarios:
+                    raise LiveScenarioLimitReached()
+                self._scenarios[scenario.id] = scenario
+            return scenario
+
+        return finish
+
+    def unpin(self, scenario_id: str) -> bool:
+        with self._lock:
+            return self._scenarios.pop(scenario_id, None) is not None
+
+    def list(self, tenant_id: str) -> List[LiveScenario]:
+        with self._lock:
+            return [s for s in self._scenarios.values() if s.tenant_id == tenant_id]
+
+    def get(self, db: Session, scenario_id: str) -> Optional[LiveScenario]:
+        """Return a scenario brought up to the tenant's current portfolio version"""
+        return self.prepare_get(db, scenario_id)()
+
+    def prepare_get(self, db: Session, scenario_id: str) -> Callable[[], Optional[LiveScenario]]:
+        """
+        Run get's queries now; the returned callable does any rebuild
+
+        The callable needs no session and may wait on the scenario's lock,
+        so async handlers run it in a worker thread.
+        """
+        with self._lock:
+            scenario = self._scenarios.get(scenario_id)
+        if scenario is None:
+            return lambda: None
+        if get_portfolio_version(db, scenario.tenant_id) == scenario.version:
+            return lambda: scenario
+        loaded = scenario.load(db)
+
+        def finish() -> LiveScenario:
+            with scenario.lock:
+                if scenario.version != loaded[0]:
+                    scenario.install(*loaded)
+            return scenario
+
+        return finish
+
+    def covenant_values_updated(
+        self,
+        tenant_id: str,
+        values: Dict[str, Tuple[str, Optional[float]]],
+        version: int
+    ):
+        """
+        Apply committed covenant value changes to the tenant's live scenarios
+
+        `values` maps covenant ids to (loan_id, current_value); `version` is
+        the portfolio version the writer's transaction bumped to (see
+        bumped_portfolio_version), not one re-read after the commit, which
+        another writer may already have moved on. Only scenarios at exactly
+        `version - 1` are updated; any other gap means they missed (or
+        already include) other changes, so they are left for the version
+        check on their next read and writers never pay for a full
+        re-simulation.
+        """
+        for scenario in self.list(tenant_id):
+            with scenario.lock:
+                if scenario.version == version - 1 and scenario.apply_covenant_values(values):
+                    scenario.version = version
+
+
+# Singleton instance
+_live_scenarios: Optional[LiveScenarioRegistry] = None
+
+
+def get_live_scenario_registry() -> LiveScenarioRegistry:
+    """Get or create the process-wide live scenario registry"""
+    global _live_scenarios
+    if _live_scenarios is None:
+        _live_scenarios = LiveScenarioRegistry(max_scenarios=settings.LIVE_SCENARIO_LIMIT)
+    return _live_scenarios
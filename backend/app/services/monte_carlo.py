@@ -0,0 +1,539 @@
+"""
+Monte Carlo Stress Simulation
+Stochastic EBITDA / rate shocks evaluated over sharded, seeded path blocks
+"""
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.breakpoint_index import LoanBreakpoints, loan_boundaries, split_residual_loans
+from app.services.stress_engine import (
+    PortfolioSnapshot,
+    STATUS_BREACH,
+    GRID_BATCH_CELLS,
+    stress_values,
+    classify_breaches,
+    loan_status_matrix,
+)
+
+# Paths per RNG block. Blocks (not workers) own the random streams, so
+# results are identical for any worker count.
+PATHS_PER_BLOCK = 2048
+
+# Domain of each stress factor; draws are truncated to it
+EBITDA_DROP_RANGE = (0.0, 100.0)
+RATE_HIKE_RANGE = (0.0, math.inf)
+
+_STANDARD_NORMAL = NormalDist()
+
+# W. J. Cody's rational approximations of erf / erfc (CALERF), each
+# accurate to double precision on its range of |x|
+_ERF_A = (3.16112374387056560e00, 1.13864154151050156e02, 3.77485237685302021e02,
+          3.20937758913846947e03, 1.85777706184603153e-1)
+_ERF_B = (2.36012909523441209e01, 2.44024637934444173e02, 1.28261652607737228e03,
+          2.84423683343917062e03)
+_ERFC_C = (5.64188496988670089e-1, 8.88314979438837594e00, 6.61191906371416295e01,
+           2.98635138197400131e02, 8.81952221241769090e02, 1.71204761263407058e03,
+           2.05107837782607147e03, 1.23033935479799725e03, 2.15311535474403846e-8)
+_ERFC_D = (1.57449261107098347e01, 1.17693950891312499e02, 5.37181101862009858e02,
+           1.62138957456669019e03, 3.29079923573345963e03, 4.36261909014324716e03,
+           3.43936767414372164e03, 1.23033935480374942e03)
+_ERFC_P = (3.05326634961232344e-1, 3.60344899949804439e-1, 1.25781726111229246e-1,
+           1.60837851487422766e-2, 6.58749161529837803e-4, 1.63153871373020978e-2)
+_ERFC_Q = (2.56852019228982242e00, 1.87295284992346725e00, 5.27905102951428412e-1,
+           6.05183413124413191e-2, 2.33520497626869185e-3)
+
+# P. J. Acklam's rational approximation of the inverse normal CDF
+# (relative error below 1.15e-9 before refinement)
+_INV_A = (-3.969683028665376e01, 2.209460984245205e02, -2.759285104469687e02,
+          1.383577518672690e02, -3.066479806614716e01, 2.506628277459239e00)
+_INV_B = (-5.447609879822406e01, 1.615858368580409e02, -1.556989798598866e02,
+          6.680131188771972e01, -1.328068155288572e01)
+_INV_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e00,
+          -2.549732539343734e00, 4.374664141464968e00, 2.938163982698783e00)
+_INV_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e00,
+          3.754408661907416e00)
+_INV_TAIL = 0.02425
+
+
+def _erfc(x: np.ndarray) -> np.ndarray:
+    """Complementary error function, elementwise"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.abs(x)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # |x| <= 0.46875: erfc = 1 - erf
+        ysq = y * y
+        num, den = _ERF_A[4] * ysq, ysq
+        for a, b in zip(_ERF_A[:3], _ERF_B[:3]):
+            num, den = (num + a) * ysq, (den + b) * ysq
+        small = 1 - y * (num + _ERF_A[3]) / (den + _ERF_B[3])
+
+        # 0.46875 < |x| <= 4
+        num, den = _ERFC_C[8] * y, y
+        for c, d in zip(_ERFC_C[:7], _ERFC_D[:7]):
+            num, den = (num + c) * y, (den + d) * y
+        middle = (num + _ERFC_C[7]) / (den + _ERFC_D[7])
+
+        # |x| > 4
+        inv = 1 / ysq
+        num, den = _ERFC_P[5] * inv, inv
+        for p, q in zip(_ERFC_P[:4], _ERFC_Q[:4]):
+            num, den = (num + p) * inv, (den + q) * inv
+        large = (1 / math.sqrt(math.pi) - inv * (num + _ERFC_P[4]) / (den + _ERFC_Q[4])) / y
+
+        # exp(-y^2) split as exp(-t^2) * exp(-(y - t)(y + t)) to keep precision
+        t = np.trunc(y * 16) / 16
+        scale = np.exp(-t * t) * np.exp(-(y - t) * (y + t))
+        result = np.where(y <= 0.46875, small, scale * np.where(y <= 4, middle, large))
+    # erfc underflows to zero past 27.3 (and inf - inf is nan above)
+    result = np.where(y > 27.3, 0.0, result)
+    return np.where(x < 0, 2 - result, result)
+
+
+def _normal_cdf(z: np.ndarray) -> np.ndarray:
+    """Standard normal CDF, elementwise"""
+    return 0.5 * _erfc(-np.asarray(z, dtype=np.float64) / math.sqrt(2))
+
+
+def _normal_inv_cdf(u: np.ndarray) -> np.ndarray:
+    """
+    Standard normal inverse CDF of probabilities in (0, 1), elementwise
+
+    Acklam's approximation on the lower half, refined by one Halley step
+    against the erfc-based CDF; the upper half follows by symmetry, since
+    1 - u is exact for u >= 0.5.
+    """
+    u = np.asarray(u, dtype=np.float64)
+    q = np.minimum(u, 1 - u)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        r = np.sqrt(-2 * np.log(q))
+        tail = ((((_INV_C[0] * r + _INV_C[1]) * r + _INV_C[2]) * r + _INV_C[3]) * r + _INV_C[4]) * r + _INV_C[5]
+        tail /= (((_INV_D[0] * r + _INV_D[1]) * r + _INV_D[2]) * r + _INV_D[3]) * r + 1
+
+        c = q - 0.5
+        s = c * c
+        central = (((((_INV_A[0] * s + _INV_A[1]) * s + _INV_A[2]) * s + _INV_A[3]) * s + _INV_A[4]) * s
+                   + _INV_A[5]) * c
+        central /= ((((_INV_B[0] * s + _INV_B[1]) * s + _INV_B[2]) * s + _INV_B[3]) * s + _INV_B[4]) * s + 1
+
+        x = np.where(q < _INV_TAIL, tail, central)
+        e = _normal_cdf(x) - q
+        step = e * math.sqrt(2 * math.pi) * np.exp(x * x / 2)
+        # The density underflows for q near the smallest subnormal; keep Acklam there
+        x = np.where(np.isfinite(step), x - step / (1 + x * step / 2), x)
+    x = np.where(q == 0, -np.inf, x)
+    return np.where(u > 0.5, -x, x)
+
+# Open interval for inverse-CDF inputs: 0 and 1 map to -inf / inf
+_UNIT_LOW = np.nextafter(0.0, 1.0)
+_UNIT_HIGH = np.nextafter(1.0, 0.0)
+
+
+@dataclass
+class ShockDistribution:
+    """
+    Marginal distribution of a stress factor
+
+    - normal: mean + std * z
+    - lognormal: exp(mean + std * z) (mean/std of the underlying normal)
+    - uniform: low + (high - low) * Phi(z)
+    - fixed: always mean
+
+    Draws come from the distribution truncated to the factor's domain,
+    narrowed by [min_value, max_value] when given: no probability piles up
+    on the bounds, as clipping would. A spec with no probability inside
+    that range (e.g. a fixed value outside it) is rejected.
+    """
+    distribution: str = "normal"
+    mean: float = 0.0
+    std: float = 0.0
+    low: float = 0.0
+    high: float = 0.0
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+    def fixed_value(self) -> Optional[float]:
+        """The only value drawn when the distribution is degenerate, else None"""
+        if self.distribution == "fixed":
+            return float(self.mean)
+        if self.distribution == "normal" and self.std == 0:
+            return float(self.mean)
+        if self.distribution == "lognormal" and self.std == 0:
+            return math.exp(self.mean)
+        if self.distribution == "uniform" and self.high == self.low:
+            return float(self.low)
+        return None
+
+    def support(self, lo: float, hi: float) -> Tuple[float, float]:
+        """The factor domain [lo, hi] narrowed by min_value / max_value"""
+        if self.min_value is not None:
+            lo = max(lo, self.min_value)
+        if self.max_value is not None:
+            hi = min(hi, self.max_value)
+        return lo, hi
+
+    def cdf(self, x: float) -> float:
+        """Untruncated CDF at x"""
+        if self.distribution == "normal":
+            return _STANDARD_NORMAL.cdf((x - self.mean) / self.std)
+        if self.distribution == "lognormal":
+            return _STANDARD_NORMAL.cdf((math.log(x) - self.mean) / self.std) if x > 0 else 0.0
+        return min(1.0, max(0.0, (x - self.low) / (self.high - self.low)))
+
+    def ppf(self, u: np.ndarray) -> np.ndarray:
+        """Untruncated inverse CDF of probabilities in (0, 1)"""
+        if self.distribution == "uniform":
+            return self.low + (self.high - self.low) * u
+        z = _normal_inv_cdf(u)
+        if self.distribution == "normal":
+            return self.mean + self.std * z
+        return np.exp(self.mean + self.std * z)
+
+    def check(self, lo: float, hi: float, label: str = "shock"):
+        """Raise ValueError unless the spec has probability inside the factor domain [lo, hi]"""
+        if self.distribution not in ("normal", "lognormal", "uniform", "fixed"):
+            raise ValueError(f"Unknown distribution: {self.distribution}")
+        if self.distribution == "uniform" and self.high < self.low:
+            raise ValueError(f"{label}: uniform high must be >= low")
+        lo, hi = self.support(lo, hi)
+        if lo > hi:
+            raise ValueError(f"{label}: min_value/max_value leave no values in [{lo:g}, {hi:g}]")
+        value = self.fixed_value()
+        if value is not None:
+            if not lo <= value <= hi:
+                raise ValueError(f"{label}: value {value:g} is outside [{lo:g}, {hi:g}]")
+        elif self.cdf(hi) - self.cdf(lo) <= 0:
+            raise ValueError(f"{label}: distribution has no probability within [{lo:g}, {hi:g}]")
+
+    def from_standard_normal(self, z: np.ndarray, lo: float = -math.inf, hi: float = math.inf) -> np.ndarray:
+        """
+        Map standard normal draws to this distribution truncated to [lo, hi] (Gaussian copula)
+
+        Phi(z) is rescaled onto [F(lo), F(hi)] and inverted, so the
+        mapping stays monotonic in z and correlations carry over.
+        """
+        lo, hi = self.support(lo, hi)
+        value = self.fixed_value()
+        if value is not None:
+            return np.full(np.shape(z), value)
+
+        cdf_lo, cdf_hi = self.cdf(lo), self.cdf(hi)
+        u = cdf_lo + (cdf_hi - cdf_lo) * _normal_cdf(z)
+        draws = self.ppf(np.clip(u, _UNIT_LOW, _UNIT_HIGH))
+        # Only rounding can step outside the bounds here
+        return np.clip(draws, lo, hi)
+
+
+@dataclass
+class MonteCarloSpec:
+    """Monte Carlo run configuration"""
+    paths: int
+    ebitda_drop_percent: ShockDistribution
+    interest_rate_hike_bps: ShockDistribution
+    # None: one EBITDA shock per path for the whole portfolio. Otherwise each
+    # sector draws its own shock with this pairwise correlation.
+    sector_correlation: Optional[float] = None
+    seed: int = 0
+    percentiles: Sequence[float] = field(default_factory=lambda: (50, 90, 95, 99))
+
+    def check(self):
+        """Raise ValueError for a shock spec with no probability inside its factor's domain"""
+        self.ebitda_drop_percent.check(*EBITDA_DROP_RANGE, label="ebitda_drop_percent")
+        self.interest_rate_hike_bps.check(*RATE_HIKE_RANGE, label="interest_rate_hike_bps")
+
+
+@dataclass
+class _MonteCarloModel:
+    """
+    Portfolio state shipped once to each worker process
+
+    Loans are reordered so the closed-form ("indexed") loans come first,
+    grouped by sector, followed by the residual loans. Each sector's indexed
+    loans then form a contiguous slice compared against one shock column.
+
+    Breakpoints are stored closed: an open boundary (e.g. a `>=` covenant
+    on its threshold) is moved one float inwards, so `d >= start` and
+    `d <= end` test it exactly without per-loan flags in the path loop.
+    """
+    loan_count: int
+    order: np.ndarray  # model position -> snapshot position
+    loan_amounts: np.ndarray  # model order
+    sector_count: int
+    sector_ranges: List[Tuple[int, int, int, bool]]  # (sector, lo, hi, has_prefix)
+    # Indexed loans only, model order
+    start_fixed: np.ndarray
+    start_slope: np.ndarray
+    end_fixed: np.ndarray
+    end_slope: np.ndarray
+    residual: PortfolioSnapshot
+    residual_sector_idx: np.ndarray  # per residual covenant
+
+
+def _closed(boundaries: np.ndarray, closed: np.ndarray, towards: float) -> np.ndarray:
+    """Boundaries with the open ones moved to the next float `towards` the level's side"""
+    return np.where(closed, boundaries, np.nextafter(boundaries, towards))
+
+
+def _breach_boundaries(indexed: PortfolioSnapshot, rate_hike: Optional[float]) -> Tuple[np.ndarray, ...]:
+    """
+    Closed (start_fixed, start_slope, end_fixed, end_slope) for the indexed loans
+
+    With a fixed rate hike every path shares it, so the boundaries are
+    solved at that rate and snapped to the engine like the breakpoint
+    index; otherwise the rate-linked slopes are kept.
+    """
+    if rate_hike is not None:
+        starts, ends, start_closed, end_closed = loan_boundaries(indexed, STATUS_BREACH, rate_hike)
+        return (
+            _closed(starts, start_closed, np.inf),
+            np.full(len(starts), np.inf),
+            _closed(ends, end_closed, -np.inf),
+            np.full(len(ends), -np.inf),
+        )
+    breach = LoanBreakpoints(indexed, STATUS_BREACH)
+    # d > 100 + g * slope  <=>  (d - 100) / g > slope, so slope flags carry over
+    return (
+        _closed(breach.start_fixed, breach.start_fixed_closed, np.inf),
+        _closed(breach.start_slope, breach.start_slope_closed, np.inf),
+        _closed(breach.end_fixed, breach.end_fixed_closed, -np.inf),
+        _closed(breach.end_slope, breach.end_slope_closed, -np.inf),
+    )
+
+
+def _build_model(snapshot: PortfolioSnapshot, spec: MonteCarloSpec) -> _MonteCarloModel:
+    sectors = sorted({s or "" for s in snapshot.sectors})
+    sector_lookup = {s: i for i, s in enumerate(sectors)}
+    loan_sector_idx = np.array([sector_lookup[s or ""] for s in snapshot.sectors], dtype=np.int64)
+
+    residual_loans = split_residual_loans(snapshot)
+    indexed_positions = np.flatnonzero(~residual_loans)
+    indexed_positions = indexed_positions[np.argsort(loan_sector_idx[indexed_positions], kind="stable")]
+    residual_positions = np.flatnonzero(residual_loans)
+
+    indexed_mask = np.zeros(snapshot.loan_count, dtype=bool)
+    indexed_mask[indexed_positions] = True
+    boundaries = _breach_boundaries(
+        snapshot.select_loans(indexed_mask), spec.interest_rate_hike_bps.fixed_value()
+    )
+    # select_loans keeps snapshot order; permute into sector order
+    rank = np.argsort(np.argsort(indexed_positions, kind="stable"), kind="stable")
+    start_fixed, start_slope, end_fixed, end_slope = (b[rank] for b in boundaries)
+
+    sector_ranges = []
+    indexed_sectors = loan_sector_idx[indexed_positions]
+    for sector in range(len(sectors)):
+        lo = int(np.searchsorted(indexed_sectors, sector, side="left"))
+        hi = int(np.searchsorted(indexed_sectors, sector, side="right"))
+        if hi > lo:
+            has_prefix = bool(
+                (end_fixed[lo:hi] > -np.inf).any() or (end_slope[lo:hi] > -np.inf).any()
+            )
+            sector_ranges.append((sector, lo, hi, has_prefix))
+
+    residual = snapshot.select_loans(residual_loans)
+    order = np.concatenate([indexed_positions, residual_positions])
+    return _MonteCarloModel(
+        loan_count=snapshot.loan_count,
+        order=order,
+        loan_amounts=snapshot.loan_amounts[order],
+        sector_count=max(1, len(sectors)),
+        sector_ranges=sector_ranges,
+        start_fixed=start_fixed,
+        start_slope=start_slope,
+        end_fixed=end_fixed,
+        end_slope=end_slope,
+        residual=residual,
+        residual_sector_idx=loan_sector_idx[residual_positions][residual.cov_loan_idx],
+    )
+
+
+def _draw_block(
+    spec: MonteCarloSpec,
+    sector_count: int,
+    seed_sequence: np.random.SeedSequence,
+    paths: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Draw EBITDA drops (paths x sectors) and rate hikes (paths x 1)"""
+    rng = np.random.default_rng(seed_sequence)
+    z_common = rng.standard_normal((paths, 1))
+    if spec.sector_correlation is None:
+        z_ebitda = np.broadcast_to(z_common, (paths, sector_count))
+    else:
+        rho = spec.sector_correlation
+        z_sector = rng.standard_normal((paths, sector_count))
+        z_ebitda = math.sqrt(rho) * z_common + math.sqrt(1 - rho) * z_sector
+    z_rate = rng.standard_normal((paths, 1))
+
+    ebitda = spec.ebitda_drop_percent.from_standard_normal(z_ebitda, *EBITDA_DROP_RANGE)
+    rates = spec.interest_rate_hike_bps.from_standard_normal(z_rate, *RATE_HIKE_RANGE)
+    return ebitda, rates
+
+
+def _simulate_block(
+    model: _MonteCarloModel,
+    spec: MonteCarloSpec,
+    seed_sequence: np.random.SeedSequence,
+    paths: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate one block of paths
+
+    Returns per-loan breach counts (model order) and the breached exposure of
+    each path.
+    """
+    ebitda, rates = _draw_block(spec, model.sector_count, seed_sequence, paths)
+    # d >= 100 + g * slope  <=>  (d - 100) / g >= slope, since g > 0
+    scaled = (ebitda - 100) / (1 + rates / 10000)
+    indexed_count = len(model.start_fixed)
+
+    breach_counts = np.zeros(model.loan_count, dtype=np.int64)
+    losses = np.empty(paths, dtype=np.float64)
+
+    chunk = max(1, GRID_BATCH_CELLS // max(1, model.loan_count))
+    breached = np.zeros((min(chunk, paths), model.loan_count), dtype=bool)
+    scratch = np.empty_like(breached)
+    for lo in range(0, paths, chunk):
+        hi = min(lo + chunk, paths)
+        n = hi - lo
+        hit, tmp = breached[:n], scratch[:n]
+
+        for sector, a, b, has_prefix in model.sector_ranges:
+            d = ebitda[lo:hi, sector:sector + 1]
+            u = scaled[lo:hi, sector:sector + 1]
+            out, t = hit[:, a:b], tmp[:, a:b]
+            np.greater_equal(d, model.start_fixed[a:b], out=out)
+            np.greater_equal(u, model.start_slope[a:b], out=t)
+            out |= t
+            if has_prefix:
+                np.less_equal(d, model.end_fixed[a:b], out=t)
+                out |= t
+                np.less_equal(u, model.end_slope[a:b], out=t)
+                out |= t
+
+        if model.residual.covenant_count:
+            residual = model.residual
+            stressed = stress_values(
+                residual.current_values,
+                residual.kind_codes,
+                ebitda[lo:hi][:, model.residual_sector_idx],
+                rates[lo:hi]
+            )
+            statuses, _, _ = classify_breaches(stressed, residual.thresholds, residual.op_codes)
+            hit[:, indexed_count:] = loan_status_matrix(residual, statuses) == STATUS_BREACH
+
+        breach_counts += hit.sum(axis=0)
+        losses[lo:hi] = hit @ model.loan_amounts
+
+    return breach_counts, losses
+
+
+def _simulate_shard(
+    model: _MonteCarloModel,
+    spec: MonteCarloSpec,
+    seed_sequences: Sequence[np.random.SeedSequence],
+    block_sizes: Sequence[int]
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Simulate consecutive blocks; one pool task, so the model is pickled once per shard"""
+    return [_simulate_block(model, spec, seed, size) for seed, size in zip(seed_sequences, block_sizes)]
+
+
+# Process pool shared by every run; started on first use, stopped at app shutdown
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_monte_carlo_pool() -> ProcessPoolExecutor:
+    """Get or start the process-wide Monte Carlo worker pool (settings.MONTE_CARLO_WORKERS)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.MONTE_CARLO_WORKERS or os.cpu_count() or 1)
+        return _pool
+
+
+def shutdown_monte_carlo_pool():
+    """Stop the worker pool, cancelling runs that have not started"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_monte_carlo(
+    snapshot: PortfolioSnapshot,
+    spec: MonteCarloSpec,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Run a Monte Carlo stress simulation over the snapshot
+
+    Paths are split into fixed-size blocks, each with its own child seed
+    from SeedSequence(spec.seed), and the blocks are split into `workers`
+    shards on the shared process pool. Results depend only on the seed,
+    never on the worker count. Loan-level breach tests use the closed-form
+    breakpoints, so each path costs a few operations per loan rather than
+    per covenant. Raises ValueError for an out-of-domain shock spec.
+    """
+    spec.check()
+    model = _build_model(snapshot, spec)
+
+    block_sizes = [PATHS_PER_BLOCK] * (spec.paths // PATHS_PER_BLOCK)
+    if spec.paths % PATHS_PER_BLOCK:
+        block_sizes.append(spec.paths % PATHS_PER_BLOCK)
+    seeds = np.random.SeedSequence(spec.seed).spawn(len(block_sizes))
+
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    workers = max(1, min(workers, len(block_sizes)))
+    if workers == 1:
+        blocks = _simulate_shard(model, spec, seeds, block_sizes)
+    else:
+        bounds = np.linspace(0, len(block_sizes), workers + 1).astype(int)
+        pool = get_monte_carlo_pool()
+        futures = [
+            pool.submit(_simulate_shard, model, spec, seeds[lo:hi], block_sizes[lo:hi])
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        ]
+        blocks = [block for future in futures for block in future.result()]
+
+    breach_counts = np.zeros(snapshot.loan_count, dtype=np.int64)
+    breach_counts[model.order] = sum(block[0] for block in blocks)
+    losses = np.concatenate([block[1] for block in blocks])
+
+    breach_probabilities = (breach_counts / spec.paths).tolist()
+    loan_amounts = snapshot.loan_amounts.tolist()
+
+    loans = [
+        {
+            "loan_id": snapshot.loan_ids[i],
+            "company_name": snapshot.company_names[i],
+            "sector": snapshot.sectors[i],
+            "loan_amount": loan_amounts[i],
+            "currency": snapshot.currencies[i],
+            "breach_probability": round(breach_probabilities[i], 6)
+        }
+        for i in range(snapshot.loan_count)
+    ]
+
+    percentiles = np.percentile(losses, spec.percentiles) if len(losses) else np.zeros(len(spec.percentiles))
+    return {
+        "paths": spec.paths,
+        "seed": spec.seed,
+        "total_loans": snapshot.loan_count,
+        "loans": loans,
+        "loss_exposure": {
+            "expected": float(losses.mean()) if len(losses) else 0.0,
+            "percentiles": {
+                f"p{p:g}": float(v) for p, v in zip(spec.percentiles, percentiles)
+            },
+            "max": float(losses.max()) if len(losses) else 0.0
+        },
+        "expected_loans_breached": float(breach_counts.sum() / spec.paths)
+    }
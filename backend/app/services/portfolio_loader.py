@@ -0,0 +1,169 @@
+"""
+Portfolio Snapshot Loader
+Set-based loading of a tenant's loans and covenants (no per-loan queries)
+"""
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Loan, Covenant
+from app.services.stress_engine import PortfolioSnapshot
+
+# Loan statuses included in stress testing
+ACTIVE_LOAN_STATUSES = ("active", "watchlist")
+
+# Columns needed to build a PortfolioSnapshot
+SNAPSHOT_LOAN_COLUMNS = (
+    Loan.id,
+    Loan.company_name,
+    Loan.loan_amount,
+    Loan.currency,
+    Loan.sector,
+    Loan.relationship_manager,
+)
+SNAPSHOT_COVENANT_COLUMNS = (
+    Covenant.loan_id,
+    Covenant.id,
+    Covenant.clause_id,
+    Covenant.name,
+    Covenant.kind,
+    Covenant.threshold_value,
+    Covenant.operator,
+    Covenant.current_value,
+    Covenant.unit,
+)
+
+
+@dataclass(frozen=True)
+class PortfolioFilter:
+    """
+    Loan subset for a stress test, applied in the loan query's WHERE clause
+
+    Unset fields don't filter. `statuses` replaces the default active
+    statuses. Instances are hashable so they can be part of cache keys.
+    """
+    loan_ids: Optional[Tuple[str, ...]] = None
+    sectors: Optional[Tuple[str, ...]] = None
+    relationship_managers: Optional[Tuple[str, ...]] = None
+    statuses: Optional[Tuple[str, ...]] = None
+    min_loan_amount: Optional[float] = None
+    max_loan_amount: Optional[float] = None
+
+    @classmethod
+    def from_values(
+        cls,
+        loan_ids: Optional[Sequence[str]] = None,
+        sectors: Optional[Sequence[str]] = None,
+        relationship_managers: Optional[Sequence[str]] = None,
+        statuses: Optional[Sequence[str]] = None,
+        min_loan_amount: Optional[float] = None,
+        max_loan_amount: Optional[float] = None,
+    ) -> Optional["PortfolioFilter"]:
+        """Build a filter from request values; None when nothing is filtered"""
+        def as_tuple(values):
+            return tuple(values) if values is not None else None
+
+        filters = cls(
+            loan_ids=as_tuple(loan_ids),
+            sectors=as_tuple(sectors),
+            relationship_managers=as_tuple(relationship_managers),
+            statuses=as_tuple(statuses),
+            min_loan_amount=min_loan_amount,
+            max_loan_amount=max_loan_amount,
+        )
+        return filters if filters != cls() else None
+
+    def clauses(self) -> List[Any]:
+        """SQL filter expressions on Loan (status is handled by the loader)"""
+        clauses = []
+        if self.loan_ids is not None:
+            clauses.append(Loan.id.in_(list(self.loan_ids)))
+        if self.sectors is not None:
+            clauses.append(Loan.sector.in_(list(self.sectors)))
+        if self.relationship_managers is not None:
+            clauses.append(Loan.relationship_manager.in_(list(self.relationship_managers)))
+        if self.min_loan_amount is not None:
+            clauses.append(Loan.loan_amount >= self.min_loan_amount)
+        if self.max_loan_amount is not None:
+            clauses.append(Loan.loan_amount <= self.max_loan_amount)
+        return clauses
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The set fields, JSON-serializable"""
+        values = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if value is not None:
+                values[f.name] = list(value) if isinstance(value, tuple) else value
+        return values
+
+
+class PortfolioRows:
+    """Loan rows plus their covenant rows grouped by loan id, in load order"""
+
+    def __init__(self, loans: List[Any], covenants_by_loan: Dict[str, List[Any]]):
+        self.loans = loans
+        self.covenants_by_loan = covenants_by_loan
+
+
+def loan_filter_clauses(
+    tenant_id: str,
+    statuses: Optional[Sequence[str]] = ACTIVE_LOAN_STATUSES,
+    filters: Optional[PortfolioFilter] = None,
+) -> List[Any]:
+    """WHERE clauses on Loan selecting a tenant's stress-test loans"""
+    if filters is not None and filters.statuses is not None:
+        statuses = filters.statuses
+
+    clauses = [Loan.tenant_id == tenant_id]
+    if statuses is not None:
+        clauses.append(Loan.status.in_(list(statuses)))
+    if filters is not None:
+        clauses.extend(filters.clauses())
+    return clauses
+
+
+def load_portfolio_rows(
+    db: Session,
+    tenant_id: str,
+    statuses: Optional[Sequence[str]] = ACTIVE_LOAN_STATUSES,
+    loan_columns: Sequence[Any] = SNAPSHOT_LOAN_COLUMNS,
+    covenant_columns: Sequence[Any] = SNAPSHOT_COVENANT_COLUMNS,
+    filters: Optional[PortfolioFilter] = None,
+) -> PortfolioRows:
+    """
+    Fetch a tenant's loans and covenants in two queries
+
+    Only the requested columns are selected, so no ORM objects are hydrated.
+    Rows expose the model attribute names (e.g. `row.loan_amount`).
+    `covenant_columns` must include `Covenant.loan_id`. Pass `statuses=None`
+    to include loans in any status. `filters` narrows the loans in SQL, and
+    the covenant query joins on the same conditions, so a subset run only
+    reads the subset's rows.
+    """
+    loan_filters = loan_filter_clauses(tenant_id, statuses, filters)
+
+    loans = db.query(*loan_columns).filter(*loan_filters).all()
+
+    covenant_rows = db.query(*covenant_columns).join(
+        Loan, Covenant.loan_id == Loan.id
+    ).filter(*loan_filters).all()
+
+    covenants_by_loan: Dict[str, List[Any]] = defaultdict(list)
+    for row in covenant_rows:
+        covenants_by_loan[row.loan_id].append(row)
+
+    return PortfolioRows(loans, covenants_by_loan)
+
+
+def load_portfolio_snapshot(
+    db: Session,
+    tenant_id: str,
+    statuses: Optional[Sequence[str]] = ACTIVE_LOAN_STATUSES,
+    filters: Optional[PortfolioFilter] = None,
+) -> PortfolioSnapshot:
+    """Load a tenant's portfolio straight into columnar stress-test arrays"""
+    rows = load_portfolio_rows(db, tenant_id, statuses=statuses, filters=filters)
+    return PortfolioSnapshot.from_rows(rows.loans, rows.covenants_by_loan)
@@ -0,0 +1,111 @@
+"""
+Portfolio Versioning
+Per-tenant version counters and caches keyed on them
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from app.models import BUMPED_VERSIONS_KEY, PortfolioVersion
+
+T = TypeVar("T")
+L = TypeVar("L")
+
+
+def get_portfolio_version(db: Session, tenant_id: str) -> int:
+    """Current portfolio version of a tenant (0 if it has never changed)"""
+    version = db.query(PortfolioVersion.version).filter(
+        PortfolioVersion.tenant_id == tenant_id
+    ).scalar()
+    return version or 0
+
+
+def bump_portfolio_version(db: Session, tenant_ids: Iterable[str]) -> Dict[str, int]:
+    """
+    Increment tenants' portfolio versions in the session's transaction
+
+    ORM flushes of Loan/Covenant rows bump versions automatically. Writes
+    that bypass the unit of work (bulk_update_mappings, Query.update, raw
+    SQL) must call this themselves before committing. Returns the new
+    versions by tenant id.
+    """
+    versions = PortfolioVersion.bump(db.connection(), tenant_ids)
+    db.info.setdefault(BUMPED_VERSIONS_KEY, {}).update(versions)
+    return versions
+
+
+def bumped_portfolio_version(db: Session, tenant_id: str) -> Optional[int]:
+    """
+    Version the session's latest transaction bumped the tenant's portfolio to
+
+    Read it after commit (before the session starts another transaction):
+    unlike re-reading the database, it can't pick up a version another
+    writer committed in between. None if the transaction changed nothing
+    of the tenant's.
+    """
+    return db.info.get(BUMPED_VERSIONS_KEY, {}).get(tenant_id)
+
+
+class PortfolioCache:
+    """
+    LRU cache of values derived from a tenant's portfolio
+
+    Entries are keyed by (tenant, params, portfolio version). The version
+    is read before building, so a value built while the portfolio changes
+    is stored under the older version and never served afterwards. Entries
+    for superseded versions are dropped as newer ones are stored.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable, int], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, db: Session, tenant_id: str, params: Hashable, build: Callable[[], T]) -> T:
+        """Return the cached value for the tenant's current version, building it on a miss"""
+        return self.prepare(db, tenant_id, params, build, lambda value: value)()
+
+    def prepare(
+        self,
+        db: Session,
+        tenant_id: str,
+        params: Hashable,
+        load: Callable[[], L],
+        compute: Callable[[L], T]
+    ) -> Callable[[], T]:
+        """
+        Do a lookup's database work now and return a callable finishing it
+
+        Reads the version and, on a miss, runs `load` (the queries) right
+        away; `compute(loaded)` (the CPU-bound part) and the store happen
+        when the returned callable runs, which needs no session, so async
+        handlers can run it in a worker thread.
+        """
+        key = (tenant_id, params, get_portfolio_version(db, tenant_id))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                value = self._entries[key]
+                return lambda: value
+
+        loaded = load()
+
+        def finish() -> T:
+            value = compute(loaded)
+            with self._lock:
+                for stale in [k for k in self._entries if k[0] == tenant_id and k[2] < key[2]]:
+                    del self._entries[stale]
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+
+        return finish
+
+    def invalidate(self, tenant_id: Optional[str] = None):
+        """Drop cached values for a tenant (or all tenants)"""
+        with self._lock:
+            for key in [k for k in self._entries if tenant_id is None or k[0] == tenant_id]:
+                del self._entries[key]
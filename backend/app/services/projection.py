@@ -0,0 +1,210 @@
+"""
+Multi-Period Covenant Projection
+Quarter-by-quarter covenant paths under a stress shock path, as (quarters x loans) arrays
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from sqlalchemy.orm import Session
+
+from app.models import Covenant, Frequency, Loan
+from app.services.portfolio_loader import (
+    PortfolioFilter,
+    SNAPSHOT_LOAN_COLUMNS,
+    SNAPSHOT_COVENANT_COLUMNS,
+    load_portfolio_rows,
+)
+from app.services.stress_engine import (
+    PortfolioSnapshot,
+    STATUS_SAFE,
+    STATUS_AT_RISK,
+    STATUS_BREACH,
+    STATUS_LABELS,
+    GRID_BATCH_CELLS,
+    stress_values,
+    classify_breaches,
+    loan_status_matrix,
+)
+
+# Quarters between covenant tests; monthly covenants are tested every quarter
+FREQUENCY_QUARTERS = {
+    Frequency.MONTHLY: 1,
+    Frequency.QUARTERLY: 1,
+    Frequency.SEMI_ANNUAL: 2,
+    Frequency.ANNUAL: 4,
+}
+
+# Loan status codes in a projection besides the breach statuses
+PROJECTION_NOT_TESTED = -1  # No covenant falls due in the quarter
+PROJECTION_MATURED = -2  # Loan matured before the quarter end
+PROJECTION_LABELS = {
+    PROJECTION_MATURED: "matured",
+    PROJECTION_NOT_TESTED: "not_tested",
+    STATUS_SAFE: STATUS_LABELS[STATUS_SAFE],
+    STATUS_AT_RISK: STATUS_LABELS[STATUS_AT_RISK],
+    STATUS_BREACH: STATUS_LABELS[STATUS_BREACH],
+}
+
+PROJECTION_LOAN_COLUMNS = SNAPSHOT_LOAN_COLUMNS + (Loan.maturity_date,)
+PROJECTION_COVENANT_COLUMNS = SNAPSHOT_COVENANT_COLUMNS + (Covenant.frequency,)
+
+
+@dataclass
+class ProjectionInputs:
+    """A portfolio snapshot plus the schedule data a projection needs"""
+    snapshot: PortfolioSnapshot
+    maturity_dates: np.ndarray  # per loan, datetime64[D] (NaT if unknown)
+    test_intervals: np.ndarray  # per covenant, quarters between tests
+
+
+@dataclass
+class ProjectionResult:
+    """Per-quarter loan statuses of a projection"""
+    quarter_ends: List[date]
+    loan_statuses: np.ndarray  # (quarters, loans) status or PROJECTION_* codes
+    first_breach_quarter: np.ndarray  # per loan, 0-based quarter index or -1
+
+
+def load_projection_inputs(
+    db: Session,
+    tenant_id: str,
+    filters: Optional[PortfolioFilter] = None
+) -> ProjectionInputs:
+    """Load the snapshot with loan maturities and covenant test frequencies aligned to it"""
+    rows = load_portfolio_rows(
+        db,
+        tenant_id,
+        loan_columns=PROJECTION_LOAN_COLUMNS,
+        covenant_columns=PROJECTION_COVENANT_COLUMNS,
+        filters=filters
+    )
+    snapshot = PortfolioSnapshot.from_rows(rows.loans, rows.covenants_by_loan)
+
+    maturities = {loan.id: loan.maturity_date for loan in rows.loans}
+    frequencies = {
+        covenant.id: covenant.frequency
+        for covenants in rows.covenants_by_loan.values()
+        for covenant in covenants
+    }
+    maturity_dates = np.array(
+        [maturities[loan_id] or "NaT" for loan_id in snapshot.loan_ids], dtype="datetime64[D]"
+    )
+    test_intervals = np.array(
+        [
+            FREQUENCY_QUARTERS[Frequency(frequencies[cid] or Frequency.QUARTERLY)]
+            for cid in snapshot.covenant_ids
+        ],
+        dtype=np.int64
+    )
+    return ProjectionInputs(snapshot, maturity_dates, test_intervals)
+
+
+def quarter_end_dates(as_of: date, quarters: int) -> List[date]:
+    """Test dates of the projection: as_of plus 3, 6, ... months"""
+    return [as_of + relativedelta(months=3 * (q + 1)) for q in range(quarters)]
+
+
+def project_portfolio(
+    inputs: ProjectionInputs,
+    ebitda_drop_path: Sequence[float],
+    interest_rate_hike_path: Sequence[float],
+    as_of: date
+) -> ProjectionResult:
+    """
+    Evolve every covenant over the shock path, one quarter per path entry
+
+    Quarter q applies the path's cumulative shock at q to current values.
+    A covenant is tested in quarter q when (q + 1) is a multiple of its test
+    interval, and only while its loan has not matured by the quarter end.
+    All quarters are evaluated as one (quarters x covenants) batch (split
+    into GRID_BATCH_CELLS chunks), so the cost grows with the number of
+    quarters rather than with a Python loop per loan.
+    """
+    snapshot = inputs.snapshot
+    ebitda_path = np.asarray(ebitda_drop_path, dtype=np.float64)
+    rate_path = np.asarray(interest_rate_hike_path, dtype=np.float64)
+    quarters = len(ebitda_path)
+    ends = quarter_end_dates(as_of, quarters)
+    end_days = np.array(ends, dtype="datetime64[D]")
+
+    # (quarters, loans): loan still outstanding at the quarter end
+    outstanding = (inputs.maturity_dates[None, :] >= end_days[:, None]) | np.isnat(inputs.maturity_dates)[None, :]
+    # (quarters, covenants): covenant falls due this quarter
+    quarter_numbers = np.arange(1, quarters + 1)[:, None]
+    due = (quarter_numbers % inputs.test_intervals[None, :]) == 0
+
+    loan_statuses = np.full((quarters, snapshot.loan_count), PROJECTION_NOT_TESTED, dtype=np.int8)
+    batch = max(1, GRID_BATCH_CELLS // max(1, snapshot.covenant_count))
+    for lo in range(0, quarters, batch):
+        hi = min(lo + batch, quarters)
+        stressed = stress_values(
+            snapshot.current_values,
+            snapshot.kind_codes,
+            ebitda_path[lo:hi, None],
+            rate_path[lo:hi, None]
+        )
+        statuses, _, _ = classify_breaches(stressed, snapshot.thresholds, snapshot.op_codes)
+        tested = due[lo:hi] & outstanding[lo:hi][:, snapshot.cov_loan_idx]
+        # Untested covenants sit below every status so they never set the loan's
+        statuses = np.where(tested, statuses, PROJECTION_NOT_TESTED).astype(np.int8)
+        loan_statuses[lo:hi] = loan_status_matrix(snapshot, statuses - PROJECTION_NOT_TESTED) + PROJECTION_NOT_TESTED
+    loan_statuses[~outstanding] = PROJECTION_MATURED
+
+    breached = loan_statuses == STATUS_BREACH
+    first_breach_quarter = np.where(breached.any(axis=0), breached.argmax(axis=0), -1)
+    return ProjectionResult(ends, loan_statuses, first_breach_quarter)
+
+
+def build_projection_report(inputs: ProjectionInputs, result: ProjectionResult) -> Dict[str, Any]:
+    """Per-loan status paths and first breach quarter, plus per-quarter counts"""
+    snapshot = inputs.snapshot
+    labels = np.array([PROJECTION_LABELS[code] for code in sorted(PROJECTION_LABELS)], dtype=object)
+    label_paths = labels[result.loan_statuses.T - min(PROJECTION_LABELS)].tolist()
+    first_breach = result.first_breach_quarter.tolist()
+    quarter_ends = [d.isoformat() for d in result.quarter_ends]
+    maturity_dates = [str(d) if not np.isnat(d) else None for d in inputs.maturity_dates]
+
+    loans = [
+        {
+            "loan_id": snapshot.loan_ids[i],
+            "company_name": snapshot.company_names[i],
+            "maturity_date": maturity_dates[i],
+            "first_breach_quarter": first_breach[i] + 1 if first_breach[i] >= 0 else None,
+            "first_breach_date": quarter_ends[first_breach[i]] if first_breach[i] >= 0 else None,
+            "statuses": label_paths[i]
+        }
+        for i in range(snapshot.loan_count)
+    ]
+
+    def count(code: int) -> List[int]:
+        return (result.loan_statuses == code).sum(axis=1).tolist()
+
+    newly_breached = np.bincount(
+        result.first_breach_quarter[result.first_breach_quarter >= 0], minlength=len(quarter_ends)
+    ).tolist()
+    quarters = [
+        {
+            "quarter": q + 1,
+            "quarter_end": quarter_ends[q],
+            "loans_breached": breached,
+            "loans_at_risk": at_risk,
+            "loans_safe": safe,
+            "loans_not_tested": not_tested,
+            "loans_matured": matured,
+            "first_breaches": newly_breached[q]
+        }
+        for q, (breached, at_risk, safe, not_tested, matured) in enumerate(zip(
+            count(STATUS_BREACH), count(STATUS_AT_RISK), count(STATUS_SAFE),
+            count(PROJECTION_NOT_TESTED), count(PROJECTION_MATURED)
+        ))
+    ]
+
+    return {
+        "total_loans": snapshot.loan_count,
+        "loans_breaching": int((result.first_breach_quarter >= 0).sum()),
+        "quarters": quarters,
+        "loans": loans
+    }
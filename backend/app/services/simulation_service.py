@@ -2,9 +2,85 @@
 Covenant Breach Simulation Service
 Simulates stress scenarios and calculates breach probabilities
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence, Tuple
+from datetime import date, datetime
+import json
+import math
+import uuid
 from sqlalchemy.orm import Session
-from app.models import Loan, Covenant, CovenantOperator, CovenantStatus
+from app.database import SessionLocal
+from app.models import Covenant, CovenantKind, CovenantOperator, StressTestResult, classify_covenant_kind
+from app.services.portfolio_loader import PortfolioFilter, load_portfolio_snapshot
+from app.services.factor_model import FactorModel, FactorShocks
+from app.services.projection import ProjectionInputs, build_projection_report, load_projection_inputs, project_portfolio
+from app.services.breakpoint_index import get_breakpoint_index_cache
+from app.services.monte_carlo import MonteCarloSpec, run_monte_carlo
+from app.services.stress_results import StressResultWriter
+from app.services.portfolio_version import PortfolioCache
+from app.services.sql_stress import has_unclassified_covenants, sql_stress_summary, supports_in_database
+from app.config import settings
+from app.services.stress_engine import (
+    PortfolioSnapshot,
+    ScenarioResult,
+    GridResult,
+    evaluate_scenario,
+    evaluate_grid,
+    iter_loan_results,
+    summarize_scenario,
+    rollup_scenario,
+    build_risk_heatmap,
+)
+
+# How often (in loans) progress callbacks fire while building a heatmap
+PROGRESS_INTERVAL_LOANS = 500
+
+# Columnar results (snapshot, ScenarioResult) of recently run scenarios,
+# keyed by portfolio version. Heatmaps are rendered from them per call, so
+# an entry costs a few NumPy arrays rather than a dict per covenant.
+_stress_result_cache = PortfolioCache(max_entries=settings.STRESS_TEST_CACHE_SIZE)
+
+# Snapshots shared by the cached results of every scenario on a loan subset
+_snapshot_cache = PortfolioCache(max_entries=settings.STRESS_SNAPSHOT_CACHE_SIZE)
+
+# Factor sensitivity matrices, keyed like the snapshots they are built from
+_factor_model_cache = PortfolioCache(max_entries=settings.STRESS_SNAPSHOT_CACHE_SIZE)
+
+
+def get_stress_result_cache() -> PortfolioCache:
+    """Get the process-wide stress test result cache"""
+    return _stress_result_cache
+
+
+def get_snapshot_cache() -> PortfolioCache:
+    """Get the process-wide portfolio snapshot cache"""
+    return _snapshot_cache
+
+
+def get_factor_model_cache() -> PortfolioCache:
+    """Get the process-wide factor model cache"""
+    return _factor_model_cache
+
+
+def finite_or_none(value: Any) -> Any:
+    """Copy of a JSON-style value with NaN / +-inf floats replaced by None"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: finite_or_none(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [finite_or_none(item) for item in value]
+    return value
+
+
+def ndjson_line(payload: Dict[str, Any]) -> str:
+    """
+    One NDJSON line
+
+    Non-finite floats (e.g. cushions under a 100% EBITDA drop) are written as
+    null, as the JSON responses serialize them; bare NaN / Infinity tokens
+    are not valid JSON.
+    """
+    return json.dumps(finite_or_none(payload), allow_nan=False) + "\n"
 
 
 class SimulationService:
@@ -24,26 +100,27 @@ class SimulationService:
             current_value: Current ratio value
             ebitda_drop_percent: Percentage drop in EBITDA (e.g., 20 for 20%)
             interest_rate_hike_bps: Interest rate increase in basis points (e.g., 100 for 1%)
-            ratio_type: Type of ratio (debt_ebitda, interest_coverage, dscr, etc.)
+            ratio_type: Covenant name or ratio type (debt_ebitda, "Debt-to-EBITDA", dscr, etc.)
         """
         ebitda_multiplier = 1 - (ebitda_drop_percent / 100)
         rate_multiplier = 1 + (interest_rate_hike_bps / 10000)
+        kind = classify_covenant_kind(ratio_type)
         
-        if "debt_ebitda" in ratio_type.lower() or "leverage" in ratio_type.lower():
+        if kind == CovenantKind.LEVERAGE:
             # Debt/EBITDA: If EBITDA drops, ratio increases
             return current_value / ebitda_multiplier
         
-        elif "interest_coverage" in ratio_type.lower() or "interest_cover" in ratio_type.lower():
+        elif kind == CovenantKind.INTEREST_COVERAGE:
             # Interest Coverage = EBITDA / Interest Expense
             # If EBITDA drops and interest rises, coverage drops significantly
             return current_value * ebitda_multiplier / rate_multiplier
         
-        elif "dscr" in ratio_type.lower() or "debt_service" in ratio_type.lower():
+        elif kind == CovenantKind.DSCR:
             # DSCR = (EBITDA - CapEx) / Debt Service
             # Similar to interest coverage
             return current_value * ebitda_multiplier / rate_multiplier
         
-        elif "current_ratio" in ratio_type.lower():
+        elif kind == CovenantKind.CURRENT_RATIO:
             # Current ratio less sensitive to EBITDA/interest changes
             # Assume 10% impact from working capital stress
             return current_value * 0.9
@@ -115,86 +192,430 @@ class SimulationService:
             "unit": covenant.unit
         }
     
+    @staticmethod
+    def load_snapshot(
+        db: Session,
+        tenant_id: str,
+        filters: Optional[PortfolioFilter] = None
+    ) -> PortfolioSnapshot:
+        """Load the tenant's active loans (optionally a filtered subset) into NumPy arrays"""
+        return load_portfolio_snapshot(db, tenant_id, filters=filters)
+    
+    @staticmethod
+    def evaluate_snapshot(
+        snapshot: PortfolioSnapshot,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        factors: Optional[FactorShocks] = None,
+        model: Optional[FactorModel] = None
+    ) -> ScenarioResult:
+        """
+        Evaluate a scenario over a snapshot
+        
+        Without extra factor shocks this is the exact two-parameter model;
+        otherwise each covenant's stressed value comes from the factor
+        sensitivity matrix: `model` when given (the snapshot's cached
+        FactorModel), else one built for this call.
+        """
+        if factors is None:
+            return evaluate_scenario(snapshot, ebitda_drop_percent, interest_rate_hike_bps)
+        model = model if model is not None else FactorModel(snapshot)
+        return model.evaluate(ebitda_drop_percent, interest_rate_hike_bps, factors)
+    
+    def prepare_scenario(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None
+    ) -> Callable[[], Tuple[PortfolioSnapshot, ScenarioResult]]:
+        """
+        Load the (cached) snapshot now; returns a callable evaluating the scenario
+        
+        Factor runs reuse the FactorModel cached for the snapshot, built by
+        the callable on a miss. The callable needs no session.
+        """
+        def load() -> PortfolioSnapshot:
+            return get_snapshot_cache().get_or_build(
+                db, tenant_id, filters, lambda: self.load_snapshot(db, tenant_id, filters)
+            )
+        
+        if factors is None:
+            snapshot = load()
+            return lambda: (
+                snapshot, self.evaluate_snapshot(snapshot, ebitda_drop_percent, interest_rate_hike_bps)
+            )
+        
+        build_model = get_factor_model_cache().prepare(db, tenant_id, filters, load, FactorModel)
+        
+        def evaluate() -> Tuple[PortfolioSnapshot, ScenarioResult]:
+            model = build_model()
+            return model.snapshot, self.evaluate_snapshot(
+                model.snapshot, ebitda_drop_percent, interest_rate_hike_bps, factors, model
+            )
+        
+        return evaluate
+    
     def simulate_stress_test(
         self,
         db: Session,
         tenant_id: str,
         ebitda_drop_percent: float,
-        interest_rate_hike_bps: float
+        interest_rate_hike_bps: float,
+        progress: Optional[Callable[[int, int], None]] = None,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None,
+        group_by: Sequence[str] = ()
     ) -> Dict[str, Any]:
         """
         Run stress test simulation across all active loans
         
-        Returns risk heatmap with breach analysis
-        """
-        # Get all active loans for tenant
-        loans = db.query(Loan).filter(
-            Loan.tenant_id == tenant_id,
-            Loan.status.in_(["active", "watchlist"])
-        ).all()
-        
-        risk_heatmap = {
-            "loans": [],
-            "summary": {
-                "total_loans": 0,
-                "loans_breached": 0,
-                "loans_at_risk": 0,
-                "loans_safe": 0
-            }
+        `filters` restricts the run to a loan subset, selected in SQL.
+        `factors` adds sector EBITDA, working capital and capex shocks.
+        `group_by` (ROLLUP_KEYS) adds per-group `rollups` to the heatmap.
+        
+        Returns risk heatmap with breach analysis. The portfolio is evaluated
+        in one vectorized batch; results match calculate_stressed_ratio and
+        check_covenant_breach applied covenant by covenant.
+        
+        Without a progress callback the scenario's columnar result is cached
+        by tenant, scenario and portfolio version, so repeat runs against
+        unchanged loans and covenants skip the load and evaluation; the
+        heatmap itself is rendered per call.
+        
+        If given, `progress(loans_processed, total_loans)` is called as the
+        heatmap is assembled; it may raise to abort the run.
+        """
+        if progress is None:
+            return self.prepare_stress_test(
+                db, tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters, factors, group_by
+            )()
+        
+        snapshot, result = self.prepare_scenario(
+            db, tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters, factors
+        )()
+        total = snapshot.loan_count
+        loans = []
+        progress(0, total)
+        for loan_results in iter_loan_results(snapshot, result):
+            loans.append(loan_results)
+            if len(loans) % PROGRESS_INTERVAL_LOANS == 0:
+                progress(len(loans), total)
+        progress(total, total)
+        
+        heatmap = {
+            "loans": loans,
+            "summary": summarize_scenario(snapshot, result)
         }
+        if group_by:
+            heatmap["rollups"] = rollup_scenario(snapshot, result, group_by)
+        return heatmap
+    
+    def prepare_stress_test(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None,
+        group_by: Sequence[str] = ()
+    ) -> Callable[[], Dict[str, Any]]:
+        """
+        Run simulate_stress_test's queries now; returns a callable for the rest
         
-        for loan in loans:
-            # Get all covenants for this loan
-            covenants = db.query(Covenant).filter(Covenant.loan_id == loan.id).all()
-            
-            if not covenants:
-                continue
-            
-            loan_results = {
-                "loan_id": loan.id,
-                "company_name": loan.company_name,
-                "loan_amount": loan.loan_amount,
-                "currency": loan.currency,
-                "covenants": [],
-                "overall_status": "safe",
-                "breach_count": 0,
-                "at_risk_count": 0
-            }
-            
-            for covenant in covenants:
-                if covenant.current_value is None:
-                    continue
-                
-                # Calculate stressed value
-                stressed_value = self.calculate_stressed_ratio(
-                    current_value=covenant.current_value,
+        The callable evaluates the scenario (on a cache miss) and renders the
+        heatmap without touching the session, so async handlers can run it
+        in a worker thread instead of on the event loop.
+        """
+        def load() -> Callable[[], Tuple[PortfolioSnapshot, ScenarioResult]]:
+            return self.prepare_scenario(
+                db, tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters, factors
+            )
+        
+        key = (float(ebitda_drop_percent), float(interest_rate_hike_bps), filters, factors)
+        finish = get_stress_result_cache().prepare(db, tenant_id, key, load, lambda evaluate: evaluate())
+        return lambda: build_risk_heatmap(*finish(), group_by)
+    
+    def stream_stress_test(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None,
+        group_by: Sequence[str] = ()
+    ) -> Iterator[str]:
+        """
+        Run a stress test and return its results as NDJSON lines
+        
+        The portfolio is loaded and evaluated before this returns, so errors
+        surface before any output is sent. The returned iterator yields one
+        line per loan (the same entries as `risk_heatmap["loans"]`) and then
+        a trailing summary line carrying the saved `test_id` (and `rollups`
+        when `group_by` is given). Result rows are
+        written in batches as lines are produced, on a session of their own
+        since the request session may already be closed while streaming.
+        """
+        return self.stream_scenario(
+            self.prepare_scenario(db, tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters, factors),
+            tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters, factors, group_by
+        )
+    
+    def stream_scenario(
+        self,
+        evaluate: Callable[[], Tuple[PortfolioSnapshot, ScenarioResult]],
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None,
+        group_by: Sequence[str] = ()
+    ) -> Iterator[str]:
+        """stream_stress_test over a prepare_scenario callable (no request session needed)"""
+        snapshot, result = evaluate()
+        
+        def lines() -> Iterator[str]:
+            summary = summarize_scenario(snapshot, result)
+            rollups = rollup_scenario(snapshot, result, group_by) if group_by else None
+            save_db = SessionLocal()
+            try:
+                test_result = self.begin_stress_test(
+                    db=save_db,
+                    tenant_id=tenant_id,
                     ebitda_drop_percent=ebitda_drop_percent,
                     interest_rate_hike_bps=interest_rate_hike_bps,
-                    ratio_type=covenant.name.lower()
+                    summary=summary,
+                    filters=filters,
+                    factors=factors,
+                    rollups=rollups
                 )
-                
-                # Check breach status
-                result = self.check_covenant_breach(covenant, stressed_value)
-                loan_results["covenants"].append(result)
-                
-                # Update loan-level status
-                if result["status"] == "breach":
-                    loan_results["breach_count"] += 1
-                    loan_results["overall_status"] = "breach"
-                elif result["status"] == "at_risk" and loan_results["overall_status"] != "breach":
-                    loan_results["at_risk_count"] += 1
-                    loan_results["overall_status"] = "at_risk"
-            
-            # Update summary
-            risk_heatmap["summary"]["total_loans"] += 1
-            if loan_results["overall_status"] == "breach":
-                risk_heatmap["summary"]["loans_breached"] += 1
-            elif loan_results["overall_status"] == "at_risk":
-                risk_heatmap["summary"]["loans_at_risk"] += 1
-            else:
-                risk_heatmap["summary"]["loans_safe"] += 1
+                writer = StressResultWriter(save_db, test_result.id)
+                for loan_results in iter_loan_results(snapshot, result):
+                    writer.add(loan_results)
+                    yield ndjson_line(loan_results)
+                writer.flush()
+                save_db.commit()
+                test_id = test_result.id
+            except BaseException:
+                # Includes the client disconnecting mid-stream
+                save_db.rollback()
+                raise
+            finally:
+                save_db.close()
             
-            risk_heatmap["loans"].append(loan_results)
+            trailer = {
+                "test_id": test_id,
+                "ebitda_drop_percent": ebitda_drop_percent,
+                "interest_rate_hike_bps": interest_rate_hike_bps,
+                "summary": summary,
+                "created_at": datetime.now().isoformat()
+            }
+            if rollups is not None:
+                trailer["rollups"] = rollups
+            yield ndjson_line(trailer)
         
-        return risk_heatmap
-
+        return lines()
+    
+    @staticmethod
+    def begin_stress_test(
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        summary: Dict[str, int],
+        created_by: Optional[str] = None,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None,
+        rollups: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    ) -> StressTestResult:
+        """Add and flush (not commit) the StressTestResult row that result rows hang off"""
+        test_result = StressTestResult(
+            id=f"test-{uuid.uuid4().hex[:8]}",
+            tenant_id=tenant_id,
+            ebitda_drop_percent=ebitda_drop_percent,
+            interest_rate_hike_bps=interest_rate_hike_bps,
+            filters=filters.to_dict() if filters is not None else None,
+            factors=factors.to_dict() if factors is not None else None,
+            total_loans_tested=summary["total_loans"],
+            loans_breached=summary["loans_breached"],
+            loans_at_risk=summary["loans_at_risk"],
+            loans_safe=summary["loans_safe"],
+            rollups=rollups,
+            created_by=created_by
+        )
+        db.add(test_result)
+        db.flush()
+        return test_result
+    
+    @staticmethod
+    def save_stress_test(
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        risk_heatmap: Dict[str, Any],
+        created_by: Optional[str] = None,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None
+    ) -> StressTestResult:
+        """
+        Persist a stress test run and return the stored row
+        
+        Loan and covenant outcomes are bulk-inserted as StressTestLoanResult /
+        StressTestCovenantResult rows rather than stored as a JSON blob.
+        """
+        test_result = SimulationService.begin_stress_test(
+            db=db,
+            tenant_id=tenant_id,
+            ebitda_drop_percent=ebitda_drop_percent,
+            interest_rate_hike_bps=interest_rate_hike_bps,
+            summary=risk_heatmap["summary"],
+            created_by=created_by,
+            filters=filters,
+            factors=factors,
+            rollups=risk_heatmap.get("rollups")
+        )
+        writer = StressResultWriter(db, test_result.id)
+        for loan_results in risk_heatmap["loans"]:
+            writer.add(loan_results)
+        writer.flush()
+        db.commit()
+        return test_result
+    
+    def simulate_scenario_grid(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percents: List[float],
+        interest_rate_hike_bps: List[float],
+        include_loan_surfaces: bool = False
+    ) -> GridResult:
+        """
+        Evaluate an EBITDA drop x rate hike scenario grid
+        
+        The portfolio is loaded once and all scenarios are evaluated in
+        batched passes; nothing is persisted.
+        """
+        snapshot = self.load_snapshot(db, tenant_id)
+        return evaluate_grid(
+            snapshot,
+            ebitda_drop_percents,
+            interest_rate_hike_bps,
+            include_loan_surfaces=include_loan_surfaces
+        )
+    
+    def breakpoint_summary(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float
+    ) -> Dict[str, int]:
+        """
+        Loan counts per status answered from the tenant's breakpoint index
+        
+        The index for a rate hike is built on first use and reused until the
+        tenant's covenants change.
+        """
+        index = get_breakpoint_index_cache().get(db, tenant_id, interest_rate_hike_bps)
+        return index.summary(ebitda_drop_percent)
+    
+    def stress_summary(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None
+    ) -> Dict[str, int]:
+        """
+        Loan counts per status, evaluated inside the database
+        
+        No covenant rows leave the database; one aggregate query returns the
+        counts. Scenarios SQL can't express exactly (a 100% EBITDA drop) and
+        portfolios with covenants missing the persisted kind code fall back
+        to the NumPy engine, so the counts always match simulate_stress_test.
+        """
+        return self.prepare_stress_summary(db, tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters)()
+    
+    def prepare_stress_summary(
+        self,
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None
+    ) -> Callable[[], Dict[str, int]]:
+        """Run stress_summary's queries now; returns a callable for the NumPy fallback (session-free)"""
+        if supports_in_database(ebitda_drop_percent) and not has_unclassified_covenants(db, tenant_id, filters):
+            summary = sql_stress_summary(db, tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters)
+            return lambda: summary
+        
+        snapshot = self.load_snapshot(db, tenant_id, filters)
+        return lambda: summarize_scenario(
+            snapshot, evaluate_scenario(snapshot, ebitda_drop_percent, interest_rate_hike_bps)
+        )
+    
+    def reverse_stress_test(
+        self,
+        db: Session,
+        tenant_id: str,
+        interest_rate_hike_bps: float
+    ) -> List[Dict[str, Any]]:
+        """Smallest EBITDA drop that breaches each loan at a given rate hike"""
+        index = get_breakpoint_index_cache().get(db, tenant_id, interest_rate_hike_bps)
+        return index.reverse_stress()
+    
+    def simulate_monte_carlo(
+        self,
+        db: Session,
+        tenant_id: str,
+        spec: MonteCarloSpec,
+        workers: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Stochastic stress test: breach probabilities and loss-exposure percentiles
+        
+        Paths are vectorized and sharded across a process pool
+        (settings.MONTE_CARLO_WORKERS, default CPU count).
+        """
+        snapshot = self.load_snapshot(db, tenant_id)
+        if workers is None:
+            workers = settings.MONTE_CARLO_WORKERS
+        return run_monte_carlo(snapshot, spec, workers=workers)
+    
+    @staticmethod
+    def project_stress_test(
+        db: Session,
+        tenant_id: str,
+        ebitda_drop_path: List[float],
+        interest_rate_hike_path: List[float],
+        as_of: Optional[date] = None,
+        filters: Optional[PortfolioFilter] = None
+    ) -> Dict[str, Any]:
+        """
+        Project covenants quarter by quarter along a shock path
+        
+        Each covenant is tested at its monitoring frequency until its loan
+        matures; returns each loan's status path and first breach quarter.
+        """
+        inputs = load_projection_inputs(db, tenant_id, filters)
+        return SimulationService.project_inputs(inputs, ebitda_drop_path, interest_rate_hike_path, as_of)
+    
+    @staticmethod
+    def project_inputs(
+        inputs: ProjectionInputs,
+        ebitda_drop_path: List[float],
+        interest_rate_hike_path: List[float],
+        as_of: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """project_stress_test over already loaded inputs (no session needed)"""
+        as_of = as_of or date.today()
+        result = project_portfolio(inputs, ebitda_drop_path, interest_rate_hike_path, as_of)
+        report = build_projection_report(inputs, result)
+        report["as_of_date"] = as_of.isoformat()
+        return report
@@ -0,0 +1,137 @@
+"""
+In-Database Stress Evaluation
+Stress summaries computed by SQL CASE expressions, grouped by loan
+"""
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session
+
+from app.models import Loan, Covenant, CovenantKind, CovenantOperator
+from app.services.portfolio_loader import PortfolioFilter, loan_filter_clauses
+from app.services.stress_engine import (
+    STATUS_SAFE,
+    STATUS_AT_RISK,
+    STATUS_BREACH,
+    AT_RISK_CUSHION_PERCENT,
+)
+
+UPPER_BOUND_OPERATORS = (CovenantOperator.LESS_THAN, CovenantOperator.LESS_THAN_EQUAL)
+
+
+def supports_in_database(ebitda_drop_percent: float) -> bool:
+    """
+    Whether a scenario can be evaluated in SQL
+
+    A 100% EBITDA drop divides leverage ratios by zero, which NumPy turns
+    into +/-inf but PostgreSQL rejects; such scenarios use the NumPy engine.
+    """
+    return ebitda_drop_percent < 100
+
+
+def stressed_value_expression(ebitda_drop_percent: float, interest_rate_hike_bps: float):
+    """SQL counterpart of stress_values for one scenario"""
+    ebitda_multiplier = 1 - (ebitda_drop_percent / 100)
+    rate_multiplier = 1 + (interest_rate_hike_bps / 10000)
+    current_value = Covenant.current_value
+
+    return case(
+        (Covenant.kind.in_([CovenantKind.INTEREST_COVERAGE, CovenantKind.DSCR]),
+         current_value * ebitda_multiplier / rate_multiplier),
+        (Covenant.kind == CovenantKind.CURRENT_RATIO, current_value * 0.9),
+        else_=current_value / ebitda_multiplier
+    )
+
+
+def status_expression(stressed, threshold, operator, current_value):
+    """
+    SQL counterpart of classify_breaches (status code only)
+
+    Takes column expressions for one covenant row. Cushions divide by the
+    threshold; a zero threshold is special-cased to NumPy's +/-inf
+    semantics instead, since PostgreSQL raises on division by zero and
+    SQLite returns NULL.
+    """
+    upper_bound = operator.in_(UPPER_BOUND_OPERATORS)
+
+    is_breached = or_(
+        and_(operator == CovenantOperator.LESS_THAN, stressed >= threshold),
+        and_(operator == CovenantOperator.LESS_THAN_EQUAL, stressed > threshold),
+        and_(operator == CovenantOperator.GREATER_THAN, stressed <= threshold),
+        and_(operator == CovenantOperator.GREATER_THAN_EQUAL, stressed < threshold),
+    )
+    is_at_risk = case(
+        (threshold == 0, case((upper_bound, stressed > 0), else_=stressed < 0)),
+        (upper_bound, ((threshold - stressed) / threshold) * 100.0 < AT_RISK_CUSHION_PERCENT),
+        else_=((stressed - threshold) / threshold) * 100.0 < AT_RISK_CUSHION_PERCENT
+    )
+
+    return case(
+        (current_value.is_(None), STATUS_SAFE),
+        (is_breached, STATUS_BREACH),
+        (is_at_risk, STATUS_AT_RISK),
+        else_=STATUS_SAFE
+    )
+
+
+def has_unclassified_covenants(
+    db: Session,
+    tenant_id: str,
+    filters: Optional[PortfolioFilter] = None
+) -> bool:
+    """Whether any selected covenant predates the persisted Covenant.kind column"""
+    return db.query(Covenant.id).join(Loan, Covenant.loan_id == Loan.id).filter(
+        *loan_filter_clauses(tenant_id, filters=filters),
+        Covenant.kind.is_(None)
+    ).first() is not None
+
+
+def sql_stress_summary(
+    db: Session,
+    tenant_id: str,
+    ebitda_drop_percent: float,
+    interest_rate_hike_bps: float,
+    filters: Optional[PortfolioFilter] = None
+) -> Dict[str, Any]:
+    """
+    Loan counts per status for one scenario, computed in a single query
+
+    Stressed values are computed once per covenant row in the innermost
+    subquery, classified with CASE expressions, reduced to a loan status
+    with MAX(...) GROUP BY loan and counted in the outer query. Matches summarize_scenario for the same loans; only loans with
+    covenant rows are counted, and covenants without a current value are
+    treated as safe.
+    """
+    covenant_rows = db.query(
+        Covenant.loan_id,
+        Covenant.threshold_value,
+        Covenant.operator,
+        Covenant.current_value,
+        stressed_value_expression(ebitda_drop_percent, interest_rate_hike_bps).label("stressed_value")
+    ).join(
+        Loan, Covenant.loan_id == Loan.id
+    ).filter(
+        *loan_filter_clauses(tenant_id, filters=filters)
+    ).subquery()
+
+    c = covenant_rows.c
+    loan_statuses = db.query(
+        func.max(
+            status_expression(c.stressed_value, c.threshold_value, c.operator, c.current_value)
+        ).label("loan_status")
+    ).select_from(covenant_rows).group_by(c.loan_id).subquery()
+
+    status = loan_statuses.c.loan_status
+    totals = db.query(
+        func.count(),
+        func.coalesce(func.sum(case((status == STATUS_BREACH, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((status == STATUS_AT_RISK, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((status == STATUS_SAFE, 1), else_=0)), 0),
+    ).select_from(loan_statuses).one()
+
+    return {
+        "total_loans": int(totals[0]),
+        "loans_breached": int(totals[1]),
+        "loans_at_risk": int(totals[2]),
+        "loans_safe": int(totals[3])
+    }
@@ -0,0 +1,586 @@
+"""
+Columnar Stress Test Engine
+Vectorized covenant breach evaluation over NumPy portfolio arrays
+"""
+from dataclasses import dataclass, fields
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models import CovenantKind, CovenantOperator, classify_covenant_kind
+
+# Ratio kind codes (how a covenant reacts to EBITDA / interest rate stress)
+KIND_LEVERAGE = int(CovenantKind.LEVERAGE)
+KIND_INTEREST_COVERAGE = int(CovenantKind.INTEREST_COVERAGE)
+KIND_DSCR = int(CovenantKind.DSCR)
+KIND_CURRENT_RATIO = int(CovenantKind.CURRENT_RATIO)
+KIND_DEFAULT = int(CovenantKind.DEFAULT)
+
+# Operator codes
+OP_LESS_THAN = 0
+OP_LESS_THAN_EQUAL = 1
+OP_GREATER_THAN = 2
+OP_GREATER_THAN_EQUAL = 3
+OP_EQUAL = 4
+
+OPERATOR_CODES = {
+    CovenantOperator.LESS_THAN: OP_LESS_THAN,
+    CovenantOperator.LESS_THAN_EQUAL: OP_LESS_THAN_EQUAL,
+    CovenantOperator.GREATER_THAN: OP_GREATER_THAN,
+    CovenantOperator.GREATER_THAN_EQUAL: OP_GREATER_THAN_EQUAL,
+    CovenantOperator.EQUAL: OP_EQUAL,
+}
+
+# Status codes, ordered by severity so a loan's status is the max of its covenants
+STATUS_SAFE = 0
+STATUS_AT_RISK = 1
+STATUS_BREACH = 2
+STATUS_LABELS = ("safe", "at_risk", "breach")
+
+# A covenant within this cushion (percent) of its threshold is "at risk"
+AT_RISK_CUSHION_PERCENT = 5
+
+
+# Kept for callers classifying by name; covenants persist the code in Covenant.kind
+classify_ratio_kind = classify_covenant_kind
+
+
+# PortfolioSnapshot fields holding one entry per loan (the rest are per covenant)
+LOAN_COLUMNS = ("loan_ids", "company_names", "loan_amounts", "currencies", "sectors", "relationship_managers")
+
+# Loan attributes results can be rolled up by, and the snapshot column holding each
+ROLLUP_KEYS = {
+    "sector": "sectors",
+    "relationship_manager": "relationship_managers",
+    "currency": "currencies",
+}
+
+
+@dataclass
+class PortfolioSnapshot:
+    """
+    Columnar view of the loans and covenants under test
+
+    Only loans with at least one covenant are included. Covenant arrays hold
+    the covenants that have a current value, grouped by loan in load order, so
+    `cov_loan_idx` is non-decreasing.
+    """
+    # Loan columns (length L)
+    loan_ids: List[str]
+    company_names: List[str]
+    loan_amounts: np.ndarray
+    currencies: List[str]
+    sectors: List[Optional[str]]
+    relationship_managers: List[Optional[str]]
+
+    # Covenant columns (length C)
+    cov_loan_idx: np.ndarray
+    current_values: np.ndarray
+    thresholds: np.ndarray
+    op_codes: np.ndarray
+    kind_codes: np.ndarray
+    covenant_ids: List[str]
+    clause_ids: List[str]
+    names: List[str]
+    operators: List[str]
+    units: List[str]
+
+    @property
+    def loan_count(self) -> int:
+        return len(self.loan_ids)
+
+    @property
+    def covenant_count(self) -> int:
+        return len(self.covenant_ids)
+
+    def loan_slices(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Start/end offsets of each loan's covenants in the covenant arrays"""
+        loan_range = np.arange(self.loan_count)
+        starts = np.searchsorted(self.cov_loan_idx, loan_range, side="left")
+        ends = np.searchsorted(self.cov_loan_idx, loan_range, side="right")
+        return starts, ends
+
+    def select_loans(self, loan_mask: np.ndarray) -> "PortfolioSnapshot":
+        """Return a snapshot restricted to the loans where `loan_mask` is True"""
+        loan_positions = np.flatnonzero(loan_mask)
+        cov_positions = np.flatnonzero(loan_mask[self.cov_loan_idx])
+        new_loan_idx = np.full(self.loan_count, -1, dtype=np.int64)
+        new_loan_idx[loan_positions] = np.arange(len(loan_positions))
+
+        columns = {}
+        for field in fields(self):
+            values = getattr(self, field.name)
+            if field.name == "cov_loan_idx":
+                columns[field.name] = new_loan_idx[values[cov_positions]]
+                continue
+            positions = loan_positions if field.name in LOAN_COLUMNS else cov_positions
+            if isinstance(values, np.ndarray):
+                columns[field.name] = values[positions]
+            else:
+                columns[field.name] = [values[i] for i in positions]
+        return PortfolioSnapshot(**columns)
+
+    @classmethod
+    def from_rows(
+        cls,
+        loans: Iterable[Any],
+        covenants_by_loan: Dict[str, List[Any]]
+    ) -> "PortfolioSnapshot":
+        """
+        Build a snapshot from loan and covenant rows
+
+        Rows may be ORM objects or named tuples exposing the model attribute
+        names. Loans without covenants are skipped. The persisted
+        `Covenant.kind` code is used when present; rows written before that
+        column existed are classified from their name.
+        """
+        loan_ids, company_names, loan_amounts, currencies, sectors, managers = [], [], [], [], [], []
+        cov_loan_idx, current_values, thresholds, op_codes, kind_codes = [], [], [], [], []
+        covenant_ids, clause_ids, names, operators, units = [], [], [], [], []
+
+        for loan in loans:
+            covenants = covenants_by_loan.get(loan.id)
+            if not covenants:
+                continue
+
+            loan_index = len(loan_ids)
+            loan_ids.append(loan.id)
+            company_names.append(loan.company_name)
+            loan_amounts.append(loan.loan_amount)
+            currencies.append(loan.currency)
+            sectors.append(loan.sector)
+            managers.append(loan.relationship_manager)
+
+            for covenant in covenants:
+                if covenant.current_value is None:
+                    continue
+                operator = CovenantOperator(covenant.operator)
+                cov_loan_idx.append(loan_index)
+                current_values.append(covenant.current_value)
+                thresholds.append(covenant.threshold_value)
+                op_codes.append(OPERATOR_CODES[operator])
+                kind = getattr(covenant, "kind", None)
+                kind_codes.append(kind if kind is not None else classify_covenant_kind(covenant.name))
+                covenant_ids.append(covenant.id)
+                clause_ids.append(covenant.clause_id)
+                names.append(covenant.name)
+                operators.append(operator.value)
+                units.append(covenant.unit)
+
+        return cls(
+            loan_ids=loan_ids,
+            company_names=company_names,
+            loan_amounts=np.array(loan_amounts, dtype=np.float64),
+            currencies=currencies,
+            sectors=sectors,
+            relationship_managers=managers,
+            cov_loan_idx=np.array(cov_loan_idx, dtype=np.int64),
+            current_values=np.array(current_values, dtype=np.float64),
+            thresholds=np.array(thresholds, dtype=np.float64),
+            op_codes=np.array(op_codes, dtype=np.int8),
+            kind_codes=np.array(kind_codes, dtype=np.int8),
+            covenant_ids=covenant_ids,
+            clause_ids=clause_ids,
+            names=names,
+            operators=operators,
+            units=units,
+        )
+
+
+@dataclass
+class ScenarioResult:
+    """Per-covenant and per-loan outcome of one stress scenario"""
+    stressed_values: np.ndarray
+    cushions: np.ndarray
+    breach_margins: np.ndarray
+    statuses: np.ndarray
+    loan_statuses: np.ndarray
+    loan_breach_counts: np.ndarray
+    loan_at_risk_counts: np.ndarray
+
+
+def stress_values(
+    current_values: np.ndarray,
+    kind_codes: np.ndarray,
+    ebitda_drop_percent,
+    interest_rate_hike_bps
+) -> np.ndarray:
+    """
+    Vectorized counterpart of SimulationService.calculate_stressed_ratio
+
+    The stress parameters may be scalars or arrays that broadcast against the
+    covenant arrays (e.g. shape (S, 1) to evaluate S scenarios at once).
+    """
+    ebitda_multiplier = 1 - (np.asarray(ebitda_drop_percent, dtype=np.float64) / 100)
+    rate_multiplier = 1 + (np.asarray(interest_rate_hike_bps, dtype=np.float64) / 10000)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ebitda_linked = current_values / ebitda_multiplier
+        coverage = current_values * ebitda_multiplier / rate_multiplier
+    working_capital = current_values * 0.9
+
+    is_coverage = (kind_codes == KIND_INTEREST_COVERAGE) | (kind_codes == KIND_DSCR)
+    return np.where(
+        is_coverage,
+        coverage,
+        np.where(kind_codes == KIND_CURRENT_RATIO, working_capital, ebitda_linked)
+    )
+
+
+def classify_breaches(
+    stressed_values: np.ndarray,
+    thresholds: np.ndarray,
+    op_codes: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized counterpart of SimulationService.check_covenant_breach
+
+    Returns (statuses, cushions, breach_margins).
+    """
+    is_breached = np.select(
+        [
+            op_codes == OP_LESS_THAN,
+            op_codes == OP_LESS_THAN_EQUAL,
+            op_codes == OP_GREATER_THAN,
+            op_codes == OP_GREATER_THAN_EQUAL,
+        ],
+        [
+            stressed_values >= thresholds,
+            stressed_values > thresholds,
+            stressed_values <= thresholds,
+            stressed_values < thresholds,
+        ],
+        default=False
+    )
+
+    upper_bound = (op_codes == OP_LESS_THAN) | (op_codes == OP_LESS_THAN_EQUAL)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cushions = np.where(
+            upper_bound,
+            ((thresholds - stressed_values) / thresholds) * 100,
+            ((stressed_values - thresholds) / thresholds) * 100
+        )
+    breach_margins = np.where(
+        upper_bound,
+        stressed_values - thresholds,
+        thresholds - stressed_values
+    )
+
+    statuses = np.where(
+        is_breached,
+        STATUS_BREACH,
+        np.where(cushions < AT_RISK_CUSHION_PERCENT, STATUS_AT_RISK, STATUS_SAFE)
+    ).astype(np.int8)
+    return statuses, cushions, breach_margins
+
+
+def rollup_loans(
+    snapshot: PortfolioSnapshot,
+    statuses: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Aggregate covenant statuses to loan level
+
+    Returns (loan_statuses, breach_counts, at_risk_counts). As in the original
+    per-loan loop, an at-risk covenant is only counted while the loan has no
+    earlier breach.
+    """
+    loan_idx = snapshot.cov_loan_idx
+    loan_count = snapshot.loan_count
+
+    loan_statuses = np.zeros(loan_count, dtype=np.int8)
+    np.maximum.at(loan_statuses, loan_idx, statuses)
+
+    breached = statuses == STATUS_BREACH
+    breach_counts = np.bincount(loan_idx[breached], minlength=loan_count)
+
+    # Breaches earlier in the same loan, for each covenant
+    breaches_before = np.cumsum(breached) - breached
+    group_start = np.searchsorted(loan_idx, loan_idx, side="left")
+    prior_breaches = breaches_before - breaches_before[group_start]
+    counted_at_risk = (statuses == STATUS_AT_RISK) & (prior_breaches == 0)
+    at_risk_counts = np.bincount(loan_idx[counted_at_risk], minlength=loan_count)
+
+    return loan_statuses, breach_counts, at_risk_counts
+
+
+def evaluate_scenario(
+    snapshot: PortfolioSnapshot,
+    ebitda_drop_percent: float,
+    interest_rate_hike_bps: float
+) -> ScenarioResult:
+    """Evaluate one stress scenario over the whole snapshot in a single batch"""
+    stressed = stress_values(
+        snapshot.current_values,
+        snapshot.kind_codes,
+        ebitda_drop_percent,
+        interest_rate_hike_bps
+    )
+    statuses, cushions, breach_margins = classify_breaches(
+        stressed, snapshot.thresholds, snapshot.op_codes
+    )
+    loan_statuses, breach_counts, at_risk_counts = rollup_loans(snapshot, statuses)
+
+    return ScenarioResult(
+        stressed_values=stressed,
+        cushions=cushions,
+        breach_margins=breach_margins,
+        statuses=statuses,
+        loan_statuses=loan_statuses,
+        loan_breach_counts=breach_counts,
+        loan_at_risk_counts=at_risk_counts,
+    )
+
+
+def reevaluate_loan(
+    snapshot: PortfolioSnapshot,
+    result: ScenarioResult,
+    loan_index: int,
+    start: int,
+    end: int,
+    ebitda_drop_percent: float,
+    interest_rate_hike_bps: float
+):
+    """
+    Re-evaluate one loan's covenants [start, end) in place
+
+    Updates the covenant and loan arrays of `result` after the snapshot's
+    current values for that loan changed. Cost is proportional to the
+    loan's covenant count, not the portfolio size.
+    """
+    stressed = stress_values(
+        snapshot.current_values[start:end],
+        snapshot.kind_codes[start:end],
+        ebitda_drop_percent,
+        interest_rate_hike_bps
+    )
+    statuses, cushions, breach_margins = classify_breaches(
+        stressed, snapshot.thresholds[start:end], snapshot.op_codes[start:end]
+    )
+    result.stressed_values[start:end] = stressed
+    result.cushions[start:end] = cushions
+    result.breach_margins[start:end] = breach_margins
+    result.statuses[start:end] = statuses
+
+    # Same at-risk counting rule as rollup_loans
+    breached = statuses == STATUS_BREACH
+    first_breach = int(np.argmax(breached)) if breached.any() else len(statuses)
+    result.loan_statuses[loan_index] = statuses.max() if len(statuses) else STATUS_SAFE
+    result.loan_breach_counts[loan_index] = int(breached.sum())
+    result.loan_at_risk_counts[loan_index] = int((statuses[:first_breach] == STATUS_AT_RISK).sum())
+
+
+def iter_loan_results(
+    snapshot: PortfolioSnapshot,
+    result: ScenarioResult
+) -> Iterator[Dict[str, Any]]:
+    """Yield each loan's heatmap entry in portfolio order"""
+    starts, ends = snapshot.loan_slices()
+
+    # Convert once to Python scalars; per-element numpy access is slow
+    current_values = snapshot.current_values.tolist()
+    thresholds = snapshot.thresholds.tolist()
+    stressed_values = result.stressed_values.tolist()
+    cushions = result.cushions.tolist()
+    breach_margins = result.breach_margins.tolist()
+    statuses = result.statuses.tolist()
+    loan_amounts = snapshot.loan_amounts.tolist()
+    loan_statuses = result.loan_statuses.tolist()
+    breach_counts = result.loan_breach_counts.tolist()
+    at_risk_counts = result.loan_at_risk_counts.tolist()
+
+    for i in range(snapshot.loan_count):
+        covenants = [
+            {
+                "covenant_id": snapshot.covenant_ids[j],
+                "clause_id": snapshot.clause_ids[j],
+                "name": snapshot.names[j],
+                "status": STATUS_LABELS[statuses[j]],
+                "current_value": current_values[j],
+                "stressed_value": round(stressed_values[j], 2),
+                "threshold": thresholds[j],
+                "operator": snapshot.operators[j],
+                "cushion_percent": round(cushions[j], 2),
+                "breach_margin": round(breach_margins[j], 2),
+                "unit": snapshot.units[j]
+            }
+            for j in range(starts[i], ends[i])
+        ]
+        yield {
+            "loan_id": snapshot.loan_ids[i],
+            "company_name": snapshot.company_names[i],
+            "loan_amount": loan_amounts[i],
+            "currency": snapshot.currencies[i],
+            "covenants": covenants,
+            "overall_status": STATUS_LABELS[loan_statuses[i]],
+            "breach_count": breach_counts[i],
+            "at_risk_count": at_risk_counts[i]
+        }
+
+
+def summarize_scenario(snapshot: PortfolioSnapshot, result: ScenarioResult) -> Dict[str, int]:
+    """Tenant-wide loan counts per status"""
+    status_totals = np.bincount(result.loan_statuses, minlength=3)
+    return {
+        "total_loans": snapshot.loan_count,
+        "loans_breached": int(status_totals[STATUS_BREACH]),
+        "loans_at_risk": int(status_totals[STATUS_AT_RISK]),
+        "loans_safe": int(status_totals[STATUS_SAFE])
+    }
+
+
+def rollup_scenario(
+    snapshot: PortfolioSnapshot,
+    result: ScenarioResult,
+    group_by: Sequence[str]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Loan counts, exposure and worst cushion per group, for each ROLLUP_KEYS key
+
+    Computed from the result arrays with bincounts, so it costs about the
+    same as the summary. Cushions that are not finite (zero thresholds) are
+    ignored; a group's worst cushion is None when it has no finite cushion.
+    """
+    loan_count = snapshot.loan_count
+    loan_worst = np.full(loan_count, np.inf)
+    finite = np.isfinite(result.cushions)
+    np.minimum.at(loan_worst, snapshot.cov_loan_idx[finite], result.cushions[finite])
+
+    rollups = {}
+    for key in group_by:
+        values = getattr(snapshot, ROLLUP_KEYS[key])
+        groups: Dict[Any, int] = {}
+        codes = np.fromiter((groups.setdefault(v, len(groups)) for v in values), dtype=np.int64, count=loan_count)
+        group_count = len(groups)
+
+        def per_group(weights: Optional[np.ndarray] = None, mask: Optional[np.ndarray] = None) -> List[float]:
+            selected = codes if mask is None else codes[mask]
+            w = weights if weights is None or mask is None else weights[mask]
+            return np.bincount(selected, weights=w, minlength=group_count).tolist()
+
+        breached = result.loan_statuses == STATUS_BREACH
+        at_risk = result.loan_statuses == STATUS_AT_RISK
+        totals = per_group()
+        breached_counts = per_group(mask=breached)
+        at_risk_counts = per_group(mask=at_risk)
+        exposure = per_group(snapshot.loan_amounts)
+        breached_exposure = per_group(snapshot.loan_amounts, breached)
+        at_risk_exposure = per_group(snapshot.loan_amounts, at_risk)
+        worst = np.full(group_count, np.inf)
+        np.minimum.at(worst, codes, loan_worst)
+        worst = worst.tolist()
+
+        entries = []
+        for value, g in groups.items():
+            entries.append({
+                key: value,
+                "total_loans": int(totals[g]),
+                "loans_breached": int(breached_counts[g]),
+                "loans_at_risk": int(at_risk_counts[g]),
+                "loans_safe": int(totals[g] - breached_counts[g] - at_risk_counts[g]),
+                "exposure": exposure[g],
+                "breached_exposure": breached_exposure[g],
+                "at_risk_exposure": at_risk_exposure[g],
+                "worst_cushion_percent": round(worst[g], 2) if np.isfinite(worst[g]) else None
+            })
+        entries.sort(key=lambda e: (e[key] is None, e[key] or ""))
+        rollups[key] = entries
+    return rollups
+
+
+def build_risk_heatmap(
+    snapshot: PortfolioSnapshot,
+    result: ScenarioResult,
+    group_by: Sequence[str] = ()
+) -> Dict[str, Any]:
+    """Render a scenario result in the risk heatmap format returned by the API"""
+    heatmap = {
+        "loans": list(iter_loan_results(snapshot, result)),
+        "summary": summarize_scenario(snapshot, result)
+    }
+    if group_by:
+        heatmap["rollups"] = rollup_scenario(snapshot, result, group_by)
+    return heatmap
+
+
+@dataclass
+class GridResult:
+    """Loan status counts over an EBITDA x rate-hike scenario grid"""
+    ebitda_drop_percents: np.ndarray
+    interest_rate_hike_bps: np.ndarray
+    loans_breached: np.ndarray
+    loans_at_risk: np.ndarray
+    loans_safe: np.ndarray
+    loan_ids: List[str]
+    loan_surfaces: Optional[np.ndarray] = None  # (L, E, R) status codes
+
+
+# Upper bound on scenario x covenant cells evaluated per batch
+GRID_BATCH_CELLS = 4_000_000
+
+
+def loan_status_matrix(snapshot: PortfolioSnapshot, statuses: np.ndarray) -> np.ndarray:
+    """
+    Reduce a (scenarios, covenants) status matrix to (scenarios, loans)
+
+    A loan's status is its most severe covenant status; loans without
+    evaluated covenants are safe.
+    """
+    loan_statuses = np.zeros((statuses.shape[0], snapshot.loan_count), dtype=np.int8)
+    if snapshot.covenant_count == 0:
+        return loan_statuses
+
+    starts, ends = snapshot.loan_slices()
+    has_covenants = ends > starts
+    loan_statuses[:, has_covenants] = np.maximum.reduceat(
+        statuses, starts[has_covenants], axis=1
+    )
+    return loan_statuses
+
+
+def evaluate_grid(
+    snapshot: PortfolioSnapshot,
+    ebitda_drop_percents: Sequence[float],
+    interest_rate_hike_bps: Sequence[float],
+    include_loan_surfaces: bool = False
+) -> GridResult:
+    """
+    Evaluate every (EBITDA drop, rate hike) combination in batched passes
+
+    Scenarios are processed in batches of at most GRID_BATCH_CELLS covenant
+    evaluations so memory stays bounded for large portfolios.
+    """
+    ebitda_axis = np.asarray(ebitda_drop_percents, dtype=np.float64)
+    rate_axis = np.asarray(interest_rate_hike_bps, dtype=np.float64)
+    shape = (len(ebitda_axis), len(rate_axis))
+
+    # Flatten the grid, row-major over (ebitda, rate)
+    scenario_ebitda = np.repeat(ebitda_axis, len(rate_axis))
+    scenario_rate = np.tile(rate_axis, len(ebitda_axis))
+    scenario_count = scenario_ebitda.size
+
+    loan_statuses = np.zeros((scenario_count, snapshot.loan_count), dtype=np.int8)
+    batch = max(1, GRID_BATCH_CELLS // max(1, snapshot.covenant_count))
+    for lo in range(0, scenario_count, batch):
+        hi = min(lo + batch, scenario_count)
+        stressed = stress_values(
+            snapshot.current_values,
+            snapshot.kind_codes,
+            scenario_ebitda[lo:hi, None],
+            scenario_rate[lo:hi, None]
+        )
+        statuses, _, _ = classify_breaches(stressed, snapshot.thresholds, snapshot.op_codes)
+        loan_statuses[lo:hi] = loan_status_matrix(snapshot, statuses)
+
+    def count(status_code: int) -> np.ndarray:
+        return (loan_statuses == status_code).sum(axis=1).reshape(shape)
+
+    return GridResult(
+        ebitda_drop_percents=ebitda_axis,
+        interest_rate_hike_bps=rate_axis,
+        loans_breached=count(STATUS_BREACH),
+        loans_at_risk=count(STATUS_AT_RISK),
+        loans_safe=count(STATUS_SAFE),
+        loan_ids=snapshot.loan_ids,
+        loan_surfaces=loan_statuses.T.reshape((snapshot.loan_count,) + shape) if include_loan_surfaces else None,
+    )
@@ -0,0 +1,244 @@
+"""
+Stress Test Job Manager
+Runs stress tests on a bounded background worker pool with progress and cancellation
+"""
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.portfolio_loader import PortfolioFilter
+from app.services.factor_model import FactorShocks
+from app.services.simulation_service import SimulationService
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation is requested"""
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+
+class StressTestJob:
+    """State of one background stress test"""
+
+    def __init__(
+        self,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None,
+        group_by: Sequence[str] = ()
+    ):
+        self.id = f"job-{uuid.uuid4().hex[:12]}"
+        self.tenant_id = tenant_id
+        self.ebitda_drop_percent = ebitda_drop_percent
+        self.interest_rate_hike_bps = interest_rate_hike_bps
+        self.filters = filters
+        self.factors = factors
+        self.group_by = tuple(group_by)
+        self.status = JOB_QUEUED
+        self.loans_processed = 0
+        self.total_loans: Optional[int] = None
+        self.test_id: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.cancel_requested = threading.Event()
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "tenant_id": self.tenant_id,
+            "ebitda_drop_percent": self.ebitda_drop_percent,
+            "interest_rate_hike_bps": self.interest_rate_hike_bps,
+            "filters": self.filters.to_dict() if self.filters is not None else None,
+            "factors": self.factors.to_dict() if self.factors is not None else None,
+            "group_by": list(self.group_by),
+            "progress": {
+                "loans_processed": self.loans_processed,
+                "total_loans": self.total_loans
+            },
+            "test_id": self.test_id,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class StressTestJobManager:
+    """
+    Bounded pool of stress test workers
+
+    At most `max_workers` jobs run at once and at most `max_queued` wait.
+    Finished jobs are retained (oldest evicted first) so clients can poll
+    for results. The StressTestResult row is only written on completion.
+    """
+
+    def __init__(self, max_workers: int, max_queued: int, max_retained: int = 1000):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_retained = max_retained
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, StressTestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="stress-test-job"
+            )
+        return self._executor
+
+    def submit(
+        self,
+        tenant_id: str,
+        ebitda_drop_percent: float,
+        interest_rate_hike_bps: float,
+        filters: Optional[PortfolioFilter] = None,
+        factors: Optional[FactorShocks] = None,
+        group_by: Sequence[str] = ()
+    ) -> StressTestJob:
+        """Queue a stress test; raises JobQueueFull when the queue is at capacity"""
+        job = StressTestJob(tenant_id, ebitda_drop_percent, interest_rate_hike_bps, filters, factors, group_by)
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.status == JOB_QUEUED)
+            if queued >= self.max_queued:
+                raise JobQueueFull()
+            self._jobs[job.id] = job
+            self._prune()
+            job.future = self._get_executor().submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[StressTestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[StressTestJob]:
+        """Cancel a queued or running job; finished jobs are left unchanged"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            job.cancel_requested.set()
+            if job.future is not None and job.future.cancel():
+                # Never started
+                self._finish(job, JOB_CANCELLED)
+        return job
+
+    def shutdown(self):
+        """Stop accepting work and cancel anything not yet finished"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status in FINISHED_STATES:
+                    continue
+                job.cancel_requested.set()
+                if job.future is not None and job.future.cancel():
+                    self._finish(job, JOB_CANCELLED)
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _prune(self):
+        """Evict the oldest finished jobs beyond the retention limit"""
+        excess = len(self._jobs) - self.max_retained
+        for job_id in [j.id for j in self._jobs.values() if j.status in FINISHED_STATES][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _finish(job: StressTestJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.now()
+
+    def _run(self, job: StressTestJob):
+        with self._lock:
+            if job.cancel_requested.is_set():
+                self._finish(job, JOB_CANCELLED)
+                return
+            job.status = JOB_RUNNING
+            job.started_at = datetime.now()
+
+        def progress(loans_processed: int, total_loans: int):
+            job.loans_processed = loans_processed
+            job.total_loans = total_loans
+            if job.cancel_requested.is_set():
+                raise JobCancelled()
+
+        db = SessionLocal()
+        try:
+            sim_service = SimulationService()
+            risk_heatmap = sim_service.simulate_stress_test(
+                db=db,
+                tenant_id=job.tenant_id,
+                ebitda_drop_percent=job.ebitda_drop_percent,
+                interest_rate_hike_bps=job.interest_rate_hike_bps,
+                progress=progress,
+                filters=job.filters,
+                factors=job.factors,
+                group_by=job.group_by
+            )
+            with self._lock:
+                if job.cancel_requested.is_set():
+                    self._finish(job, JOB_CANCELLED)
+                    return
+            test_result = sim_service.save_stress_test(
+                db=db,
+                tenant_id=job.tenant_id,
+                ebitda_drop_percent=job.ebitda_drop_percent,
+                interest_rate_hike_bps=job.interest_rate_hike_bps,
+                risk_heatmap=risk_heatmap,
+                filters=job.filters,
+                factors=job.factors
+            )
+            with self._lock:
+                job.test_id = test_result.id
+                self._finish(job, JOB_COMPLETED)
+        except JobCancelled:
+            db.rollback()
+            with self._lock:
+                self._finish(job, JOB_CANCELLED)
+        except Exception as e:
+            db.rollback()
+            logger.exception("[JOBS] Stress test job %s failed", job.id)
+            with self._lock:
+                self._finish(job, JOB_FAILED, str(e))
+        finally:
+            db.close()
+
+
+# Singleton instance
+_job_manager: Optional[StressTestJobManager] = None
+
+
+def get_stress_job_manager() -> StressTestJobManager:
+    """Get or create the process-wide stress test job manager"""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = StressTestJobManager(
+            max_workers=settings.STRESS_TEST_JOB_WORKERS,
+            max_queued=settings.STRESS_TEST_JOB_QUEUE_LIMIT
+        )
+    return _job_manager
@@ -0,0 +1,353 @@
+"""
+Stress Test Result Storage
+Row-per-loan and row-per-covenant persistence of stress test outcomes
+"""
+import math
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import StressTestResult, StressTestLoanResult, StressTestCovenantResult
+
+# Covenant rows buffered before a bulk insert
+WRITE_BATCH_ROWS = 5000
+
+# Heatmap covenant keys stored as StressTestCovenantResult columns
+COVENANT_RESULT_FIELDS = (
+    "covenant_id", "clause_id", "name", "status", "current_value", "stressed_value",
+    "threshold", "operator", "cushion_percent", "breach_margin", "unit",
+)
+
+# Supported sort keys for stored loan results
+SORT_BREACH_MARGIN = "breach_margin"
+SORT_BREACH_MARGIN_DESC = "-breach_margin"
+
+
+class StressResultWriter:
+    """
+    Buffered bulk writer for one stress test's loan and covenant rows
+
+    Call `add` with heatmap loan entries in order, then `flush` before
+    committing. The parent StressTestResult row must already be flushed.
+    """
+
+    def __init__(self, db: Session, test_id: str, batch_rows: int = WRITE_BATCH_ROWS):
+        self.db = db
+        self.test_id = test_id
+        self.batch_rows = batch_rows
+        self.position = 0
+        self._loan_rows: List[Dict[str, Any]] = []
+        self._covenant_rows: List[Dict[str, Any]] = []
+
+    def add(self, loan_results: Dict[str, Any]):
+        margins = [c["breach_margin"] for c in loan_results["covenants"]]
+        self._loan_rows.append({
+            "test_id": self.test_id,
+            "position": self.position,
+            "loan_id": loan_results["loan_id"],
+            "company_name": loan_results["company_name"],
+            "loan_amount": loan_results["loan_amount"],
+            "currency": loan_results["currency"],
+            "overall_status": loan_results["overall_status"],
+            "breach_count": loan_results["breach_count"],
+            "at_risk_count": loan_results["at_risk_count"],
+            "max_breach_margin": max(margins) if margins else None
+        })
+        for covenant in loan_results["covenants"]:
+            row = {field: covenant[field] for field in COVENANT_RESULT_FIELDS}
+            row["test_id"] = self.test_id
+            row["loan_position"] = self.position
+            self._covenant_rows.append(row)
+        self.position += 1
+
+        if len(self._loan_rows) + len(self._covenant_rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self._loan_rows:
+            self.db.bulk_insert_mappings(StressTestLoanResult, self._loan_rows)
+        if self._covenant_rows:
+            self.db.bulk_insert_mappings(StressTestCovenantResult, self._covenant_rows)
+        self._loan_rows = []
+        self._covenant_rows = []
+
+
+def _loan_entry(row: StressTestLoanResult, covenants: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "loan_id": row.loan_id,
+        "company_name": row.company_name,
+        "loan_amount": row.loan_amount,
+        "currency": row.currency,
+        "covenants": covenants,
+        "overall_status": row.overall_status,
+        "breach_count": row.breach_count,
+        "at_risk_count": row.at_risk_count
+    }
+
+
+def _covenant_entry(row: StressTestCovenantResult) -> Dict[str, Any]:
+    return {field: getattr(row, field) for field in COVENANT_RESULT_FIELDS}
+
+
+def query_loan_results(
+    db: Session,
+    test_id: str,
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = None
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Fetch one page of a stored stress test's loan entries
+
+    Filtering, sorting and paging run in SQL; covenants are fetched for the
+    page's loans only. Sorting by breach margin uses each loan's largest
+    covenant margin, loans without evaluated covenants last. Returns the
+    number of matching loans and the page, in heatmap entry format.
+    """
+    query = db.query(StressTestLoanResult).filter(StressTestLoanResult.test_id == test_id)
+    if status is not None:
+        query = query.filter(StressTestLoanResult.overall_status == status)
+    total = query.count()
+
+    margin = StressTestLoanResult.max_breach_margin
+    if sort == SORT_BREACH_MARGIN:
+        query = query.order_by(margin.is_(None), margin.asc(), StressTestLoanResult.position)
+    elif sort == SORT_BREACH_MARGIN_DESC:
+        query = query.order_by(margin.is_(None), margin.desc(), StressTestLoanResult.position)
+    else:
+        query = query.order_by(StressTestLoanResult.position)
+    query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    loan_rows = query.all()
+
+    covenants_by_position: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    if loan_rows:
+        covenant_query = db.query(StressTestCovenantResult).filter(
+            StressTestCovenantResult.test_id == test_id
+        )
+        if skip or limit is not None or status is not None:
+            covenant_query = covenant_query.filter(
+                StressTestCovenantResult.loan_position.in_([row.position for row in loan_rows])
+            )
+        for row in covenant_query.order_by(StressTestCovenantResult.id):
+            covenants_by_position[row.loan_position].append(_covenant_entry(row))
+
+    return total, [_loan_entry(row, covenants_by_position[row.position]) for row in loan_rows]
+
+
+def filter_legacy_loans(
+    loans: Iterable[Dict[str, Any]],
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = None
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """Apply query_loan_results semantics to a legacy risk_heatmap loan list"""
+    loans = [l for l in loans if status is None or l.get("overall_status") == status]
+
+    if sort in (SORT_BREACH_MARGIN, SORT_BREACH_MARGIN_DESC):
+        def max_margin(loan):
+            margins = [c.get("breach_margin") for c in loan.get("covenants", [])]
+            return max(margins) if margins else None
+
+        keyed = [(max_margin(l), i, l) for i, l in enumerate(loans)]
+        sign = -1 if sort == SORT_BREACH_MARGIN_DESC else 1
+        keyed.sort(key=lambda k: (k[0] is None, sign * (k[0] or 0), k[1]))
+        loans = [l for _, _, l in keyed]
+
+    end = None if limit is None else skip + limit
+    return len(loans), loans[skip:end]
+
+
+# Columns of one export row (loan fields repeated per covenant)
+EXPORT_RESULT_COLUMNS = (
+    StressTestLoanResult.loan_id,
+    StressTestLoanResult.company_name,
+    StressTestLoanResult.loan_amount,
+    StressTestCovenantResult.name,
+    StressTestCovenantResult.clause_id,
+    StressTestCovenantResult.current_value,
+    StressTestCovenantResult.stressed_value,
+    StressTestCovenantResult.threshold,
+    StressTestCovenantResult.status,
+    StressTestCovenantResult.cushion_percent,
+    StressTestCovenantResult.breach_margin,
+)
+
+
+def iter_export_rows(db: Session, test_id: str) -> Iterable[Any]:
+    """
+    Stream a stored stress test's covenant results joined to their loan, in heatmap order
+
+    Only EXPORT_RESULT_COLUMNS are selected, so no ORM objects are hydrated.
+    """
+    return db.query(*EXPORT_RESULT_COLUMNS).join(
+        StressTestCovenantResult,
+        (StressTestCovenantResult.test_id == StressTestLoanResult.test_id)
+        & (StressTestCovenantResult.loan_position == StressTestLoanResult.position)
+    ).filter(
+        StressTestLoanResult.test_id == test_id
+    ).order_by(StressTestLoanResult.position, StressTestCovenantResult.id).yield_per(WRITE_BATCH_ROWS)
+
+
+def is_legacy_result(test_result: StressTestResult) -> bool:
+    """Whether the run predates row storage and only has the risk_heatmap blob"""
+    return test_result.risk_heatmap is not None
+
+
+# Columns hash-joined when diffing two stored runs
+DIFF_LOAN_COLUMNS = (
+    StressTestLoanResult.loan_id,
+    StressTestLoanResult.company_name,
+    StressTestLoanResult.overall_status,
+)
+DIFF_COVENANT_COLUMNS = (
+    StressTestCovenantResult.covenant_id,
+    StressTestLoanResult.loan_id,
+    StressTestCovenantResult.name,
+    StressTestCovenantResult.status,
+    StressTestCovenantResult.cushion_percent,
+)
+
+
+def _diff_rows(
+    db: Session,
+    test_result: StressTestResult
+) -> Tuple[Dict[str, Tuple], Dict[str, Tuple]]:
+    """
+    Key one run's outcomes for a hash join
+
+    Returns {loan_id: (company_name, overall_status)} and
+    {covenant_id: (loan_id, name, status, cushion_percent)}, read as plain
+    column tuples (or from the legacy blob).
+    """
+    if is_legacy_result(test_result):
+        loans, covenants = {}, {}
+        for loan in test_result.risk_heatmap.get("loans", []):
+            loans[loan["loan_id"]] = (loan["company_name"], loan["overall_status"])
+            for c in loan.get("covenants", []):
+                covenants[c["covenant_id"]] = (loan["loan_id"], c["name"], c["status"], c.get("cushion_percent"))
+        return loans, covenants
+
+    loans = {
+        loan_id: (company_name, overall_status)
+        for loan_id, company_name, overall_status in db.query(*DIFF_LOAN_COLUMNS).filter(
+            StressTestLoanResult.test_id == test_result.id
+        ).yield_per(WRITE_BATCH_ROWS)
+    }
+    covenants = {
+        row[0]: row[1:]
+        for row in db.query(*DIFF_COVENANT_COLUMNS).join(
+            StressTestLoanResult,
+            (StressTestCovenantResult.test_id == StressTestLoanResult.test_id)
+            & (StressTestCovenantResult.loan_position == StressTestLoanResult.position)
+        ).filter(
+            StressTestCovenantResult.test_id == test_result.id
+        ).yield_per(WRITE_BATCH_ROWS)
+    }
+    return loans, covenants
+
+
+def _summary_counts(test_result: StressTestResult) -> Dict[str, int]:
+    return {
+        "total_loans_tested": test_result.total_loans_tested or 0,
+        "loans_breached": test_result.loans_breached or 0,
+        "loans_at_risk": test_result.loans_at_risk or 0,
+        "loans_safe": test_result.loans_safe or 0
+    }
+
+
+def diff_stress_tests(
+    db: Session,
+    base: StressTestResult,
+    compare: StressTestResult,
+    min_cushion_delta: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Compare two stored runs in one pass over each side
+
+    Both runs are keyed by loan id and covenant id and joined in memory, so
+    the cost is linear in the number of covenants. Reports loans and
+    covenants whose status changed (or that appear in only one run), each
+    changed covenant's cushion delta, status transition counts and the
+    summary movement. With `min_cushion_delta`, covenants whose cushion
+    moved by at least that many points are listed even if their status held.
+    """
+    base_loans, base_covenants = _diff_rows(db, base)
+    compare_loans, compare_covenants = _diff_rows(db, compare)
+
+    loans = []
+    transitions: Counter = Counter()
+    for loan_id in sorted(base_loans.keys() | compare_loans.keys()):
+        before = base_loans.get(loan_id)
+        after = compare_loans.get(loan_id)
+        base_status = before[1] if before else None
+        compare_status = after[1] if after else None
+        if base_status == compare_status:
+            continue
+        if before and after:
+            transitions[f"{base_status}->{compare_status}"] += 1
+        loans.append({
+            "loan_id": loan_id,
+            "company_name": (after or before)[0],
+            "base_status": base_status,
+            "compare_status": compare_status,
+            "change": "changed" if before and after else ("added" if after else "removed")
+        })
+
+    covenants = []
+    compared = improved = deteriorated = 0
+    delta_total = 0.0
+    for covenant_id in sorted(base_covenants.keys() | compare_covenants.keys(), key=str):
+        before = base_covenants.get(covenant_id)
+        after = compare_covenants.get(covenant_id)
+        delta = None
+        if before and after and before[3] is not None and after[3] is not None:
+            if math.isfinite(before[3]) and math.isfinite(after[3]):
+                delta = round(after[3] - before[3], 2)
+                compared += 1
+                delta_total += delta
+                improved += delta > 0
+                deteriorated += delta < 0
+
+        status_changed = not (before and after) or before[2] != after[2]
+        moved = min_cushion_delta is not None and delta is not None and abs(delta) >= min_cushion_delta
+        if not (status_changed or moved):
+            continue
+        loan_id, name = (after or before)[:2]
+        covenants.append({
+            "covenant_id": covenant_id,
+            "loan_id": loan_id,
+            "name": name,
+            "base_status": before[2] if before else None,
+            "compare_status": after[2] if after else None,
+            "base_cushion_percent": before[3] if before else None,
+            "compare_cushion_percent": after[3] if after else None,
+            "cushion_delta": delta,
+            "change": ("changed" if status_changed else "cushion") if before and after
+            else ("added" if after else "removed")
+        })
+
+    base_summary = _summary_counts(base)
+    compare_summary = _summary_counts(compare)
+    return {
+        "base_test_id": base.id,
+        "compare_test_id": compare.id,
+        "summary": {
+            "base": base_summary,
+            "compare": compare_summary,
+            "change": {key: compare_summary[key] - base_summary[key] for key in base_summary}
+        },
+        "transitions": dict(sorted(transitions.items())),
+        "cushions": {
+            "covenants_compared": compared,
+            "improved": improved,
+            "deteriorated": deteriorated,
+            "mean_delta": round(delta_total / compared, 4) if compared else None
+        },
+        "loans": loans,
+        "covenants": covenants
+    }
@@ -0,0 +1,56 @@
+"""
+Alembic Environment
+Migrates the database at DATABASE_URL to the models in app/models.py
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.database import DATABASE_URL
+from app.models import Base
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        # SQLite can't ALTER most things in place; batch mode copies the table
+        render_as_batch=True,
+        compare_type=True,
+        **kwargs
+    )
+
+
+def run_migrations_offline():
+    """Emit the migration SQL without a database connection"""
+    _configure(url=DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run migrations on the caller's connection (app startup) or a fresh one"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
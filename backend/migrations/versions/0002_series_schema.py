@@ -0,0 +1,140 @@
+"""stress engine, versioning and history schema
+
+Everything added to the models after the 0001 baseline. A database that
+create_all built from a later model revision is stamped at 0001 when it is
+adopted, so each table, column and index is only created if it is missing.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 11:40:03.527119
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+NEW_TABLES = [
+    'schema_fingerprints', 'portfolio_versions', 'stress_test_covenant_results',
+    'stress_test_loan_results', 'covenant_history',
+]
+
+# Nullable columns added to baseline tables
+NEW_COLUMNS = {
+    'covenants': [('kind', sa.Integer)],
+    'stress_test_results': [('filters', sa.JSON), ('factors', sa.JSON), ('rollups', sa.JSON)],
+}
+
+# (table, index name, columns); created after the columns and tables above
+NEW_INDEXES = [
+    ('loans', 'ix_loans_tenant_id_id', ['tenant_id', 'id']),
+    ('loans', 'ix_loans_tenant_sector', ['tenant_id', 'sector']),
+    ('loans', 'ix_loans_tenant_status', ['tenant_id', 'status']),
+    ('covenants', 'ix_covenants_kind', ['kind']),
+    ('covenant_audits', 'ix_covenant_audits_covenant_created', ['covenant_id', 'created_at']),
+    ('stress_test_covenant_results', 'ix_stress_test_covenant_results_test_loan', ['test_id', 'loan_position']),
+    ('stress_test_loan_results', 'ix_stress_test_loan_results_test_position', ['test_id', 'position']),
+    ('stress_test_loan_results', 'ix_stress_test_loan_results_test_status', ['test_id', 'overall_status']),
+    ('covenant_history', 'ix_covenant_history_covenant_recorded', ['covenant_id', 'recorded_at']),
+]
+
+
+def _create_tables(existing):
+    if 'schema_fingerprints' not in existing:
+        op.create_table('schema_fingerprints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fingerprint', sa.String(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'portfolio_versions' not in existing:
+        op.create_table('portfolio_versions',
+        sa.Column('tenant_id', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('tenant_id')
+        )
+    if 'stress_test_covenant_results' not in existing:
+        op.create_table('stress_test_covenant_results',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('test_id', sa.String(), nullable=False),
+        sa.Column('loan_position', sa.Integer(), nullable=False),
+        sa.Column('covenant_id', sa.String(), nullable=True),
+        sa.Column('clause_id', sa.String(), nullable=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('operator', sa.String(), nullable=True),
+        sa.Column('unit', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('current_value', sa.Float(), nullable=True),
+        sa.Column('stressed_value', sa.Float(), nullable=True),
+        sa.Column('threshold', sa.Float(), nullable=True),
+        sa.Column('cushion_percent', sa.Float(), nullable=True),
+        sa.Column('breach_margin', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['test_id'], ['stress_test_results.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'stress_test_loan_results' not in existing:
+        op.create_table('stress_test_loan_results',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('test_id', sa.String(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('loan_id', sa.String(), nullable=False),
+        sa.Column('company_name', sa.String(), nullable=True),
+        sa.Column('loan_amount', sa.Float(), nullable=True),
+        sa.Column('currency', sa.String(), nullable=True),
+        sa.Column('overall_status', sa.String(), nullable=False),
+        sa.Column('breach_count', sa.Integer(), nullable=True),
+        sa.Column('at_risk_count', sa.Integer(), nullable=True),
+        sa.Column('max_breach_margin', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['test_id'], ['stress_test_results.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'covenant_history' not in existing:
+        op.create_table('covenant_history',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('covenant_id', sa.String(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('recorded_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['covenant_id'], ['covenants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    _create_tables(set(inspector.get_table_names()))
+
+    for table, columns in NEW_COLUMNS.items():
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        missing = [(name, type_) for name, type_ in columns if name not in existing]
+        if missing:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for name, type_ in missing:
+                    batch_op.add_column(sa.Column(name, type_(), nullable=True))
+
+    inspector = sa.inspect(op.get_bind())
+    for table, name, columns in NEW_INDEXES:
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade() -> None:
+    # Indexes of the new tables go with them
+    for table, name, _ in reversed(NEW_INDEXES):
+        if table not in NEW_TABLES:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.drop_index(name)
+
+    for table, columns in NEW_COLUMNS.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, _ in reversed(columns):
+                batch_op.drop_column(name)
+
+    for table in reversed(NEW_TABLES):
+        op.drop_table(table)
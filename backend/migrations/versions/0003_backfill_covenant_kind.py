@@ -0,0 +1,44 @@
+"""backfill covenant kind
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:12:40.118532
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models import classify_covenant_kind
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+covenants = sa.table(
+    'covenants',
+    sa.column('name', sa.String()),
+    sa.column('kind', sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    # Rows written before covenants.kind existed; the ORM only sets it on new writes
+    connection = op.get_bind()
+    names = connection.execute(
+        sa.select(covenants.c.name).where(covenants.c.kind.is_(None), covenants.c.name.isnot(None)).distinct()
+    ).scalars().all()
+    if not names:
+        return
+    connection.execute(
+        covenants.update()
+        .where(covenants.c.name == sa.bindparam('covenant_name'), covenants.c.kind.is_(None))
+        .values(kind=sa.bindparam('covenant_kind')),
+        [{'covenant_name': name, 'covenant_kind': int(classify_covenant_kind(name))} for name in names]
+    )
+
+
+def downgrade() -> None:
+    # Data only: the backfilled codes match what the ORM would have written
+    pass
@@ -0,0 +1,140 @@
+-- Tables create_all built from the baseline models, before migrations existed
+CREATE TABLE tenants (
+    id VARCHAR NOT NULL,
+    name VARCHAR NOT NULL,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_tenants_id ON tenants (id);
+
+CREATE TABLE loans (
+    id VARCHAR NOT NULL,
+    tenant_id VARCHAR NOT NULL,
+    company_name VARCHAR NOT NULL,
+    borrower_name VARCHAR NOT NULL,
+    sector VARCHAR,
+    loan_amount FLOAT NOT NULL,
+    currency VARCHAR,
+    origination_date DATETIME NOT NULL,
+    maturity_date DATETIME NOT NULL,
+    interest_rate FLOAT NOT NULL,
+    status VARCHAR,
+    relationship_manager VARCHAR,
+    last_review_date DATETIME,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    PRIMARY KEY (id),
+    FOREIGN KEY(tenant_id) REFERENCES tenants (id)
+);
+
+CREATE INDEX ix_loans_id ON loans (id);
+CREATE INDEX ix_loans_tenant_id ON loans (tenant_id);
+
+CREATE TABLE stress_test_results (
+    id VARCHAR NOT NULL,
+    tenant_id VARCHAR NOT NULL,
+    ebitda_drop_percent FLOAT NOT NULL,
+    interest_rate_hike_bps FLOAT NOT NULL,
+    total_loans_tested INTEGER,
+    loans_breached INTEGER,
+    loans_at_risk INTEGER,
+    loans_safe INTEGER,
+    risk_heatmap JSON,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    created_by VARCHAR,
+    PRIMARY KEY (id),
+    FOREIGN KEY(tenant_id) REFERENCES tenants (id)
+);
+
+CREATE INDEX ix_stress_test_results_id ON stress_test_results (id);
+CREATE INDEX ix_stress_test_results_tenant_id ON stress_test_results (tenant_id);
+
+CREATE TABLE covenants (
+    id VARCHAR NOT NULL,
+    loan_id VARCHAR NOT NULL,
+    clause_id VARCHAR NOT NULL,
+    name VARCHAR NOT NULL,
+    type VARCHAR,
+    threshold_value FLOAT NOT NULL,
+    operator VARCHAR(18) NOT NULL,
+    unit VARCHAR,
+    current_value FLOAT,
+    status VARCHAR(9),
+    cushion_percent FLOAT,
+    frequency VARCHAR(11),
+    last_updated DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    next_review_date DATETIME,
+    source_text TEXT,
+    page_number INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(loan_id) REFERENCES loans (id)
+);
+
+CREATE INDEX ix_covenants_id ON covenants (id);
+CREATE INDEX ix_covenants_loan_id ON covenants (loan_id);
+
+CREATE TABLE documents (
+    id VARCHAR NOT NULL,
+    loan_id VARCHAR NOT NULL,
+    tenant_id VARCHAR NOT NULL,
+    filename VARCHAR NOT NULL,
+    file_path VARCHAR NOT NULL,
+    file_size INTEGER,
+    mime_type VARCHAR,
+    status VARCHAR,
+    processed_at DATETIME,
+    error_message TEXT,
+    embedding_collection_id VARCHAR,
+    uploaded_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    PRIMARY KEY (id),
+    FOREIGN KEY(loan_id) REFERENCES loans (id),
+    FOREIGN KEY(tenant_id) REFERENCES tenants (id)
+);
+
+CREATE INDEX ix_documents_id ON documents (id);
+CREATE INDEX ix_documents_loan_id ON documents (loan_id);
+CREATE INDEX ix_documents_tenant_id ON documents (tenant_id);
+
+CREATE TABLE covenant_audits (
+    id VARCHAR NOT NULL,
+    covenant_id VARCHAR NOT NULL,
+    old_value FLOAT,
+    new_value FLOAT,
+    old_status VARCHAR(9),
+    new_status VARCHAR(9),
+    changed_by VARCHAR,
+    change_reason TEXT,
+    source VARCHAR,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    PRIMARY KEY (id),
+    FOREIGN KEY(covenant_id) REFERENCES covenants (id)
+);
+
+CREATE INDEX ix_covenant_audits_covenant_id ON covenant_audits (covenant_id);
+CREATE INDEX ix_covenant_audits_id ON covenant_audits (id);
+
+CREATE TABLE document_extractions (
+    id VARCHAR NOT NULL,
+    document_id VARCHAR NOT NULL,
+    extraction_type VARCHAR NOT NULL,
+    field_name VARCHAR NOT NULL,
+    extracted_value TEXT NOT NULL,
+    confidence_score FLOAT,
+    source_text TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    context_before TEXT,
+    context_after TEXT,
+    model_used VARCHAR,
+    extraction_prompt TEXT,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    PRIMARY KEY (id),
+    FOREIGN KEY(document_id) REFERENCES documents (id)
+);
+
+CREATE INDEX ix_document_extractions_document_id ON document_extractions (document_id);
+CREATE INDEX ix_document_extractions_id ON document_extractions (id);
+
@@ -1,7 +1,91 @@
+import os
+import random
 import sys
+import tempfile
+from datetime import datetime, timedelta
 from pathlib import Path
 
+import pytest
+
 # Ensure the `backend` package root is on sys.path so tests can import `app` directly.
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+# Ensure tests use a throwaway SQLite file before importing app modules. Not
+# in-memory: the routers' async engine must see the same database.
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{Path(tempfile.mkdtemp(prefix='greengage-tests-')) / 'test.db'}")
+
+
+COVENANT_NAMES = [
+    'debt_ebitda', 'Leverage Ratio', 'interest_coverage', 'Interest Cover',
+    'DSCR', 'debt_service_cover', 'current_ratio', 'Tangible Net Worth',
+]
+OPERATORS = ['<', '<=', '>', '>=', '==']
+
+
+def setup_portfolio(db_session, loan_count=40, seed=7):
+    """Create a randomized portfolio covering every ratio kind and operator"""
+    from app.models import Tenant, Loan, Covenant
+
+    rng = random.Random(seed)
+    db_session.add(Tenant(id='tenant-default', name='Test Tenant'))
+
+    for i in range(loan_count):
+        loan_id = f'loan-{i:04d}'
+        db_session.add(Loan(
+            id=loan_id,
+            tenant_id='tenant-default',
+            company_name=f'Company {i}',
+            borrower_name=f'Borrower {i}',
+            sector=rng.choice(['Energy', 'Transport', 'Real Estate']),
+            loan_amount=float(rng.randint(1, 500)) * 1e5,
+            currency=rng.choice(['EUR', 'USD']),
+            origination_date=datetime.utcnow() - timedelta(days=365),
+            maturity_date=datetime.utcnow() + timedelta(days=365 * 5),
+            interest_rate=4.0,
+            status=rng.choice(['active', 'active', 'watchlist', 'default'])
+        ))
+        # Every 10th loan has no covenants at all
+        if i % 10 == 9:
+            continue
+        for j in range(rng.randint(1, 5)):
+            db_session.add(Covenant(
+                id=f'cov-{i:04d}-{j}',
+                loan_id=loan_id,
+                clause_id=f'Clause {j + 1}',
+                name=rng.choice(COVENANT_NAMES),
+                threshold_value=round(rng.uniform(0.8, 5.0), 2),
+                operator=rng.choice(OPERATORS),
+                current_value=None if rng.random() < 0.1 else round(rng.uniform(0.5, 6.0), 2),
+                unit='x'
+            ))
+
+    db_session.commit()
+
+
+
+@pytest.fixture
+def db():
+    """Fresh database with a randomized portfolio for tenant-default"""
+    from app.database import SessionLocal, reset_db
+    from app.services.breakpoint_index import get_breakpoint_index_cache
+    from app.services.simulation_service import (
+        get_factor_model_cache, get_snapshot_cache, get_stress_result_cache,
+    )
+    from app.services.covenant_audit import get_covenant_audit_writer
+
+    reset_db()
+    # Versions restart with the fresh database, so cached entries could collide
+    get_breakpoint_index_cache().invalidate()
+    get_stress_result_cache().invalidate()
+    get_snapshot_cache().invalidate()
+    get_factor_model_cache().invalidate()
+    session = SessionLocal()
+    setup_portfolio(session)
+    try:
+        yield session
+    finally:
+        # Don't let queued audit rows land in the next test's database
+        get_covenant_audit_writer().flush()
+        session.close()
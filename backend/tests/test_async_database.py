@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+
+def test_async_engine_shares_the_database(db):
+    from app.async_database import AsyncSessionLocal, async_database_url, create_async_database_engine
+    from app.models import Loan
+    from app.services.simulation_service import SimulationService
+
+    assert async_database_url('sqlite:///./lma_platform.db').drivername == 'sqlite+aiosqlite'
+    assert async_database_url('postgresql://user:pw@db/lma').drivername == 'postgresql+asyncpg'
+    with pytest.raises(ValueError):
+        create_async_database_engine('sqlite:///:memory:')
+
+    async def load():
+        async with AsyncSessionLocal() as session:
+            loan = await session.get(Loan, 'loan-0000')
+            snapshot = await session.run_sync(SimulationService.load_snapshot, 'tenant-default')
+            return loan.company_name, snapshot.loan_ids
+
+    company_name, loan_ids = asyncio.run(load())
+    assert company_name == 'Company 0'
+    assert loan_ids == SimulationService.load_snapshot(db, 'tenant-default').loan_ids
+
+
+def test_sqlite_readers_do_not_wait_for_writers(db):
+    from sqlalchemy import text, update
+    from sqlalchemy.exc import OperationalError
+    from app.async_database import AsyncReadSessionLocal, async_read_engine
+    from app.database import SessionLocal
+    from app.models import Loan
+
+    async def read(statement):
+        async with AsyncReadSessionLocal(bind=async_read_engine) as reader:
+            return (await reader.execute(statement)).scalar()
+
+    writer = SessionLocal()
+    try:
+        assert writer.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        # An uncommitted write holds the write lock; WAL readers see the last commit
+        writer.execute(update(Loan).where(Loan.id == 'loan-0000').values(company_name='Renamed'))
+        company_name = text("SELECT company_name FROM loans WHERE id = 'loan-0000'")
+        assert asyncio.run(read(company_name)) == 'Company 0'
+        writer.commit()
+
+        with pytest.raises(OperationalError):
+            asyncio.run(read(update(Loan).values(company_name='Read only')))
+    finally:
+        writer.close()
+
+
+def test_replica_router_round_robin_and_lag_fallback(db, tmp_path):
+    import sqlite3
+    from sqlalchemy.engine import make_url
+    from app.async_database import async_read_engine, create_async_database_engine
+    from app.database import DATABASE_URL
+    from app.models import Covenant
+    from app.replicas import ReplicaRouter
+
+    # Two file replicas, caught up with the primary as of now
+    primary_file = make_url(DATABASE_URL).database
+    replica_urls = []
+    for name in ('replica-a.db', 'replica-b.db'):
+        with sqlite3.connect(primary_file) as source, sqlite3.connect(tmp_path / name) as target:
+            source.backup(target)
+        replica_urls.append(f'sqlite:///{tmp_path / name}')
+    replicas = [create_async_database_engine(url, read_only=True) for url in replica_urls]
+    broken = create_async_database_engine(f'sqlite:///{tmp_path}/missing/replica.db', read_only=True)
+    router = ReplicaRouter(async_read_engine, replicas + [broken], check_interval=0, max_lag=0)
+
+    async def choose(r, n):
+        return [await r.choose() for _ in range(n)]
+
+    def bump_covenant():
+        covenant = db.query(Covenant).first()
+        covenant.current_value = (covenant.current_value or 0) + 1
+        db.commit()
+
+    async def run():
+        chosen = await choose(router, 4)
+        assert [replicas.index(e) for e in chosen] in ([0, 1, 0, 1], [1, 0, 1, 0])
+        assert [r['healthy'] for r in router.status()] == [True, True, False]
+        assert router.status()[2]['error']
+
+        # A committed covenant change the replicas haven't replayed
+        bump_covenant()
+        assert await choose(router, 2) == [async_read_engine, async_read_engine]
+        assert [r['lag'] for r in router.status()] == [1, 1, None]
+
+        lenient = ReplicaRouter(async_read_engine, replicas, check_interval=0, max_lag=1)
+        assert await lenient.choose() in replicas
+
+        for engine in replicas + [broken]:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_replica_router_skips_hung_replicas(monkeypatch):
+    import time
+    from sqlalchemy.engine import make_url
+    from app import replicas as replicas_module
+    from app.replicas import ReplicaRouter
+
+    class Engine:
+        def __init__(self, name):
+            self.url = make_url(f'sqlite:///{name}.db')
+
+    primary, fast, hung = Engine('primary'), Engine('fast'), Engine('hung')
+    calls = []
+
+    async def watermark(engine):
+        calls.append(engine)
+        if engine is hung:
+            await asyncio.sleep(3600)
+        return 5
+
+    monkeypatch.setattr(replicas_module, 'portfolio_watermark', watermark)
+    router = ReplicaRouter(primary, [fast, hung], check_interval=60, max_lag=0, check_timeout=0.05)
+
+    async def run():
+        started = time.monotonic()
+        assert await router.choose() is fast
+        assert time.monotonic() - started < 1
+        assert [r['healthy'] for r in router.status()] == [True, False]
+        assert 'Timeout' in router.status()[1]['error']
+
+        # The result is reused until the interval expires
+        calls.clear()
+        assert [await router.choose() for _ in range(3)] == [fast] * 3
+        assert calls == []
+
+    asyncio.run(run())
@@ -1,10 +1,6 @@
-import os
 import json
 from datetime import datetime, timedelta
 
-# Ensure test uses in-memory SQLite before importing app modules
-os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
-
 import pytest
 from fastapi.testclient import TestClient
 
@@ -65,11 +61,11 @@ def setup_test_data(db_session):
 
 
 def test_export_compliance_csv_and_excel():
-    from app.database import SessionLocal, init_db
+    from app.database import SessionLocal, reset_db
     from app.main import app
 
     # Initialize DB and create tables
-    init_db()
+    reset_db()
     session = SessionLocal()
     setup_test_data(session)
 
@@ -89,10 +85,10 @@ def test_export_compliance_csv_and_excel():
 
 
 def test_export_stress_test_csv_and_excel():
-    from app.database import SessionLocal, init_db
+    from app.database import SessionLocal, reset_db
     from app.main import app
 
-    init_db()
+    reset_db()
     session = SessionLocal()
     setup_test_data(session)
 
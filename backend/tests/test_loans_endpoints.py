@@ -0,0 +1,185 @@
+from fastapi.testclient import TestClient
+
+
+def test_list_loans_keyset_pages(db):
+    from sqlalchemy import event
+    from app.async_database import async_read_engine
+    from app.main import app
+    from app.models import Loan
+
+    client = TestClient(app)
+    engine = async_read_engine.sync_engine
+    loan_ids = sorted(l.id for l in db.query(Loan.id))
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    seen, cursor = [], None
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        while True:
+            params = {'limit': 15}
+            if cursor:
+                params['cursor'] = cursor
+            response = client.get('/api/v1/loans', params=params)
+            assert response.status_code == 200
+            page = response.json()
+            seen.extend(l['id'] for l in page)
+            cursor = response.headers.get('X-Next-Cursor')
+            if cursor is None:
+                break
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert seen == loan_ids
+    assert len(statements) == 2 * 3  # Loan page + covenant batch per page
+
+    first = client.get('/api/v1/loans', params={'limit': 5}).json()
+    detail = client.get(f"/api/v1/loans/{first[0]['id']}").json()
+    assert [c['id'] for c in first[0]['covenants']] == sorted(c['id'] for c in detail['covenants'])
+
+
+def test_list_loans_field_projection(db):
+    from app.main import app
+
+    client = TestClient(app)
+    page = client.get('/api/v1/loans', params={'fields': 'company_name,loan_amount', 'limit': 3}).json()
+    assert [set(l) for l in page] == [{'company_name', 'loan_amount'}] * 3
+
+    assert client.get('/api/v1/loans', params={'fields': 'id,secret'}).status_code == 400
+    for empty in ('', ' , ,'):
+        assert client.get('/api/v1/loans', params={'fields': empty}).status_code == 422
+    assert client.get('/api/v1/loans', params={'cursor': '!!'}).status_code == 400
+
+
+def test_bulk_covenant_values_match_single_updates(db):
+    import random
+    from app.main import app
+    from app.models import Covenant
+    from app.services.simulation_service import SimulationService
+
+    client = TestClient(app)
+    pinned = client.post('/api/v1/simulate-stress-test/live', json={
+        'ebitda_drop_percent': 15, 'interest_rate_hike_bps': 100,
+    }).json()
+
+    rng = random.Random(3)
+    covenant_ids = sorted(c.id for c in db.query(Covenant.id))
+    values = [{'covenant_id': cid, 'current_value': round(rng.uniform(0.3, 6.0), 2)} for cid in covenant_ids]
+    response = client.put('/api/v1/covenants/values', json={
+        'values': values + [
+            {'covenant_id': 'cov-missing', 'current_value': 1.0},
+            {'covenant_id': covenant_ids[0], 'current_value': 2.0},
+        ],
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body['updated'] == len(covenant_ids)
+    assert {(r['covenant_id'], r['reason']) for r in body['rejects']} == {
+        ('cov-missing', 'covenant not found'), (covenant_ids[0], 'duplicate covenant_id'),
+    }
+
+    # Re-submitting each value one by one gives the same status and cushion
+    for result in body['results'][::7]:
+        single = client.put(
+            f"/api/v1/covenants/{result['covenant_id']}/value", params={'current_value': result['new_value']}
+        ).json()
+        assert single['new_status'] == result['new_status']
+        assert single['cushion_percent'] == result['cushion_percent']
+
+    db.expire_all()
+    stored = {c.id: c.current_value for c in db.query(Covenant)}
+    assert stored == {v['covenant_id']: v['current_value'] for v in values}
+
+    live = client.get(f"/api/v1/simulate-stress-test/live/{pinned['scenario_id']}").json()
+    assert live['summary'] == SimulationService().simulate_stress_test(db, 'tenant-default', 15, 100)['summary']
+
+
+def test_covenant_audit_trail(db):
+    from datetime import datetime, timedelta
+    from app.main import app
+    from app.models import Covenant, CovenantAudit
+    from app.services.covenant_audit import get_covenant_audit_writer
+
+    client = TestClient(app)
+    covenant_id = db.query(Covenant.id).order_by(Covenant.id).first()[0]
+    start = datetime.now() - timedelta(seconds=1)
+
+    for value in (1.5, 2.5, 3.5):
+        r = client.put(f'/api/v1/covenants/{covenant_id}/value', params={'current_value': value, 'changed_by': 'analyst'})
+        assert r.status_code == 200
+    client.put('/api/v1/covenants/values', json={
+        'values': [{'covenant_id': covenant_id, 'current_value': 4.5}], 'changed_by': 'reporting',
+    })
+    # The bulk row is written with its transaction; single updates via the queue
+    assert db.query(CovenantAudit).filter(CovenantAudit.source == 'bulk_submission').count() == 1
+    get_covenant_audit_writer().flush()
+
+    trail = client.get(f'/api/v1/covenants/{covenant_id}/audit').json()
+    assert trail['pagination']['total'] == 4
+    assert [e['new_value'] for e in trail['entries']] == [4.5, 3.5, 2.5, 1.5]
+    assert [e['old_value'] for e in trail['entries'][:3]] == [3.5, 2.5, 1.5]
+    assert trail['entries'][0]['source'] == 'bulk_submission'
+    assert trail['entries'][1]['changed_by'] == 'analyst'
+
+    page = client.get(f'/api/v1/covenants/{covenant_id}/audit', params={'skip': 1, 'limit': 2}).json()
+    assert [e['new_value'] for e in page['entries']] == [3.5, 2.5]
+    ranged = client.get(f'/api/v1/covenants/{covenant_id}/audit', params={
+        'since': start.isoformat(), 'until': (datetime.now() + timedelta(seconds=1)).isoformat(),
+    }).json()
+    assert ranged['pagination']['total'] == 4
+    future = client.get(f'/api/v1/covenants/{covenant_id}/audit', params={
+        'since': (datetime.now() + timedelta(hours=1)).isoformat(),
+    }).json()
+    assert future['entries'] == []
+    assert client.get('/api/v1/covenants/cov-missing/audit').status_code == 404
+
+
+def test_covenant_history_range_and_downsampling(db):
+    from datetime import datetime
+    from app.main import app
+    from app.models import Covenant, CovenantHistory
+
+    client = TestClient(app)
+    covenants = db.query(Covenant).filter(Covenant.current_value.isnot(None)).order_by(Covenant.id).limit(2).all()
+    first, second = covenants[0].id, covenants[1].id
+
+    # Seeding recorded each covenant's initial value
+    seeded = client.get(f'/api/v1/covenants/{first}/history').json()
+    assert [p['value'] for p in seeded['values']] == [covenants[0].current_value]
+
+    db.query(CovenantHistory).delete()
+    for month, value in [(1, 1.0), (2, 1.5), (2, 2.0), (4, 2.5), (6, 3.0)]:
+        db.add(CovenantHistory(covenant_id=first, value=value, recorded_at=datetime(2024, month, 15)))
+    db.commit()
+
+    # Single and bulk updates append to the series
+    client.put(f'/api/v1/covenants/{first}/value', params={'current_value': 3.5})
+    client.put('/api/v1/covenants/values', json={'values': [
+        {'covenant_id': first, 'current_value': 4.0}, {'covenant_id': second, 'current_value': 1.0},
+    ]})
+
+    raw = client.get('/api/v1/covenants/history', params={'covenant_id': [first, second, 'cov-missing']}).json()
+    assert [p['value'] for p in raw['history'][first]] == [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0]
+    assert [p['value'] for p in raw['history'][second]] == [1.0]
+    assert raw['history']['cov-missing'] == []
+
+    monthly = client.get(f'/api/v1/covenants/{first}/history', params={
+        'interval': 'month', 'until': '2025-01-01T00:00:00',
+    }).json()
+    assert [(p['period'], p['value']) for p in monthly['values']] == [
+        ('2024-01', 1.0), ('2024-02', 2.0), ('2024-04', 2.5), ('2024-06', 3.0),
+    ]
+    quarterly = client.get('/api/v1/covenants/history', params={
+        'covenant_id': first, 'interval': 'quarter', 'since': '2024-02-01T00:00:00', 'until': '2025-01-01T00:00:00',
+    }).json()
+    assert [(p['period'], p['value']) for p in quarterly['history'][first]] == [('2024-Q1', 2.0), ('2024-Q2', 3.0)]
+
+    # The forecast reads the stored history when no values are sent
+    forecast = client.post('/api/v1/covenants/forecast', json={'covenantId': first}).json()
+    assert forecast['currentValue'] == 4.0
+    assert forecast['threshold'] == covenants[0].threshold_value
+    assert client.post('/api/v1/covenants/forecast', json={'covenantId': 'cov-missing'}).status_code == 404
+    assert client.get('/api/v1/covenants/cov-missing/history').status_code == 404
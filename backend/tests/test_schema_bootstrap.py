@@ -0,0 +1,97 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+
+
+def _seed(engine):
+    # Plain SQL: the ORM's flush listeners need tables older schemas lack
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO tenants (id, name) VALUES ('t1', 'Tenant')")
+        connection.exec_driver_sql(
+            "INSERT INTO loans (id, tenant_id, company_name, borrower_name, loan_amount, "
+            "origination_date, maturity_date, interest_rate) VALUES "
+            "('loan-1', 't1', 'Kept', 'Kept', 1.0, ?, ?, 4.0)",
+            (str(datetime(2024, 1, 1)), str(datetime(2030, 1, 1)))
+        )
+
+
+def test_bootstrap_migrates_once_then_skips_ddl(tmp_path):
+    from app.models import Base
+    from app.schema_bootstrap import bootstrap_schema, schema_fingerprint, stored_fingerprint
+
+    engine = create_engine(f'sqlite:///{tmp_path / "fresh.db"}')
+    assert bootstrap_schema(engine) is True
+    assert set(Base.metadata.tables) <= set(inspect(engine).get_table_names())
+    _seed(engine)
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert bootstrap_schema(engine) is False
+    assert not [s for s in statements if not s.lstrip().upper().startswith(('SELECT', 'PRAGMA'))]
+
+    with engine.connect() as connection:
+        assert stored_fingerprint(connection) == schema_fingerprint()
+        assert connection.exec_driver_sql('SELECT company_name FROM loans').scalar() == 'Kept'
+
+
+def _create_baseline_schema(engine):
+    """What the old init_db left behind: the baseline models' tables, no alembic_version"""
+    raw = engine.raw_connection()
+    try:
+        raw.executescript((Path(__file__).parent / 'baseline_schema.sql').read_text())
+    finally:
+        raw.close()
+
+
+@pytest.mark.parametrize('legacy_schema', ['baseline', 'current'])
+def test_bootstrap_adopts_pre_migration_database(tmp_path, legacy_schema):
+    from alembic.autogenerate import compare_metadata
+    from alembic.migration import MigrationContext
+    from app.models import Base, CovenantKind
+    from app.schema_bootstrap import bootstrap_schema
+
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    if legacy_schema == 'baseline':
+        _create_baseline_schema(engine)
+    else:
+        # create_all from a later model revision is adopted the same way
+        Base.metadata.create_all(engine)
+    _seed(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO covenants (id, loan_id, clause_id, name, threshold_value, operator) "
+            "VALUES ('cov-1', 'loan-1', 'c1', 'DSCR', 1.2, 'GREATER_THAN')"
+        )
+
+    assert bootstrap_schema(engine) is True
+    assert bootstrap_schema(engine) is False
+    with engine.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), Base.metadata) == []
+        assert connection.exec_driver_sql('SELECT version_num FROM alembic_version').scalar() == '0003'
+        assert connection.exec_driver_sql('SELECT count(*) FROM loans').scalar() == 1
+        assert connection.exec_driver_sql('SELECT kind FROM covenants').scalar() == CovenantKind.DSCR
+
+
+def test_bootstrap_backfills_covenant_kinds(tmp_path):
+    from alembic import command
+    from app.models import CovenantKind
+    from app.schema_bootstrap import alembic_config, bootstrap_schema
+
+    engine = create_engine(f'sqlite:///{tmp_path / "kinds.db"}')
+    with engine.begin() as connection:
+        command.upgrade(alembic_config(connection), '0001')
+    _seed(engine)
+    with engine.begin() as connection:
+        # Written outside the ORM, as rows predating covenants.kind were
+        connection.exec_driver_sql(
+            "INSERT INTO covenants (id, loan_id, clause_id, name, threshold_value, operator) VALUES "
+            "('cov-1', 'loan-1', 'c1', 'Debt-to-EBITDA', 3.5, 'LESS_THAN'), "
+            "('cov-2', 'loan-1', 'c2', 'Interest Cover', 2.0, 'GREATER_THAN')"
+        )
+
+    assert bootstrap_schema(engine) is True
+    with engine.connect() as connection:
+        kinds = dict(connection.exec_driver_sql('SELECT id, kind FROM covenants').all())
+    assert kinds == {'cov-1': CovenantKind.LEVERAGE, 'cov-2': CovenantKind.INTEREST_COVERAGE}
@@ -0,0 +1,428 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+def test_scenario_grid_endpoint(db):
+    from app.main import app
+
+    client = TestClient(app)
+    r = client.post('/api/v1/simulate-stress-test/grid', json={
+        'ebitda_drop_percent': {'start': 0, 'stop': 50, 'step': 10},
+        'interest_rate_hike_bps': {'values': [0, 250, 500]},
+        'include_loan_surfaces': True,
+    })
+    assert r.status_code == 200
+    body = r.json()
+    assert body['ebitda_drop_percent'] == [0, 10, 20, 30, 40, 50]
+    assert len(body['loans_breached']) == 6 and len(body['loans_breached'][0]) == 3
+    total = body['total_loans']
+    for row in zip(body['loans_breached'], body['loans_at_risk'], body['loans_safe']):
+        assert all(b + a + s == total for b, a, s in zip(*row))
+    assert len(body['loan_surfaces']) == total
+
+
+def test_scenario_grid_rejects_oversized_grid(db):
+    from app.main import app
+
+    client = TestClient(app)
+    r = client.post('/api/v1/simulate-stress-test/grid', json={
+        'ebitda_drop_percent': {'start': 0, 'stop': 100, 'step': 0.01},
+        'interest_rate_hike_bps': {'values': [0, 100]},
+    })
+    assert r.status_code == 400
+
+    # Counted, not expanded: 1e8 values would take seconds to build
+    r = client.post('/api/v1/simulate-stress-test/grid', json={
+        'ebitda_drop_percent': {'start': 0, 'stop': 100, 'step': 1e-6},
+        'interest_rate_hike_bps': {'start': 0, 'stop': 1e300, 'step': 1},
+    })
+    assert r.status_code == 400
+
+    # Steps below the floor and overlong value lists fail validation
+    for axis in [{'start': 0, 'stop': 100, 'step': 1e-9}, {'values': [0.0] * 10_001}]:
+        r = client.post('/api/v1/simulate-stress-test/grid', json={
+            'ebitda_drop_percent': axis,
+            'interest_rate_hike_bps': {'values': [0]},
+        })
+        assert r.status_code == 422
+
+
+def test_breakpoint_summary_refreshes_after_covenant_update(db):
+    from app.main import app
+
+    client = TestClient(app)
+    params = {'ebitda_drop_percent': 20, 'interest_rate_hike_bps': 100}
+    before = client.get('/api/v1/simulate-stress-test/breakpoints/summary', params=params).json()['summary']
+    scan = client.post('/api/v1/simulate-stress-test', json=params).json()['risk_heatmap']['summary']
+    assert before == scan
+
+    # Push a safe loan's leverage far above its threshold
+    safe_loan = next(l for l in client.post('/api/v1/simulate-stress-test', json=params).json()['risk_heatmap']['loans']
+                     if l['overall_status'] == 'safe' and l['covenants'])
+    covenant = safe_loan['covenants'][0]
+    breaching = covenant['threshold'] * 10 if covenant['operator'] in ('<', '<=') else 0.0
+    assert client.put(f"/api/v1/covenants/{covenant['covenant_id']}/value", params={'current_value': breaching}).status_code == 200
+
+    after = client.get('/api/v1/simulate-stress-test/breakpoints/summary', params=params).json()['summary']
+    assert after == client.post('/api/v1/simulate-stress-test', json=params).json()['risk_heatmap']['summary']
+    assert after['loans_breached'] == before['loans_breached'] + 1
+
+
+def test_monte_carlo_endpoint(db):
+    from app.main import app
+
+    client = TestClient(app)
+    r = client.post('/api/v1/simulate-stress-test/monte-carlo', json={
+        'paths': 500,
+        'ebitda_drop_percent': {'distribution': 'normal', 'mean': 15, 'std': 8},
+        'interest_rate_hike_bps': {'distribution': 'lognormal', 'mean': 4.5, 'std': 0.5},
+        'percentiles': [50, 99],
+        'seed': 7,
+    })
+    assert r.status_code == 200
+    body = r.json()
+    assert body['paths'] == 500
+    assert set(body['loss_exposure']['percentiles']) == {'p50', 'p99'}
+    assert body['loss_exposure']['percentiles']['p50'] <= body['loss_exposure']['percentiles']['p99']
+
+    # A fixed shock outside the factor's domain has nothing to truncate to
+    r = client.post('/api/v1/simulate-stress-test/monte-carlo', json={
+        'paths': 10,
+        'ebitda_drop_percent': {'distribution': 'fixed', 'mean': 120},
+        'interest_rate_hike_bps': {'distribution': 'fixed', 'mean': 100},
+    })
+    assert r.status_code == 422
+
+
+def _wait_for_job(client, job_id, timeout=30):
+    import time
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f'/api/v1/simulate-stress-test/jobs/{job_id}').json()
+        if job['status'] in ('completed', 'failed', 'cancelled'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_stress_test_job_completes_and_saves_result(db):
+    from app.main import app
+    from app.models import StressTestResult
+
+    client = TestClient(app)
+    r = client.post('/api/v1/simulate-stress-test/jobs', json={
+        'ebitda_drop_percent': 20, 'interest_rate_hike_bps': 150,
+    })
+    assert r.status_code == 202
+    job_id = r.json()['job_id']
+
+    job = _wait_for_job(client, job_id)
+    assert job['status'] == 'completed'
+    assert job['progress']['loans_processed'] == job['progress']['total_loans']
+
+    result = client.get(f'/api/v1/simulate-stress-test/jobs/{job_id}/result')
+    assert result.status_code == 200
+    assert result.json()['test_id'] == job['test_id']
+    direct = client.post('/api/v1/simulate-stress-test', json={
+        'ebitda_drop_percent': 20, 'interest_rate_hike_bps': 150,
+    }).json()
+    assert result.json()['risk_heatmap'] == direct['risk_heatmap']
+    assert db.query(StressTestResult).count() == 2
+
+
+def test_cancelled_stress_test_job_saves_nothing(db):
+    import threading
+    from app.models import StressTestResult
+    from app.services.stress_jobs import StressTestJobManager
+
+    manager = StressTestJobManager(max_workers=1, max_queued=1)
+    gate = threading.Event()
+    blocker = manager._get_executor().submit(gate.wait)
+    try:
+        job = manager.submit('tenant-default', 20, 150)
+        assert job.status == 'queued'
+        manager.cancel(job.id)
+        assert job.status == 'cancelled'
+    finally:
+        # Cancel the queued job before releasing the worker
+        manager.shutdown()
+        gate.set()
+        blocker.result()
+
+    assert db.query(StressTestResult).count() == 0
+
+
+def test_stress_test_job_queue_is_bounded(db):
+    import threading
+    import pytest
+    from app.services.stress_jobs import StressTestJobManager, JobQueueFull
+
+    manager = StressTestJobManager(max_workers=1, max_queued=1)
+    gate = threading.Event()
+    blocker = manager._get_executor().submit(gate.wait)
+    try:
+        manager.submit('tenant-default', 10, 0)
+        with pytest.raises(JobQueueFull):
+            manager.submit('tenant-default', 10, 0)
+    finally:
+        # Cancel the queued job before releasing the worker
+        manager.shutdown()
+        gate.set()
+        blocker.result()
+
+
+def _strict_json(constant):
+    raise ValueError(f'{constant} is not valid JSON')
+
+
+# A 100% EBITDA drop makes ratio cushions infinite or NaN
+@pytest.mark.parametrize('ebitda_drop', [25, 100])
+def test_stress_test_streams_ndjson(db, ebitda_drop):
+    import json
+    from app.main import app
+    from app.models import StressTestResult
+
+    client = TestClient(app)
+    payload = {'ebitda_drop_percent': ebitda_drop, 'interest_rate_hike_bps': 200}
+    r = client.post('/api/v1/simulate-stress-test?stream=true', json=payload)
+    assert r.status_code == 200
+    assert r.headers['content-type'].startswith('application/x-ndjson')
+
+    lines = [json.loads(line, parse_constant=_strict_json) for line in r.text.splitlines()]
+    loans, trailer = lines[:-1], lines[-1]
+    direct = client.post('/api/v1/simulate-stress-test', json=payload).json()
+    assert loans == direct['risk_heatmap']['loans']
+    assert trailer['summary'] == direct['risk_heatmap']['summary']
+
+    saved = db.query(StressTestResult).filter(StressTestResult.id == trailer['test_id']).one()
+    assert saved.loans_breached == trailer['summary']['loans_breached']
+
+
+def test_stress_test_result_filters_sorts_and_paginates(db):
+    from app.main import app
+
+    client = TestClient(app)
+    created = client.post('/api/v1/simulate-stress-test', json={
+        'ebitda_drop_percent': 25, 'interest_rate_hike_bps': 200,
+    }).json()
+    loans = created['risk_heatmap']['loans']
+    test_id = created['test_id']
+
+    full = client.get(f'/api/v1/simulate-stress-test/{test_id}').json()
+    assert full['risk_heatmap'] == created['risk_heatmap']
+
+    breached = client.get(f'/api/v1/simulate-stress-test/{test_id}', params={'status': 'breach'}).json()
+    expected = [l for l in loans if l['overall_status'] == 'breach']
+    assert breached['pagination']['total'] == len(expected)
+    assert breached['risk_heatmap']['loans'] == expected
+
+    def max_margin(loan):
+        return max(c['breach_margin'] for c in loan['covenants'])
+
+    ranked = sorted((l for l in loans if l['covenants']), key=max_margin, reverse=True)
+    page = client.get(f'/api/v1/simulate-stress-test/{test_id}', params={
+        'sort': '-breach_margin', 'skip': 2, 'limit': 5,
+    }).json()
+    assert [max_margin(l) for l in page['risk_heatmap']['loans']] == [max_margin(l) for l in ranked[2:7]]
+    assert page['pagination'] == {'skip': 2, 'limit': 5, 'total': len(loans)}
+
+
+def test_legacy_heatmap_blob_is_still_served(db):
+    from app.main import app
+    from app.models import StressTestResult
+    from app.services.simulation_service import SimulationService
+
+    heatmap = SimulationService().simulate_stress_test(db, 'tenant-default', 30, 100)
+    db.add(StressTestResult(
+        id='test-legacy', tenant_id='tenant-default', ebitda_drop_percent=30, interest_rate_hike_bps=100,
+        total_loans_tested=heatmap['summary']['total_loans'], loans_breached=heatmap['summary']['loans_breached'],
+        loans_at_risk=heatmap['summary']['loans_at_risk'], loans_safe=heatmap['summary']['loans_safe'],
+        risk_heatmap=heatmap,
+    ))
+    db.commit()
+
+    client = TestClient(app)
+    legacy = client.get('/api/v1/simulate-stress-test/test-legacy', params={'status': 'at_risk'}).json()
+    assert legacy['risk_heatmap']['loans'] == [l for l in heatmap['loans'] if l['overall_status'] == 'at_risk']
+
+    stored = client.post('/api/v1/simulate-stress-test', json={
+        'ebitda_drop_percent': 30, 'interest_rate_hike_bps': 100,
+    }).json()
+    legacy_csv = client.get('/api/v1/export-stress-test/test-legacy').text
+    stored_csv = client.get(f"/api/v1/export-stress-test/{stored['test_id']}").text
+    assert legacy_csv == stored_csv
+    assert len(stored_csv.splitlines()) > 1
+
+
+def test_live_scenario_updates_incrementally(db):
+    from app.main import app
+    from app.models import Covenant, Loan
+    from app.services.simulation_service import SimulationService
+
+    client = TestClient(app)
+    pinned = client.post('/api/v1/simulate-stress-test/live', json={
+        'ebitda_drop_percent': 15, 'interest_rate_hike_bps': 100,
+    })
+    assert pinned.status_code == 201
+    scenario_id = pinned.json()['scenario_id']
+
+    snapshot = SimulationService.load_snapshot(db, 'tenant-default')
+    for covenant_id, value in [(snapshot.covenant_ids[0], 0.01), (snapshot.covenant_ids[-1], 50.0)]:
+        r = client.put(f'/api/v1/covenants/{covenant_id}/value', params={'current_value': value})
+        assert r.status_code == 200
+
+    live = client.get(f'/api/v1/simulate-stress-test/live/{scenario_id}').json()
+    assert live['full_rebuilds'] == 1 and live['incremental_updates'] == 2
+    db.expire_all()
+    fresh = SimulationService().simulate_stress_test(db, 'tenant-default', 15, 100)
+    assert live['loans'] == fresh['loans']
+    assert live['summary'] == fresh['summary']
+
+    # Covenants of loans outside the scenario (defaulted) don't force a rebuild
+    out_of_scope = db.query(Covenant).join(Loan).filter(Loan.status == 'default').first()
+    assert out_of_scope.loan_id not in snapshot.loan_ids
+    r = client.put('/api/v1/covenants/values', json={'values': [
+        {'covenant_id': out_of_scope.id, 'current_value': 9.0},
+        {'covenant_id': snapshot.covenant_ids[0], 'current_value': 0.02},
+    ]})
+    assert r.json()['updated'] == 2
+    live = client.get(f'/api/v1/simulate-stress-test/live/{scenario_id}').json()
+    assert live['full_rebuilds'] == 1 and live['incremental_updates'] == 3
+    db.expire_all()
+    assert live['loans'] == SimulationService().simulate_stress_test(db, 'tenant-default', 15, 100)['loans']
+
+    # Changes that bypass the covenant endpoint are caught by the version check
+    covenant = db.query(Covenant).filter(Covenant.id == snapshot.covenant_ids[1]).one()
+    covenant.current_value = None
+    db.commit()
+    live = client.get(f'/api/v1/simulate-stress-test/live/{scenario_id}').json()
+    assert live['full_rebuilds'] == 2
+    assert live['summary'] == SimulationService().simulate_stress_test(db, 'tenant-default', 15, 100)['summary']
+
+    assert client.delete(f'/api/v1/simulate-stress-test/live/{scenario_id}').status_code == 204
+    assert client.get(f'/api/v1/simulate-stress-test/live/{scenario_id}').status_code == 404
+
+
+def test_stress_test_subset_filters(db):
+    from app.main import app
+    from app.models import Loan
+
+    client = TestClient(app)
+    payload = {'ebitda_drop_percent': 20, 'interest_rate_hike_bps': 150}
+    full = client.post('/api/v1/simulate-stress-test', json=payload).json()['risk_heatmap']['loans']
+
+    amounts = {l.id: (l.sector, l.loan_amount) for l in db.query(Loan)}
+    subset = client.post('/api/v1/simulate-stress-test', json={
+        **payload, 'sectors': ['Energy'], 'min_loan_amount': 1e7,
+    }).json()
+    expected = [l for l in full if amounts[l['loan_id']][0] == 'Energy' and amounts[l['loan_id']][1] >= 1e7]
+    assert 0 < len(expected) < len(full)
+    def by_loan(loans):
+        return sorted(loans, key=lambda l: l['loan_id'])
+
+    assert by_loan(subset['risk_heatmap']['loans']) == by_loan(expected)
+    assert subset['risk_heatmap']['summary']['total_loans'] == len(expected)
+
+    picked = [full[0]['loan_id'], full[3]['loan_id']]
+    by_id = client.post('/api/v1/simulate-stress-test', json={**payload, 'loan_ids': picked}).json()
+    assert by_loan(by_id['risk_heatmap']['loans']) == by_loan([full[0], full[3]])
+
+    stored = client.get(f"/api/v1/simulate-stress-test/{by_id['test_id']}").json()
+    assert stored['filters'] == {'loan_ids': picked}
+
+
+def test_stress_test_diff(db):
+    from app.main import app
+    from app.models import StressTestResult
+    from app.services.simulation_service import SimulationService
+
+    client = TestClient(app)
+    base = client.post('/api/v1/simulate-stress-test', json={
+        'ebitda_drop_percent': 10, 'interest_rate_hike_bps': 100,
+    }).json()
+    later = client.post('/api/v1/simulate-stress-test', json={
+        'ebitda_drop_percent': 35, 'interest_rate_hike_bps': 300,
+    }).json()
+
+    diff = client.get(f"/api/v1/simulate-stress-test/{base['test_id']}/diff/{later['test_id']}").json()
+
+    before = {l['loan_id']: l for l in base['risk_heatmap']['loans']}
+    after = {l['loan_id']: l for l in later['risk_heatmap']['loans']}
+    changed = sorted(i for i in before if before[i]['overall_status'] != after[i]['overall_status'])
+    assert changed and [l['loan_id'] for l in diff['loans']] == changed
+    assert sum(diff['transitions'].values()) == len(changed)
+    assert diff['summary']['change']['loans_breached'] == (
+        later['risk_heatmap']['summary']['loans_breached'] - base['risk_heatmap']['summary']['loans_breached']
+    )
+
+    before_covenants = {c['covenant_id']: c for l in before.values() for c in l['covenants']}
+    after_covenants = {c['covenant_id']: c for l in after.values() for c in l['covenants']}
+    status_changed = {i for i in before_covenants if before_covenants[i]['status'] != after_covenants[i]['status']}
+    assert {c['covenant_id'] for c in diff['covenants']} == status_changed
+    for c in diff['covenants']:
+        expected = after_covenants[c['covenant_id']]['cushion_percent'] - before_covenants[c['covenant_id']]['cushion_percent']
+        assert abs(c['cushion_delta'] - expected) < 0.011
+
+    # A legacy blob diffs the same as its row-stored equivalent
+    heatmap = SimulationService().simulate_stress_test(db, 'tenant-default', 10, 100)
+    db.add(StressTestResult(
+        id='test-legacy', tenant_id='tenant-default', ebitda_drop_percent=10, interest_rate_hike_bps=100,
+        total_loans_tested=heatmap['summary']['total_loans'], loans_breached=heatmap['summary']['loans_breached'],
+        loans_at_risk=heatmap['summary']['loans_at_risk'], loans_safe=heatmap['summary']['loans_safe'],
+        risk_heatmap=heatmap,
+    ))
+    db.commit()
+    legacy_diff = client.get(f"/api/v1/simulate-stress-test/test-legacy/diff/{later['test_id']}").json()
+    assert legacy_diff['loans'] == diff['loans'] and legacy_diff['covenants'] == diff['covenants']
+
+    moved = client.get(
+        f"/api/v1/simulate-stress-test/{base['test_id']}/diff/{later['test_id']}",
+        params={'min_cushion_delta': 0}
+    ).json()
+    assert len(moved['covenants']) == moved['cushions']['covenants_compared']
+    assert client.get(f"/api/v1/simulate-stress-test/{base['test_id']}/diff/test-missing").status_code == 404
+
+
+def test_stress_test_rollups(db):
+    from collections import defaultdict
+    from app.main import app
+    from app.models import Loan
+
+    for i, loan in enumerate(db.query(Loan).order_by(Loan.id)):
+        loan.relationship_manager = None if i % 3 == 0 else f'rm-{i % 2}'
+    db.commit()
+
+    client = TestClient(app)
+    request = {'ebitda_drop_percent': 20, 'interest_rate_hike_bps': 150}
+    full = client.post('/api/v1/simulate-stress-test', json=request).json()
+    lean = client.post('/api/v1/simulate-stress-test', json={
+        **request, 'group_by': ['sector', 'relationship_manager', 'currency'], 'include_loans': False,
+    }).json()
+    assert 'loans' not in lean['risk_heatmap']
+    assert lean['risk_heatmap']['summary'] == full['risk_heatmap']['summary']
+
+    managers = {l.id: l.relationship_manager for l in db.query(Loan)}
+    sectors = {l.id: l.sector for l in db.query(Loan)}
+    for key, attribute in (('sector', sectors), ('relationship_manager', managers)):
+        expected = defaultdict(lambda: {'total_loans': 0, 'loans_breached': 0, 'exposure': 0.0, 'worst': None})
+        for loan in full['risk_heatmap']['loans']:
+            group = expected[attribute[loan['loan_id']]]
+            group['total_loans'] += 1
+            group['loans_breached'] += loan['overall_status'] == 'breach'
+            group['exposure'] += loan['loan_amount']
+            for c in loan['covenants']:
+                if group['worst'] is None or c['cushion_percent'] < group['worst']:
+                    group['worst'] = c['cushion_percent']
+
+        rollups = {g[key]: g for g in lean['risk_heatmap']['rollups'][key]}
+        assert rollups.keys() == expected.keys()
+        for value, group in expected.items():
+            assert rollups[value]['total_loans'] == group['total_loans']
+            assert rollups[value]['loans_breached'] == group['loans_breached']
+            assert abs(rollups[value]['exposure'] - group['exposure']) < 1e-6
+            assert abs(rollups[value]['worst_cushion_percent'] - group['worst']) < 0.011
+
+    stored = client.get(f"/api/v1/simulate-stress-test/{lean['test_id']}", params={'limit': 1}).json()
+    assert stored['rollups'] == lean['risk_heatmap']['rollups']
+    assert sum(g['total_loans'] for g in stored['rollups']['currency']) == stored['summary']['total_loans_tested']
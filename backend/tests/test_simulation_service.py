@@ -0,0 +1,572 @@
+import pytest
+
+
+def reference_heatmap(db, tenant_id, ebitda_drop_percent, interest_rate_hike_bps):
+    """Covenant-by-covenant loop the vectorized engine must reproduce"""
+    from app.models import Loan, Covenant
+    from app.services.simulation_service import SimulationService
+
+    loans = db.query(Loan).filter(
+        Loan.tenant_id == tenant_id,
+        Loan.status.in_(["active", "watchlist"])
+    ).all()
+    heatmap = {"loans": [], "summary": {"total_loans": 0, "loans_breached": 0, "loans_at_risk": 0, "loans_safe": 0}}
+
+    for loan in loans:
+        covenants = db.query(Covenant).filter(Covenant.loan_id == loan.id).all()
+        if not covenants:
+            continue
+        loan_results = {
+            "loan_id": loan.id, "company_name": loan.company_name, "loan_amount": loan.loan_amount,
+            "currency": loan.currency, "covenants": [], "overall_status": "safe",
+            "breach_count": 0, "at_risk_count": 0
+        }
+        for covenant in covenants:
+            if covenant.current_value is None:
+                continue
+            stressed = SimulationService.calculate_stressed_ratio(
+                covenant.current_value, ebitda_drop_percent, interest_rate_hike_bps, covenant.name.lower()
+            )
+            result = SimulationService.check_covenant_breach(covenant, stressed)
+            loan_results["covenants"].append(result)
+            if result["status"] == "breach":
+                loan_results["breach_count"] += 1
+                loan_results["overall_status"] = "breach"
+            elif result["status"] == "at_risk" and loan_results["overall_status"] != "breach":
+                loan_results["at_risk_count"] += 1
+                loan_results["overall_status"] = "at_risk"
+
+        heatmap["summary"]["total_loans"] += 1
+        key = {"breach": "loans_breached", "at_risk": "loans_at_risk", "safe": "loans_safe"}
+        heatmap["summary"][key[loan_results["overall_status"]]] += 1
+        heatmap["loans"].append(loan_results)
+
+    return heatmap
+
+
+@pytest.mark.parametrize("ebitda_drop,rate_hike", [(0, 0), (10, 100), (25, 250), (40, 500)])
+def test_vectorized_heatmap_matches_reference(db, ebitda_drop, rate_hike):
+    from app.services.simulation_service import SimulationService
+
+    heatmap = SimulationService().simulate_stress_test(db, 'tenant-default', ebitda_drop, rate_hike)
+
+    assert heatmap == reference_heatmap(db, 'tenant-default', ebitda_drop, rate_hike)
+
+
+def test_stress_values_broadcast_over_scenarios(db):
+    import numpy as np
+    from app.services.simulation_service import SimulationService
+    from app.services.stress_engine import stress_values
+
+    snapshot = SimulationService.load_snapshot(db, 'tenant-default')
+    drops = np.array([[0.0], [20.0]])
+    grid = stress_values(snapshot.current_values, snapshot.kind_codes, drops, 150)
+
+    assert grid.shape == (2, snapshot.covenant_count)
+    np.testing.assert_array_equal(
+        grid[1], stress_values(snapshot.current_values, snapshot.kind_codes, 20.0, 150)
+    )
+
+
+def test_snapshot_load_uses_constant_number_of_queries(db):
+    from sqlalchemy import event
+    from app.database import engine
+    from app.services.portfolio_loader import load_portfolio_snapshot
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        snapshot = load_portfolio_snapshot(db, 'tenant-default')
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert snapshot.loan_count > 10
+    assert len(statements) == 2
+
+
+def test_grid_counts_match_single_scenarios(db):
+    from app.services.simulation_service import SimulationService
+
+    sim_service = SimulationService()
+    drops, hikes = [0, 15, 30], [0, 200]
+    grid = sim_service.simulate_scenario_grid(db, 'tenant-default', drops, hikes, include_loan_surfaces=True)
+
+    for i, drop in enumerate(drops):
+        for j, hike in enumerate(hikes):
+            heatmap = sim_service.simulate_stress_test(db, 'tenant-default', drop, hike)
+            assert grid.loans_breached[i, j] == heatmap["summary"]["loans_breached"]
+            assert grid.loans_at_risk[i, j] == heatmap["summary"]["loans_at_risk"]
+            assert grid.loans_safe[i, j] == heatmap["summary"]["loans_safe"]
+            labels = [("safe", "at_risk", "breach")[s] for s in grid.loan_surfaces[:, i, j]]
+            assert labels == [loan["overall_status"] for loan in heatmap["loans"]]
+
+
+@pytest.mark.parametrize("rate_hike", [0, 137, 420])
+def test_breakpoint_index_matches_full_scan(db, rate_hike):
+    from app.models import Covenant
+    from app.services.simulation_service import SimulationService
+    from app.services.breakpoint_index import BreakpointIndex
+
+    sim_service = SimulationService()
+
+    # A non-positive threshold has no closed form and is evaluated directly
+    loan_id = sim_service.load_snapshot(db, 'tenant-default').loan_ids[0]
+    db.add(Covenant(id='cov-residual', loan_id=loan_id, clause_id='Clause 9', name='Net Debt',
+                    threshold_value=-0.5, operator='>=', current_value=0.4, unit='x'))
+    db.commit()
+
+    index = BreakpointIndex(sim_service.load_snapshot(db, 'tenant-default'), rate_hike)
+    assert index.residual.loan_count == 1
+
+    for drop in [0, 3.21, 12.345, 27.77, 44.4, 61.03, 99.9]:
+        heatmap = sim_service.simulate_stress_test(db, 'tenant-default', drop, rate_hike)
+        assert index.summary(drop) == heatmap["summary"]
+
+
+@pytest.mark.parametrize("rate_hike", [0, 100])
+def test_breakpoint_index_matches_full_scan_on_boundaries(db, rate_hike):
+    from app.models import Loan, Covenant
+    from app.services.simulation_service import SimulationService
+    from app.services.breakpoint_index import BreakpointIndex
+
+    # Integer values and thresholds put breakpoints on integer drops, where
+    # `>=`/`<=` and `>`/`<` covenants and the strict at-risk cushion differ
+    template = db.query(Loan).filter(Loan.status == 'active').first()
+    names = ['debt_ebitda', 'interest_coverage', 'DSCR', 'current_ratio']
+    for i, (name, operator) in enumerate((n, op) for n in names for op in ['<', '<=', '>', '>=']):
+        loan_id = f'loan-edge-{i:02d}'
+        db.add(Loan(id=loan_id, tenant_id='tenant-default', company_name=f'Edge {i}',
+                    borrower_name=f'Edge {i}', sector='Energy', loan_amount=1e6, currency='EUR',
+                    origination_date=template.origination_date, maturity_date=template.maturity_date,
+                    interest_rate=4.0, status='active'))
+        for j, (value, threshold) in enumerate([(6.0, 4.0), (2.0, 4.0), (5.0, 1.0), (3.0, 3.0), (5.9, 2.95)]):
+            db.add(Covenant(id=f'cov-edge-{i:02d}-{j}', loan_id=loan_id, clause_id=f'Clause {j + 1}',
+                            name=name, threshold_value=threshold, operator=operator,
+                            current_value=value, unit='x'))
+    db.commit()
+
+    sim_service = SimulationService()
+    index = BreakpointIndex(sim_service.load_snapshot(db, 'tenant-default'), rate_hike)
+    for drop in range(101):
+        heatmap = sim_service.simulate_stress_test(db, 'tenant-default', drop, rate_hike)
+        assert index.summary(drop) == heatmap["summary"], drop
+
+    # DSCR >= 2.95 at 5.9 stresses to exactly 2.95 at a 50% drop: still compliant
+    heatmap = sim_service.simulate_stress_test(db, 'tenant-default', 50, 0)
+    dscr = next(c for l in heatmap["loans"] if l["loan_id"] == 'loan-edge-11' for c in l["covenants"]
+                if c["covenant_id"] == 'cov-edge-11-4')
+    assert dscr["stressed_value"] == 2.95 and dscr["status"] != "breach"
+
+
+@pytest.mark.parametrize("rate_hike", [0, 100])
+def test_breakpoint_index_matches_full_scan_for_non_positive_values(db, rate_hike):
+    from app.models import Loan, Covenant
+    from app.services.simulation_service import SimulationService
+    from app.services.breakpoint_index import BreakpointIndex
+
+    # Debt/EBITDA of -1.0 against `< 2.0` solves to a 150% drop, past the
+    # pole at 100% where the engine's stressed value flips to -inf (or nan
+    # for zero); one loan per covenant so each status shows in the counts
+    template = db.query(Loan).filter(Loan.status == 'active').first()
+    names = ['debt_ebitda', 'interest_coverage', 'DSCR', 'current_ratio']
+    cases = [(n, op, v) for n in names for op in ['<', '<=', '>', '>='] for v in [-1.0, -2.0, 0.0]]
+    for i, (name, operator, value) in enumerate(cases):
+        loan_id = f'loan-sign-{i:02d}'
+        db.add(Loan(id=loan_id, tenant_id='tenant-default', company_name=f'Sign {i}',
+                    borrower_name=f'Sign {i}', sector='Energy', loan_amount=1e6, currency='EUR',
+                    origination_date=template.origination_date, maturity_date=template.maturity_date,
+                    interest_rate=4.0, status='active'))
+        db.add(Covenant(id=f'cov-sign-{i:02d}', loan_id=loan_id, clause_id='Clause 1', name=name,
+                        threshold_value=2.0, operator=operator, current_value=value, unit='x'))
+    db.commit()
+
+    sim_service = SimulationService()
+    index = BreakpointIndex(sim_service.load_snapshot(db, 'tenant-default'), rate_hike)
+    assert index.residual.loan_count == len(cases)
+
+    for drop in [0, 20, 50, 99.99, 100]:
+        heatmap = sim_service.simulate_stress_test(db, 'tenant-default', drop, rate_hike)
+        assert index.summary(drop) == heatmap["summary"], drop
+
+
+def test_reverse_stress_test_finds_first_breaching_drop(db):
+    from app.services.simulation_service import SimulationService
+
+    sim_service = SimulationService()
+    loans = sim_service.reverse_stress_test(db, 'tenant-default', 100)
+    drops = [l["breach_ebitda_drop_percent"] for l in loans if l["breach_ebitda_drop_percent"] is not None]
+    assert drops == sorted(drops)
+
+    for loan in loans[:10]:
+        drop = loan["breach_ebitda_drop_percent"]
+        if drop is None:
+            continue
+        statuses = {
+            l["loan_id"]: l["overall_status"]
+            for l in sim_service.simulate_stress_test(db, 'tenant-default', min(drop + 1e-6, 100), 100)["loans"]
+        }
+        assert statuses[loan["loan_id"]] == "breach"
+        if drop > 0.01:
+            statuses = {
+                l["loan_id"]: l["overall_status"]
+                for l in sim_service.simulate_stress_test(db, 'tenant-default', drop - 0.01, 100)["loans"]
+            }
+            assert statuses[loan["loan_id"]] != "breach"
+
+
+@pytest.mark.parametrize("ebitda_drop,rate_hike", [(23.7, 180), (50, 0)])
+def test_monte_carlo_with_fixed_shocks_matches_deterministic_run(db, ebitda_drop, rate_hike):
+    from app.models import Covenant
+    from app.services.simulation_service import SimulationService
+    from app.services.monte_carlo import MonteCarloSpec, ShockDistribution
+
+    sim_service = SimulationService()
+    # Stresses to exactly its threshold at a 50% drop, which `>=` allows
+    loan_id = sim_service.load_snapshot(db, 'tenant-default').loan_ids[0]
+    db.add(Covenant(id='cov-edge', loan_id=loan_id, clause_id='Clause 9', name='DSCR',
+                    threshold_value=2.95, operator='>=', current_value=5.9, unit='x'))
+    db.commit()
+
+    spec = MonteCarloSpec(
+        paths=50,
+        ebitda_drop_percent=ShockDistribution(distribution="fixed", mean=ebitda_drop),
+        interest_rate_hike_bps=ShockDistribution(distribution="fixed", mean=rate_hike),
+    )
+    result = sim_service.simulate_monte_carlo(db, 'tenant-default', spec, workers=1)
+    heatmap = sim_service.simulate_stress_test(db, 'tenant-default', ebitda_drop, rate_hike)
+
+    for mc_loan, loan in zip(result["loans"], heatmap["loans"]):
+        assert mc_loan["breach_probability"] == (1.0 if loan["overall_status"] == "breach" else 0.0)
+
+    breached_exposure = sum(l["loan_amount"] for l in heatmap["loans"] if l["overall_status"] == "breach")
+    assert result["loss_exposure"]["percentiles"]["p50"] == pytest.approx(breached_exposure)
+
+
+@pytest.mark.parametrize("rate_shock", [
+    {"distribution": "fixed", "mean": 100},
+    # Not degenerate by fixed_value(), so the rate-linked slopes are used
+    {"distribution": "normal", "mean": 100, "std": 1e-9},
+])
+def test_monte_carlo_with_degenerate_shocks_matches_deterministic_run_for_non_positive_values(db, rate_shock):
+    from app.models import Loan, Covenant
+    from app.services.simulation_service import SimulationService
+    from app.services.monte_carlo import MonteCarloSpec, ShockDistribution
+
+    # Debt/EBITDA of -2.0 against `<= 4.0` stays negative under any drop
+    template = db.query(Loan).filter(Loan.status == 'active').first()
+    names = ['debt_ebitda', 'interest_coverage', 'DSCR', 'current_ratio']
+    cases = [(n, op, v) for n in names for op in ['<', '<=', '>', '>='] for v in [-2.0, 0.0]]
+    for i, (name, operator, value) in enumerate(cases):
+        loan_id = f'loan-sign-{i:02d}'
+        db.add(Loan(id=loan_id, tenant_id='tenant-default', company_name=f'Sign {i}',
+                    borrower_name=f'Sign {i}', sector='Energy', loan_amount=1e6, currency='EUR',
+                    origination_date=template.origination_date, maturity_date=template.maturity_date,
+                    interest_rate=4.0, status='active'))
+        db.add(Covenant(id=f'cov-sign-{i:02d}', loan_id=loan_id, clause_id='Clause 1', name=name,
+                        threshold_value=4.0, operator=operator, current_value=value, unit='x'))
+    db.commit()
+
+    spec = MonteCarloSpec(
+        paths=20,
+        ebitda_drop_percent=ShockDistribution(distribution="fixed", mean=20),
+        interest_rate_hike_bps=ShockDistribution(**rate_shock),
+    )
+    sim_service = SimulationService()
+    result = sim_service.simulate_monte_carlo(db, 'tenant-default', spec, workers=1)
+    heatmap = sim_service.simulate_stress_test(db, 'tenant-default', 20, 100)
+
+    assert [l["loan_id"] for l in result["loans"]] == [l["loan_id"] for l in heatmap["loans"]]
+    for mc_loan, loan in zip(result["loans"], heatmap["loans"]):
+        assert mc_loan["breach_probability"] == (1.0 if loan["overall_status"] == "breach" else 0.0), loan["loan_id"]
+
+
+def test_monte_carlo_is_reproducible_across_worker_counts(db):
+    from app.services.simulation_service import SimulationService
+    from app.services.monte_carlo import MonteCarloSpec, ShockDistribution, PATHS_PER_BLOCK
+
+    spec = MonteCarloSpec(
+        paths=PATHS_PER_BLOCK * 2 + 17,
+        ebitda_drop_percent=ShockDistribution(mean=20, std=10),
+        interest_rate_hike_bps=ShockDistribution(distribution="uniform", low=0, high=400),
+        sector_correlation=0.4,
+        seed=42,
+    )
+    sim_service = SimulationService()
+    serial = sim_service.simulate_monte_carlo(db, 'tenant-default', spec, workers=1)
+    parallel = sim_service.simulate_monte_carlo(db, 'tenant-default', spec, workers=2)
+
+    assert serial == parallel
+    probabilities = [l["breach_probability"] for l in serial["loans"]]
+    assert all(0 <= p <= 1 for p in probabilities)
+    assert 0 < sum(probabilities) < len(probabilities)
+
+
+def test_monte_carlo_shocks_are_truncated_to_their_domain():
+    import numpy as np
+    from app.services.monte_carlo import EBITDA_DROP_RANGE, MonteCarloSpec, ShockDistribution
+
+    z = np.random.default_rng(0).standard_normal(100_000)
+    shock = ShockDistribution(mean=90, std=30)
+    draws = shock.from_standard_normal(z, *EBITDA_DROP_RANGE)
+    # No probability mass piles up on the bounds, as clipping would put it
+    assert draws.min() > 0 and draws.max() < 100
+    assert (draws == 100).sum() == 0 and np.all(np.diff(draws[np.argsort(z)]) >= 0)
+
+    draws = ShockDistribution(mean=20, std=10, min_value=15, max_value=25).from_standard_normal(z, *EBITDA_DROP_RANGE)
+    assert 15 <= draws.min() and draws.max() <= 25
+
+    with pytest.raises(ValueError):
+        MonteCarloSpec(
+            paths=10,
+            ebitda_drop_percent=ShockDistribution(distribution="fixed", mean=120),
+            interest_rate_hike_bps=ShockDistribution(distribution="fixed", mean=0),
+        ).check()
+    with pytest.raises(ValueError):
+        ShockDistribution(distribution="uniform", low=-50, high=-10).check(*EBITDA_DROP_RANGE)
+
+
+def test_vectorized_normal_cdf_matches_standard_library():
+    import math
+    import numpy as np
+    from statistics import NormalDist
+    from app.services.monte_carlo import _normal_cdf, _normal_inv_cdf
+
+    # NormalDist.cdf goes through erf and loses the lower tail; erfc keeps it
+    z = np.linspace(-37, 8, 4501)
+    expected = [0.5 * math.erfc(-v / math.sqrt(2)) for v in z]
+    assert np.allclose(_normal_cdf(z), expected, rtol=1e-13, atol=0)
+
+    normal = NormalDist()
+    u = np.concatenate([np.logspace(-300, -2, 500), np.linspace(0.01, 0.99, 981), 1 - np.logspace(-15, -2, 200)])
+    assert np.allclose(_normal_inv_cdf(u), [normal.inv_cdf(v) for v in u], rtol=1e-12, atol=1e-12)
+    assert _normal_inv_cdf(np.array([0.0, 1.0])).tolist() == [-np.inf, np.inf]
+
+
+def test_stress_results_are_cached_per_portfolio_version(db, monkeypatch):
+    from app.models import Covenant
+    from app.services.simulation_service import SimulationService
+    from app.services.portfolio_version import get_portfolio_version
+
+    evaluations = []
+    evaluate = SimulationService.evaluate_snapshot
+    monkeypatch.setattr(SimulationService, 'evaluate_snapshot',
+                        staticmethod(lambda *args: evaluations.append(args) or evaluate(*args)))
+
+    sim_service = SimulationService()
+    first = sim_service.simulate_stress_test(db, 'tenant-default', 20, 200)
+    assert sim_service.simulate_stress_test(db, 'tenant-default', 20, 200) == first
+    assert len(evaluations) == 1
+    # Another scenario reuses the cached snapshot
+    sim_service.simulate_stress_test(db, 'tenant-default', 30, 200)
+    assert evaluations[1][0] is evaluations[0][0]
+
+    version = get_portfolio_version(db, 'tenant-default')
+    covenant = db.query(Covenant).filter(Covenant.current_value.isnot(None)).first()
+    covenant.status = covenant.status  # No-op writes don't bump the version
+    db.commit()
+    assert get_portfolio_version(db, 'tenant-default') == version
+
+    covenant.current_value = covenant.current_value * 3
+    db.commit()
+    assert get_portfolio_version(db, 'tenant-default') == version + 1
+
+    refreshed = sim_service.simulate_stress_test(db, 'tenant-default', 20, 200)
+    assert len(evaluations) == 3
+    assert refreshed == reference_heatmap(db, 'tenant-default', 20, 200)
+
+
+def test_portfolio_version_bump_upserts(db):
+    from app.models import PortfolioVersion, Tenant
+    from app.services.portfolio_version import get_portfolio_version
+
+    db.add(Tenant(id='tenant-other', name='Other Tenant'))
+    db.commit()
+    before = get_portfolio_version(db, 'tenant-default')
+    # One statement inserts the new tenant's row and increments the existing one
+    PortfolioVersion.bump(db.connection(), ['tenant-default', 'tenant-other'])
+    PortfolioVersion.bump(db.connection(), ['tenant-other'])
+    db.commit()
+    assert get_portfolio_version(db, 'tenant-default') == before + 1
+    assert get_portfolio_version(db, 'tenant-other') == 2
+
+
+@pytest.mark.parametrize("name,kind", [
+    ("Debt-to-EBITDA Ratio", "LEVERAGE"),
+    ("Net Debt / EBITDA", "LEVERAGE"),
+    ("Interest Coverage Ratio", "INTEREST_COVERAGE"),
+    ("Debt Service Coverage Ratio", "DSCR"),
+    ("Current Ratio", "CURRENT_RATIO"),
+    ("Tangible Net Worth", "DEFAULT"),
+])
+def test_covenant_kind_is_persisted_from_normalized_name(db, name, kind):
+    from app.models import Covenant, CovenantKind
+
+    covenant = Covenant(id='cov-kind', loan_id='loan-0001', clause_id='Clause 1', name='debt_ebitda',
+                        threshold_value=3.0, operator='<', current_value=2.0, unit='x')
+    db.add(covenant)
+    db.commit()
+    assert covenant.kind == CovenantKind.LEVERAGE
+
+    covenant.name = name
+    db.commit()
+    assert db.query(Covenant.kind).filter(Covenant.id == 'cov-kind').scalar() == CovenantKind[kind]
+
+
+@pytest.mark.parametrize("ebitda_drop,rate_hike", [(0, 0), (12.5, 75), (35, 300), (70, 900), (100, 200)])
+def test_in_database_summary_matches_engine(db, ebitda_drop, rate_hike):
+    from sqlalchemy import event
+    from app.database import engine
+    from app.models import Covenant
+    from app.services.simulation_service import SimulationService
+    from app.services.portfolio_loader import PortfolioFilter
+
+    sim_service = SimulationService()
+    loan_ids = sim_service.load_snapshot(db, 'tenant-default').loan_ids
+    # Zero thresholds take the special-cased cushion branch
+    db.add_all([
+        Covenant(id='cov-zero-upper', loan_id=loan_ids[0], clause_id='Clause 8', name='Net Debt',
+                 threshold_value=0.0, operator='<=', current_value=0.5, unit='x'),
+        Covenant(id='cov-zero-lower', loan_id=loan_ids[1], clause_id='Clause 8', name='Net Worth',
+                 threshold_value=0.0, operator='>', current_value=-0.5, unit='x'),
+    ])
+    db.commit()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        summary = sim_service.stress_summary(db, 'tenant-default', ebitda_drop, rate_hike)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    # The scalar reference raises on zero thresholds, so compare with the engine
+    assert summary == sim_service.simulate_stress_test(db, 'tenant-default', ebitda_drop, rate_hike)["summary"]
+    if ebitda_drop < 100:
+        assert len(statements) == 2  # Kind check + aggregate
+
+    filters = PortfolioFilter(sectors=('Energy',))
+    subset = sim_service.stress_summary(db, 'tenant-default', ebitda_drop, rate_hike, filters)
+    snapshot = sim_service.load_snapshot(db, 'tenant-default', filters)
+    heatmap = sim_service.simulate_stress_test(db, 'tenant-default', ebitda_drop, rate_hike, filters=filters)
+    assert subset == heatmap["summary"] and subset["total_loans"] == snapshot.loan_count
+
+
+def test_factor_model_reduces_to_two_parameter_stress(db):
+    import numpy as np
+    from app.models import CovenantKind
+    from app.services.factor_model import FactorModel, FactorShocks
+    from app.services.simulation_service import SimulationService
+    from app.services.stress_engine import stress_values
+
+    snapshot = SimulationService.load_snapshot(db, 'tenant-default')
+    model = FactorModel(snapshot)
+    exact = stress_values(snapshot.current_values, snapshot.kind_codes, 30, 200)
+
+    assert FactorShocks.from_values(working_capital_stress_percent=10) is None
+    np.testing.assert_allclose(model.stressed_values(30, 200, FactorShocks()), exact)
+
+    # Sector overrides: each sector is stressed with its own EBITDA drop
+    sector = snapshot.sectors[0]
+    shocks = FactorShocks.from_values(sector_ebitda_drop_percent={sector: 60})
+    cov_sectors = np.array(snapshot.sectors, dtype=object)[snapshot.cov_loan_idx]
+    in_sector = cov_sectors == sector
+    stressed = model.stressed_values(30, 200, shocks)
+    np.testing.assert_allclose(stressed[~in_sector], exact[~in_sector])
+    np.testing.assert_allclose(
+        stressed[in_sector],
+        stress_values(snapshot.current_values, snapshot.kind_codes, 60, 200)[in_sector]
+    )
+
+    # Working capital stress moves current ratios only; capex shocks DSCR only
+    shocks = FactorShocks.from_values(working_capital_stress_percent=25, capex_shock_percent=20)
+    stressed = model.stressed_values(30, 200, shocks)
+    current_ratio = snapshot.kind_codes == CovenantKind.CURRENT_RATIO
+    dscr = snapshot.kind_codes == CovenantKind.DSCR
+    np.testing.assert_allclose(stressed[current_ratio], snapshot.current_values[current_ratio] * 0.75)
+    np.testing.assert_allclose(stressed[dscr], exact[dscr] * 0.8)
+    other = ~(current_ratio | dscr)
+    np.testing.assert_allclose(stressed[other], exact[other])
+
+    heatmap = SimulationService().simulate_stress_test(db, 'tenant-default', 30, 200, factors=shocks)
+    assert heatmap["summary"]["total_loans"] == snapshot.loan_count
+
+
+def test_factor_model_is_built_once_per_cached_snapshot(db, monkeypatch):
+    from app.models import Covenant
+    from app.services import simulation_service
+    from app.services.factor_model import FactorModel, FactorShocks
+
+    built = []
+
+    class CountingFactorModel(FactorModel):
+        def __init__(self, snapshot):
+            built.append(snapshot)
+            super().__init__(snapshot)
+
+    monkeypatch.setattr(simulation_service, 'FactorModel', CountingFactorModel)
+    sim_service = simulation_service.SimulationService()
+    shocks = FactorShocks.from_values(working_capital_stress_percent=25)
+
+    first = sim_service.simulate_stress_test(db, 'tenant-default', 30, 200, factors=shocks)
+    sim_service.simulate_stress_test(db, 'tenant-default', 40, 100, factors=shocks)
+    lines = list(sim_service.stream_stress_test(db, 'tenant-default', 30, 200, factors=shocks))
+    assert len(built) == 1
+    assert len(lines) == len(first["loans"]) + 1
+
+    # A new portfolio version gets a model of its own
+    covenant = db.query(Covenant).filter(Covenant.current_value.isnot(None)).first()
+    covenant.current_value = covenant.current_value * 3
+    db.commit()
+    sim_service.simulate_stress_test(db, 'tenant-default', 30, 200, factors=shocks)
+    assert len(built) == 2 and built[1] is not built[0]
+
+
+def test_projection_reports_first_breach_quarter(db):
+    from datetime import date, datetime
+    from app.models import Covenant, Frequency, Loan
+    from app.services.simulation_service import SimulationService
+
+    sim_service = SimulationService()
+    as_of = date(2026, 1, 15)
+    ebitda_path = [0, 10, 20, 30, 40, 50, 60, 70]
+    rate_path = [0, 25, 50, 75, 100, 125, 150, 175]
+
+    loan_ids = sim_service.load_snapshot(db, 'tenant-default').loan_ids
+    # Matures between the 2nd and 3rd quarter ends
+    matured_loan = loan_ids[0]
+    db.query(Loan).filter(Loan.id == matured_loan).one().maturity_date = datetime(2026, 9, 1)
+    # Only tested at the 4th and 8th quarter ends
+    annual_loan = loan_ids[-1]
+    db.query(Covenant).filter(Covenant.loan_id == annual_loan).update(
+        {Covenant.frequency: Frequency.ANNUAL}, synchronize_session=False
+    )
+    db.commit()
+
+    report = sim_service.project_stress_test(db, 'tenant-default', ebitda_path, rate_path, as_of=as_of)
+    loans = {loan["loan_id"]: loan for loan in report["loans"]}
+    assert report["quarters"][0]["quarter_end"] == "2026-04-15"
+
+    for loan_id, loan in loans.items():
+        expected = []
+        for q, (drop, hike) in enumerate(zip(ebitda_path, rate_path)):
+            heatmap = sim_service.simulate_stress_test(db, 'tenant-default', drop, hike)
+            single = {entry["loan_id"]: entry["overall_status"] for entry in heatmap["loans"]}
+            if loan_id == matured_loan and q >= 2:
+                expected.append("matured")
+            elif loan_id == annual_loan and q % 4 != 3:
+                expected.append("not_tested")
+            else:
+                expected.append(single[loan_id])
+        assert loan["statuses"] == expected
+        first = expected.index("breach") + 1 if "breach" in expected else None
+        assert loan["first_breach_quarter"] == first
+
+    assert report["loans_breaching"] == sum(1 for loan in loans.values() if loan["first_breach_quarter"])
+    assert [q["loans_matured"] for q in report["quarters"]] == [0, 0] + [1] * 6